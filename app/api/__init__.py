@@ -13,14 +13,20 @@
 API Endpoints:
     HTTP:
     - GET /: Главная страница
-    - GET /api/camera/status: Статус камеры
-    - POST /api/camera/start: Запуск камеры
-    - POST /api/camera/stop: Остановка камеры
-    - GET /api/database/results: Данные из БД
+    - GET /api/cameras: Список камер
+    - POST /api/cameras/start, /api/cameras/stop: Запуск/остановка всех камер
+    - GET /api/camera/{camera_id}/status: Статус камеры
+    - POST /api/camera/{camera_id}/start: Запуск камеры
+    - POST /api/camera/{camera_id}/stop: Остановка камеры
+    - /api/camera/status, /api/camera/start, ...: То же для камеры по умолчанию
+    - GET /api/database/results: Данные из БД (фильтры, курсорная пагинация, выбор полей)
+    - GET /api/database/detections/counts: Количество детекций по часам/дням
+    - GET /api/database/statistics/hourly: Почасовая статистика по камерам
+    - GET /api/statistics/rollup: Агрегаты предупреждений по часам/дням
     - GET /health: Проверка состояния системы
     
     WebSocket:
-    - WS /ws/camera: Поток видео данных
+    - WS /ws/live: Живые обновления дашборда (новые результаты и изменения статуса)
 
 Использование:
     from app.api import router
@@ -29,12 +35,13 @@ API Endpoints:
 """
 
 from app.api.routes import router
-from app.api.websocket import websocket_camera_handler
+from app.api.websocket import websocket_live_handler, live_status_publisher
 
 # Экспорт основных компонентов
 __all__ = [
     "router",
-    "websocket_camera_handler",
+    "websocket_live_handler",
+    "live_status_publisher",
 ]
 
 # Информация о пакете
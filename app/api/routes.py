@@ -2,14 +2,18 @@
 HTTP маршруты API (обновлено для 25 FPS)
 """
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from datetime import datetime
+import time
 
-from app.services.camera_service import camera_service
+from app.services.camera_service import CameraService
+from app.services.camera_manager import camera_manager
 from app.services.neural_service import neural_service
 from app.database.connection import db_manager
 from app.utils.logger import logger
+from app.utils.metrics import metrics
 from app.config import settings
 
 # Создание роутера
@@ -25,37 +29,92 @@ async def get_index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
-@router.get("/api/camera/status")
-async def get_camera_status() -> Dict[str, Any]:
+def _get_camera(camera_id: Optional[str] = None) -> CameraService:
+    """Получение сервиса камеры по идентификатору (по умолчанию - первая камера)"""
+    camera = camera_manager.get(camera_id) if camera_id else camera_manager.get_default()
+    if camera is None:
+        raise HTTPException(status_code=404, detail=f"Камера не найдена: {camera_id}")
+    return camera
+
+
+@router.get("/api/cameras")
+async def list_cameras() -> Dict[str, Any]:
+    """Список всех камер"""
+    try:
+        return {
+            "success": True,
+            "data": camera_manager.list_cameras(),
+            "summary": camera_manager.get_summary()
+        }
+    except Exception as e:
+        logger.error(f"Ошибка получения списка камер: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка получения списка камер")
+
+
+@router.post("/api/cameras/start")
+async def start_all_cameras() -> Dict[str, Any]:
+    """Запуск всех камер"""
+    try:
+        started = await camera_manager.start_all()
+        return {
+            "success": all(started.values()),
+            "message": f"Запущено камер: {sum(started.values())}/{len(started)}",
+            "data": started
+        }
+    except Exception as e:
+        logger.error(f"Ошибка запуска камер: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка запуска камер")
+
+
+@router.post("/api/cameras/stop")
+async def stop_all_cameras() -> Dict[str, Any]:
+    """Остановка всех камер"""
+    try:
+        await camera_manager.stop_all()
+        return {
+            "success": True,
+            "message": "Все камеры остановлены"
+        }
+    except Exception as e:
+        logger.error(f"Ошибка остановки камер: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка остановки камер")
+
+
+def build_camera_status(camera_service: CameraService) -> Dict[str, Any]:
+    """Полный статус камеры (общий для REST и живых обновлений /ws/live)"""
+    return {
+        "camera": {
+            **camera_service.get_status(),
+            "info": camera_service.get_camera_info(),
+            "performance": camera_service.get_performance_stats()
+        },
+        "neural_network": neural_service.get_processing_statistics(),
+        "config": {
+            "target_fps": settings.camera_fps,
+            "analysis_interval": camera_service.analysis_interval,
+            "expected_analysis_rate": round(1 / camera_service.analysis_interval, 3) if camera_service.analysis_interval > 0 else 0
+        }
+    }
+
+
+@router.get("/api/camera/{camera_id}/status")
+async def get_camera_status(camera_id: str) -> Dict[str, Any]:
     """Получение статуса камеры (расширенная информация для 25 FPS)"""
+    camera_service = _get_camera(camera_id)
     try:
-        camera_status = camera_service.get_status()
-        camera_info = camera_service.get_camera_info()
-        neural_stats = neural_service.get_processing_statistics()
-        performance_stats = camera_service.get_performance_stats()
-        
         return {
             "success": True,
-            "camera": {
-                **camera_status,
-                "info": camera_info,
-                "performance": performance_stats
-            },
-            "neural_network": neural_stats,
-            "config": {
-                "target_fps": settings.camera_fps,
-                "analysis_interval": settings.analysis_interval,
-                "expected_analysis_rate": round(1 / settings.analysis_interval, 3) if settings.analysis_interval > 0 else 0
-            }
+            **build_camera_status(camera_service)
         }
     except Exception as e:
         logger.error(f"Ошибка получения статуса камеры: {e}")
         raise HTTPException(status_code=500, detail="Ошибка получения статуса")
 
 
-@router.post("/api/camera/start")
-async def start_camera() -> Dict[str, Any]:
+@router.post("/api/camera/{camera_id}/start")
+async def start_camera(camera_id: str) -> Dict[str, Any]:
     """Запуск камеры"""
+    camera_service = _get_camera(camera_id)
     try:
         if camera_service.is_running():
             return {
@@ -68,7 +127,7 @@ async def start_camera() -> Dict[str, Any]:
         if success:
             return {
                 "success": True,
-                "message": f"Камера запущена (25 FPS, анализ каждые {settings.analysis_interval}с)"
+                "message": f"Камера {camera_service.camera_id} запущена (25 FPS, анализ каждые {camera_service.analysis_interval}с)"
             }
         else:
             return {
@@ -81,9 +140,10 @@ async def start_camera() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Ошибка запуска камеры")
 
 
-@router.post("/api/camera/stop")
-async def stop_camera() -> Dict[str, Any]:
+@router.post("/api/camera/{camera_id}/stop")
+async def stop_camera(camera_id: str) -> Dict[str, Any]:
     """Остановка камеры"""
+    camera_service = _get_camera(camera_id)
     try:
         await camera_service.stop_streaming()
         return {
@@ -95,9 +155,10 @@ async def stop_camera() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Ошибка остановки камеры")
 
 
-@router.post("/api/camera/restart")
-async def restart_camera() -> Dict[str, Any]:
+@router.post("/api/camera/{camera_id}/restart")
+async def restart_camera(camera_id: str) -> Dict[str, Any]:
     """Перезапуск камеры"""
+    camera_service = _get_camera(camera_id)
     try:
         success = await camera_service.restart_camera()
         
@@ -116,9 +177,10 @@ async def restart_camera() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Ошибка перезапуска камеры")
 
 
-@router.get("/api/camera/performance")
-async def get_camera_performance() -> Dict[str, Any]:
+@router.get("/api/camera/{camera_id}/performance")
+async def get_camera_performance(camera_id: str) -> Dict[str, Any]:
     """Получение детальной статистики производительности"""
+    camera_service = _get_camera(camera_id)
     try:
         performance_stats = camera_service.get_performance_stats()
         
@@ -132,6 +194,37 @@ async def get_camera_performance() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Ошибка получения статистики")
 
 
+# Маршруты без идентификатора камеры работают с камерой по умолчанию
+@router.get("/api/camera/status")
+async def get_default_camera_status() -> Dict[str, Any]:
+    """Получение статуса камеры по умолчанию"""
+    return await get_camera_status(_get_camera().camera_id)
+
+
+@router.post("/api/camera/start")
+async def start_default_camera() -> Dict[str, Any]:
+    """Запуск камеры по умолчанию"""
+    return await start_camera(_get_camera().camera_id)
+
+
+@router.post("/api/camera/stop")
+async def stop_default_camera() -> Dict[str, Any]:
+    """Остановка камеры по умолчанию"""
+    return await stop_camera(_get_camera().camera_id)
+
+
+@router.post("/api/camera/restart")
+async def restart_default_camera() -> Dict[str, Any]:
+    """Перезапуск камеры по умолчанию"""
+    return await restart_camera(_get_camera().camera_id)
+
+
+@router.get("/api/camera/performance")
+async def get_default_camera_performance() -> Dict[str, Any]:
+    """Получение статистики производительности камеры по умолчанию"""
+    return await get_camera_performance(_get_camera().camera_id)
+
+
 def _get_performance_recommendations(stats: Dict[str, Any]) -> list:
     """Генерация рекомендаций по оптимизации производительности"""
     recommendations = []
@@ -171,18 +264,44 @@ def _get_performance_recommendations(stats: Dict[str, Any]) -> list:
 
 
 @router.get("/api/database/results")
-async def get_database_results(limit: int = 50) -> Dict[str, Any]:
-    """Получение результатов из базы данных"""
+async def get_database_results(
+    limit: int = 50,
+    camera_id: Optional[str] = None,
+    object_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Получение результатов из базы данных (новые первыми)
+    
+    Постраничное чтение: next_cursor из ответа передается в cursor следующего запроса.
+    fields - поля через запятую (например, id,camera_id,timestamp,processing_time)
+    позволяют не передавать тяжелые frame_data и detection_results.
+    """
     try:
         # Ограничиваем максимальное количество результатов
-        limit = min(limit, 1000)
+        limit = max(1, min(limit, 1000))
+        field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
         
-        results = await db_manager.get_recent_results(limit)
+        page = await db_manager.get_results_page(
+            limit,
+            camera_id=camera_id,
+            object_type=object_type,
+            since=since,
+            until=until,
+            cursor=cursor,
+            fields=field_list
+        )
         return {
             "success": True,
-            "data": results,
-            "count": len(results)
+            "data": page["data"],
+            "count": len(page["data"]),
+            "next_cursor": page["next_cursor"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Ошибка получения данных из базы: {e}")
         raise HTTPException(status_code=500, detail="Ошибка получения данных из базы данных")
@@ -206,6 +325,84 @@ async def get_database_statistics(days: int = 7) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Ошибка получения статистики")
 
 
+@router.get("/api/database/statistics/hourly")
+async def get_database_hourly_statistics(hours: int = 24, camera_id: Optional[str] = None) -> Dict[str, Any]:
+    """Получение почасовой статистики по камерам"""
+    try:
+        # Ограничиваем период (не больше 31 дня)
+        hours = max(1, min(hours, 24 * 31))
+        
+        stats = await db_manager.get_hourly_statistics(hours, camera_id)
+        return {
+            "success": True,
+            "data": stats,
+            "count": len(stats)
+        }
+    except Exception as e:
+        logger.error(f"Ошибка получения почасовой статистики: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка получения почасовой статистики")
+
+
+@router.get("/api/database/detections/counts")
+async def get_database_detection_counts(
+    hours: int = 24,
+    granularity: str = "hour",
+    camera_id: Optional[str] = None,
+    object_type: Optional[str] = None,
+    detection_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """Количество детекций по периодам, камерам и типам объектов (например, detection_type=warning)"""
+    try:
+        # Ограничиваем период (не больше 31 дня)
+        hours = max(1, min(hours, 24 * 31))
+        
+        counts = await db_manager.get_detection_counts(hours, granularity, camera_id, object_type, detection_type)
+        return {
+            "success": True,
+            "data": counts,
+            "count": len(counts)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка получения количества детекций: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка получения количества детекций")
+
+
+@router.get("/api/statistics/rollup")
+async def get_warning_rollup(
+    granularity: str = "hour",
+    periods: Optional[int] = None,
+    camera_id: Optional[str] = None,
+    object_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Агрегаты предупреждений по камерам и типам (granularity=hour или day)
+    
+    periods - число последних часов или дней (по умолчанию сутки или неделя).
+    """
+    try:
+        # Ограничиваем период (не больше 31 дня по часам и года по дням)
+        if granularity == "day":
+            periods = max(1, min(periods or 7, 365))
+        else:
+            periods = max(1, min(periods or 24, 24 * 31))
+        
+        rollup = await db_manager.get_warning_rollup(granularity, periods, camera_id, object_type)
+        return {
+            "success": True,
+            "granularity": granularity,
+            "periods": periods,
+            "data": rollup,
+            "count": len(rollup)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка получения агрегатов предупреждений: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка получения агрегатов предупреждений")
+
+
 @router.get("/api/database/info")
 async def get_database_info() -> Dict[str, Any]:
     """Получение информации о базе данных"""
@@ -266,12 +463,54 @@ async def reset_neural_statistics() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Ошибка сброса статистики")
 
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Метрики в текстовом формате Prometheus
+
+    Гистограммы длительности этапов (захват, ожидание в очереди инференса, поза,
+    модели OpenVINO, NMS, запись в базу, рассылка WebSocket) по камерам, квантили
+    и частоты за скользящее окно METRICS_WINDOW, счетчики кадров.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/live")
+async def liveness_check() -> Dict[str, Any]:
+    """Проверка живости: процесс отвечает на запросы (без обращения к базе и моделям)"""
+    return {"status": "alive", "timestamp": time.time()}
+
+
+@router.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """
+    Проверка готовности к анализу кадров
+
+    Возвращает 503, пока модели загружаются в фоне или нет подключения к базе данных.
+    """
+    neural = neural_service.get_readiness()
+    database_connected = db_manager.pool is not None
+    ready = neural["ready"] and database_connected
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "timestamp": time.time(),
+            "components": {
+                "neural_network": neural,
+                "database": {"connected": database_connected}
+            }
+        }
+    )
+
+
 @router.get("/health")
 async def health_check() -> Dict[str, Any]:
     """Проверка здоровья приложения"""
     try:
         # Проверка состояния компонентов
-        camera_running = camera_service.is_running()
+        camera_running = camera_manager.is_any_running()
         neural_loaded = neural_service.model_loaded
         database_connected = db_manager.pool is not None
         
@@ -279,8 +518,12 @@ async def health_check() -> Dict[str, Any]:
         db_info = await db_manager.get_database_info()
         database_healthy = bool(db_info)
         
-        # Получение статистики производительности
-        performance_stats = camera_service.get_performance_stats() if camera_running else {}
+        # Получение статистики производительности по запущенным камерам
+        performance_stats = {
+            camera_id: camera.get_performance_stats()
+            for camera_id, camera in camera_manager.cameras.items()
+            if camera.is_running()
+        }
         
         # Общее состояние
         overall_status = "healthy" if all([
@@ -302,11 +545,14 @@ async def health_check() -> Dict[str, Any]:
                     "running": camera_running,
                     "status": "healthy" if camera_running else "stopped",
                     "mode": "analysis_only_25fps",
+                    "summary": camera_manager.get_summary(),
                     "performance": performance_stats
                 },
                 "neural_network": {
                     "loaded": neural_loaded,
-                    "status": "healthy" if neural_loaded else "loading"
+                    "state": neural_service.state,
+                    "status": "healthy" if neural_loaded else (
+                        "error" if neural_service.state == neural_service.STATE_FAILED else "loading")
                 },
                 "database": {
                     "connected": database_connected,
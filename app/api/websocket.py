@@ -1,47 +1,158 @@
 """
-WebSocket обработчики
+WebSocket обработчики живых обновлений дашборда
 """
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
 from fastapi import WebSocket, WebSocketDisconnect
-from app.services.camera_service import camera_service
+from fastapi.encoders import jsonable_encoder
+
+from app.api.routes import build_camera_status
+from app.config import settings
+from app.services.camera_manager import camera_manager
+from app.services.event_bus import EventBus, event_bus
 from app.utils.logger import logger
+from app.utils.metrics import metrics
 
 
-async def websocket_camera_handler(websocket: WebSocket) -> None:
-    """Обработчик WebSocket для потоковой передачи видео"""
-    await websocket.accept()
-    
-    # Добавление WebSocket в сервис камеры
-    camera_service.add_websocket(websocket)
-    
-    try:
-        # Запуск камеры если она не активна
-        if not camera_service.is_running():
-            await camera_service.start_streaming()
-        
-        # Ожидание сообщений от клиента
+def _status_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Изменившиеся поля статуса по разделам (camera, neural_network, config)"""
+    delta = {}
+    for section, values in current.items():
+        old_values = previous.get(section) or {}
+        changed = {key: value for key, value in values.items() if old_values.get(key) != value}
+        if changed:
+            delta[section] = changed
+    return delta
+
+
+class LiveStatusPublisher:
+    """
+    Периодическая публикация изменений статуса камер в шину событий.
+
+    Статус собирается один раз за интервал независимо от числа клиентов
+    и только пока есть подписчики. Публикуются лишь изменившиеся поля
+    относительно последнего снимка; новый клиент получает сам снимок.
+    """
+
+    def __init__(self, bus: EventBus, interval: float = 3.0):
+        self.bus = bus
+        self.interval = interval
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запуск публикации статуса"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка публикации статуса"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Последний опубликованный статус камер (база для последующих изменений)"""
+        if not self._snapshots:
+            self._snapshots = self._collect()
+        return self._snapshots
+
+    def _collect(self) -> Dict[str, Dict[str, Any]]:
+        """Сбор статуса всех камер"""
+        return {
+            camera_id: jsonable_encoder(build_camera_status(camera_service))
+            for camera_id, camera_service in camera_manager.cameras.items()
+        }
+
+    async def _run(self) -> None:
+        """Цикл публикации изменений статуса"""
         while True:
+            await asyncio.sleep(self.interval)
+
+            # Без подписчиков статус не собирается, снимок строится заново при подключении
+            if self.bus.subscriber_count == 0:
+                self._snapshots = {}
+                continue
+
             try:
-                # Получение сообщения (для поддержания соединения)
-                message = await websocket.receive_text()
-                logger.debug(f"Получено WebSocket сообщение: {message}")
-                
-                # Обработка команд от клиента
-                if message == "ping":
-                    await websocket.send_text("pong")
-                elif message == "status":
-                    status = camera_service.get_status()
-                    await websocket.send_json(status)
-                    
-            except WebSocketDisconnect:
-                break
+                current = self._collect()
+                for camera_id, status in current.items():
+                    delta = _status_delta(self._snapshots.get(camera_id, {}), status)
+                    if delta:
+                        self.bus.publish("status", {"camera_id": camera_id, "delta": delta})
+                self._snapshots = current
             except Exception as e:
-                logger.error(f"Ошибка обработки WebSocket сообщения: {e}")
-                break
-    
+                logger.error(f"Ошибка публикации статуса камер: {e}")
+
+
+async def _send_events(websocket: WebSocket, queue: asyncio.Queue) -> None:
+    """Пересылка событий шины клиенту (задержка от публикации до отправки - метрика ws_fanout)"""
+    while True:
+        event = await queue.get()
+        await websocket.send_json(event)
+
+        data = event.get("data")
+        camera_id = data.get("camera_id") if isinstance(data, dict) else None
+        metrics.observe("ws_fanout", time.time() - event["time"], camera_id)
+
+
+async def _receive_commands(websocket: WebSocket) -> None:
+    """Обработка сообщений клиента (поддержание соединения)"""
+    while True:
+        message = await websocket.receive_text()
+        if message == "ping":
+            await websocket.send_json({"type": "pong"})
+
+
+async def websocket_live_handler(websocket: WebSocket) -> None:
+    """
+    Обработчик WebSocket /ws/live
+
+    При подключении отправляется снимок статуса камер, затем события шины:
+    result - новый результат анализа, status - изменившиеся поля статуса камеры.
+    """
+    await websocket.accept()
+    queue = event_bus.subscribe()
+
+    try:
+        await websocket.send_json({
+            "type": "snapshot",
+            "data": {
+                "default_camera_id": camera_manager.default_camera_id,
+                "cameras": live_status_publisher.get_snapshot()
+            }
+        })
+
+        # Соединение живет, пока работают и отправка событий, и прием сообщений клиента
+        tasks = [
+            asyncio.create_task(_send_events(websocket, queue)),
+            asyncio.create_task(_receive_commands(websocket))
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+        for outcome in outcomes:
+            if isinstance(outcome, Exception) and not isinstance(outcome, WebSocketDisconnect):
+                raise outcome
+
     except WebSocketDisconnect:
-        logger.info("WebSocket соединение закрыто клиентом")
+        pass
     except Exception as e:
         logger.error(f"Ошибка WebSocket соединения: {e}")
     finally:
-        # Удаление WebSocket из сервиса камеры
-        camera_service.remove_websocket(websocket)
+        event_bus.unsubscribe(queue)
+        logger.debug("WebSocket соединение /ws/live закрыто")
+
+
+# Глобальный публикатор статуса
+live_status_publisher = LiveStatusPublisher(event_bus, settings.live_status_interval)
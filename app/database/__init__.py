@@ -8,6 +8,7 @@
 
 Основные компоненты:
 - DatabaseManager: Менеджер пула соединений
+- ResultWriteBuffer: Отложенная пакетная запись результатов
 - Models: Модели данных для результатов анализа
 - Connection: Утилиты для работы с соединениями
 
@@ -17,14 +18,16 @@
     # Инициализация
     await db_manager.create_pool()
     
-    # Сохранение результатов
+    # Сохранение результатов (пачками в фоне после start_write_buffer)
+    await db_manager.start_write_buffer()
     await db_manager.save_neural_result(results)
     
-    # Получение данных
-    data = await db_manager.get_recent_results()
+    # Получение данных (постранично, next_cursor - курсор следующей страницы)
+    page = await db_manager.get_results_page(limit=100, camera_id="bus1_cabin")
 """
 
 from app.database.connection import DatabaseManager, db_manager
+from app.database.write_buffer import ResultWriteBuffer
 from app.database.models import (
     DetectionResult,
     NeuralNetworkResult,
@@ -37,6 +40,7 @@ __all__ = [
     # Менеджер базы данных
     "DatabaseManager",
     "db_manager",
+    "ResultWriteBuffer",
     
     # Модели данных
     "DetectionResult",
@@ -52,12 +56,25 @@ __description__ = "Модуль для работы с базой данных P
 # Константы для работы с БД
 DATABASE_TABLES = [
     "neural_network_results",
-    "camera_statistics"
+    "neural_detections",
+    "camera_statistics",
+    "camera_statistics_hourly",
+    "warning_rollup_hourly",
+    "warning_rollup_daily"
 ]
 
 DATABASE_INDEXES = [
-    "idx_neural_results_timestamp",
-    "idx_neural_results_created_at"
+    "idx_neural_results_created_at",
+    "idx_neural_results_timestamp_id",
+    "idx_neural_results_camera_timestamp_id",
+    "idx_neural_results_detections",
+    "idx_neural_detections_camera_ts",
+    "idx_neural_detections_type_ts",
+    "idx_neural_detections_result",
+    "idx_camera_statistics_date",
+    "idx_camera_statistics_hourly_hour",
+    "idx_warning_rollup_hourly_hour",
+    "idx_warning_rollup_daily_day"
 ]
 
 # Настройки по умолчанию
@@ -67,5 +84,5 @@ DEFAULT_POOL_SIZE = {
     "command_timeout": 60
 }
 
-DEFAULT_CLEANUP_DAYS = 30
+DEFAULT_CLEANUP_DAYS = 30  # Удаление результатов целыми дневными секциями
 DEFAULT_RESULTS_LIMIT = 50
@@ -1,13 +1,68 @@
 """
 Управление соединениями с базой данных
 """
+import asyncio
 import asyncpg
+import base64
 import json
-from typing import List, Dict, Any, Optional
-from datetime import datetime, date
+import re
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, date, timedelta
 
 from app.config import settings
 from app.utils.logger import logger
+from app.database.write_buffer import ResultWriteBuffer
+
+
+# Таблицы, секционированные по дням: <таблица>_pYYYYMMDD
+PARTITIONED_TABLES = ('neural_network_results', 'neural_detections')
+PARTITION_SUFFIX_PATTERN = re.compile(r'_p(\d{8})$')
+
+# Границы значений SMALLINT для координат рамок в neural_detections
+SMALLINT_MIN = -32768
+SMALLINT_MAX = 32767
+
+DETECTION_GRANULARITIES = ('hour', 'day')
+
+# Таблицы агрегатов предупреждений: гранулярность -> (таблица, колонка периода)
+WARNING_ROLLUP_TABLES = {
+    'hour': ('warning_rollup_hourly', 'hour'),
+    'day': ('warning_rollup_daily', 'day')
+}
+
+# Поля результатов, доступные для проекции
+RESULT_FIELDS = (
+    'id',
+    'camera_id',
+    'timestamp',
+    'frame_data',
+    'detection_results',
+    'processing_time',
+    'created_at'
+)
+
+
+def encode_results_cursor(timestamp: datetime, result_id: int) -> str:
+    """Курсор страницы результатов: позиция последней строки (timestamp, id)"""
+    raw = f"{timestamp.isoformat()}|{result_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_results_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбор курсора страницы результатов"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, result_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(result_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+
+
+def _to_local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Приведение времени к локальному без часового пояса (как в колонке timestamp)"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
 
 
 class DatabaseManager:
@@ -16,6 +71,13 @@ class DatabaseManager:
     def __init__(self, database_url: str):
         self.database_url = database_url
         self.pool: Optional[asyncpg.Pool] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.write_buffer = ResultWriteBuffer(
+            self.save_neural_results_batch,
+            batch_size=settings.db_write_batch_size,
+            flush_interval=settings.db_write_flush_interval,
+            max_pending=settings.db_write_max_pending
+        )
     
     async def create_pool(self) -> None:
         """Создание пула соединений с базой данных"""
@@ -36,27 +98,59 @@ class DatabaseManager:
         """Создание таблиц в базе данных"""
         try:
             async with self.pool.acquire() as conn:
-                # Создание основной таблицы для результатов
+                # Колонка камеры для таблиц, созданных до поддержки нескольких камер
                 await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS neural_network_results (
-                        id SERIAL PRIMARY KEY,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        frame_data JSONB NOT NULL DEFAULT '{}',
-                        detection_results JSONB NOT NULL DEFAULT '[]',
-                        processing_time REAL DEFAULT 0.0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
+                    ALTER TABLE IF EXISTS neural_network_results
+                    ADD COLUMN IF NOT EXISTS camera_id TEXT NOT NULL DEFAULT 'main'
                 ''')
                 
+                # Создание основной таблицы для результатов (секционированной по дням)
+                await self._create_results_table(conn)
+                
+                # Нормализованные детекции для аналитики предупреждений
+                await self._create_detections_table(conn)
+                
                 # Создание индексов для оптимизации
                 await conn.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_neural_results_timestamp 
-                    ON neural_network_results(timestamp DESC)
+                    CREATE INDEX IF NOT EXISTS idx_neural_results_created_at 
+                    ON neural_network_results(created_at DESC)
                 ''')
                 
+                # Индексы по timestamp без id заменены индексами курсорной пагинации
+                await conn.execute('DROP INDEX IF EXISTS idx_neural_results_timestamp')
+                await conn.execute('DROP INDEX IF EXISTS idx_neural_results_camera_timestamp')
+                
+                # Индексы курсорной пагинации по (timestamp, id)
                 await conn.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_neural_results_created_at 
-                    ON neural_network_results(created_at DESC)
+                    CREATE INDEX IF NOT EXISTS idx_neural_results_timestamp_id
+                    ON neural_network_results(timestamp DESC, id DESC)
+                ''')
+                
+                await conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_neural_results_camera_timestamp_id
+                    ON neural_network_results(camera_id, timestamp DESC, id DESC)
+                ''')
+                
+                # Фильтр по типу объекта/предупреждения (detection_results @> '[{"object_type": ...}]')
+                await conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_neural_results_detections
+                    ON neural_network_results USING GIN (detection_results jsonb_path_ops)
+                ''')
+                
+                # Индексы таблицы детекций
+                await conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_neural_detections_camera_ts
+                    ON neural_detections(camera_id, ts DESC)
+                ''')
+                
+                await conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_neural_detections_type_ts
+                    ON neural_detections(object_type, ts DESC)
+                ''')
+                
+                await conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_neural_detections_result
+                    ON neural_detections(result_id)
                 ''')
                 
                 # Создание таблицы для статистики с правильным UNIQUE constraint
@@ -68,139 +162,708 @@ class DatabaseManager:
                         analyzed_frames INTEGER DEFAULT 0,
                         detected_objects INTEGER DEFAULT 0,
                         average_processing_time REAL DEFAULT 0.0,
+                        processing_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         UNIQUE(date)
                     )
                 ''')
                 
+                # Сумма времени обработки вместо хранимого среднего (среднее считается при чтении);
+                # для таблиц со старой схемой сумма восстанавливается из среднего один раз
+                await conn.execute('''
+                    ALTER TABLE camera_statistics
+                    ADD COLUMN IF NOT EXISTS processing_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0
+                ''')
+                
+                await conn.execute('''
+                    UPDATE camera_statistics
+                    SET processing_time_sum = average_processing_time * analyzed_frames,
+                        average_processing_time = 0
+                    WHERE processing_time_sum = 0 AND average_processing_time > 0
+                ''')
+                
+                # Почасовая статистика по камерам
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS camera_statistics_hourly (
+                        camera_id TEXT NOT NULL,
+                        hour TIMESTAMP NOT NULL,
+                        analyzed_frames BIGINT NOT NULL DEFAULT 0,
+                        detected_objects BIGINT NOT NULL DEFAULT 0,
+                        processing_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (camera_id, hour)
+                    )
+                ''')
+                
+                await conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_camera_statistics_hourly_hour 
+                    ON camera_statistics_hourly(hour DESC)
+                ''')
+                
                 # Создание индекса для таблицы статистики
                 await conn.execute('''
                     CREATE INDEX IF NOT EXISTS idx_camera_statistics_date 
                     ON camera_statistics(date DESC)
                 ''')
                 
+                # Почасовые и дневные агрегаты предупреждений по камерам и типам
+                await self._create_warning_rollups(conn)
+                
                 logger.info("Таблицы базы данных созданы успешно")
         except Exception as e:
             logger.error(f"Ошибка создания таблиц: {e}")
             raise
     
+    async def _create_results_table(self, conn: asyncpg.Connection) -> None:
+        """
+        Создание таблицы результатов, секционированной по дням (RANGE по timestamp)
+
+        Несекционированная таблица прежней схемы переносится в новую один раз:
+        создаются секции за все дни с данными, строки копируются, старая таблица удаляется.
+        """
+        relkind = await conn.fetchval('''
+            SELECT relkind FROM pg_class WHERE oid = to_regclass('neural_network_results')
+        ''')
+        
+        if relkind == 'p':
+            await self.ensure_partitions(conn, 'neural_network_results')
+            return
+        
+        async with conn.transaction():
+            if relkind is not None:
+                logger.info("Перенос neural_network_results в секционированную по дням таблицу...")
+                await conn.execute('ALTER TABLE neural_network_results RENAME TO neural_network_results_legacy')
+                # Освобождение имени первичного ключа для новой таблицы
+                await conn.execute('ALTER TABLE neural_network_results_legacy DROP CONSTRAINT IF EXISTS neural_network_results_pkey')
+            
+            # Ключ секционирования входит в первичный ключ
+            await conn.execute('''
+                CREATE TABLE neural_network_results (
+                    id BIGSERIAL,
+                    camera_id TEXT NOT NULL DEFAULT 'main',
+                    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    frame_data JSONB NOT NULL DEFAULT '{}',
+                    detection_results JSONB NOT NULL DEFAULT '[]',
+                    processing_time REAL DEFAULT 0.0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (id, timestamp)
+                ) PARTITION BY RANGE (timestamp)
+            ''')
+            
+            if relkind is not None:
+                bounds = await conn.fetchrow('''
+                    SELECT
+                        MIN(COALESCE(timestamp, created_at, LOCALTIMESTAMP))::date AS first_day,
+                        MAX(COALESCE(timestamp, created_at, LOCALTIMESTAMP))::date AS last_day
+                    FROM neural_network_results_legacy
+                ''')
+                if bounds['first_day'] is not None:
+                    await self._create_partitions(conn, bounds['first_day'], bounds['last_day'])
+                
+                moved = await conn.execute('''
+                    INSERT INTO neural_network_results
+                    (id, camera_id, timestamp, frame_data, detection_results, processing_time, created_at)
+                    SELECT id, camera_id, COALESCE(timestamp, created_at, LOCALTIMESTAMP),
+                           frame_data, detection_results, processing_time, created_at
+                    FROM neural_network_results_legacy
+                ''')
+                await conn.execute('''
+                    SELECT setval(pg_get_serial_sequence('neural_network_results', 'id'),
+                                  COALESCE((SELECT MAX(id) FROM neural_network_results), 0) + 1, false)
+                ''')
+                await conn.execute('DROP TABLE neural_network_results_legacy')
+                logger.info(f"Перенос neural_network_results завершен ({moved})")
+            
+            await self.ensure_partitions(conn, 'neural_network_results')
+    
+    async def _create_detections_table(self, conn: asyncpg.Connection) -> None:
+        """
+        Создание таблицы детекций: по строке на элемент detection_results
+
+        Секционирована по дням так же, как neural_network_results, и удаляется
+        вместе с ней. При первом создании заполняется из уже сохраненных результатов.
+        """
+        exists = await conn.fetchval("SELECT to_regclass('neural_detections') IS NOT NULL")
+        if exists:
+            await self.ensure_partitions(conn, 'neural_detections')
+            return
+        
+        async with conn.transaction():
+            await conn.execute('''
+                CREATE TABLE neural_detections (
+                    result_id BIGINT NOT NULL,
+                    camera_id TEXT NOT NULL,
+                    ts TIMESTAMP NOT NULL,
+                    object_type TEXT NOT NULL,
+                    detection_type TEXT,
+                    confidence REAL,
+                    bbox SMALLINT[]
+                ) PARTITION BY RANGE (ts)
+            ''')
+            
+            result_partitions = await self._list_partitions(conn, 'neural_network_results')
+            if result_partitions:
+                await self._create_partitions(
+                    conn, result_partitions[0][1], result_partitions[-1][1], 'neural_detections'
+                )
+            await self.ensure_partitions(conn, 'neural_detections')
+            
+            # Перенос детекций из JSONB уже сохраненных результатов
+            moved = await conn.execute(f'''
+                INSERT INTO neural_detections
+                (result_id, camera_id, ts, object_type, detection_type, confidence, bbox)
+                SELECT
+                    r.id,
+                    r.camera_id,
+                    r.timestamp,
+                    d->>'object_type',
+                    d->>'detection_type',
+                    (d->>'confidence')::real,
+                    CASE WHEN jsonb_typeof(d->'bbox') = 'array' THEN ARRAY(
+                        SELECT LEAST(GREATEST(round(v::numeric), {SMALLINT_MIN}), {SMALLINT_MAX})::smallint
+                        FROM jsonb_array_elements_text(d->'bbox') AS v
+                    ) END
+                FROM neural_network_results r
+                CROSS JOIN LATERAL jsonb_array_elements(
+                    CASE WHEN jsonb_typeof(r.detection_results) = 'array' THEN r.detection_results ELSE '[]'::jsonb END
+                ) AS d
+                WHERE jsonb_typeof(d) = 'object' AND d ? 'object_type'
+            ''')
+            logger.info(f"Создана таблица детекций neural_detections ({moved})")
+    
+    async def _create_warning_rollups(self, conn: asyncpg.Connection) -> None:
+        """
+        Создание таблиц агрегатов предупреждений (камера, тип, час/день)
+
+        Агрегаты обновляются при каждой пакетной записи результатов; при первом
+        создании таблицы заполняются из neural_detections.
+        """
+        for granularity, (table, period_column) in WARNING_ROLLUP_TABLES.items():
+            exists = await conn.fetchval(f"SELECT to_regclass('{table}') IS NOT NULL")
+            if exists:
+                continue
+            
+            period_type = 'TIMESTAMP' if granularity == 'hour' else 'DATE'
+            async with conn.transaction():
+                await conn.execute(f'''
+                    CREATE TABLE {table} (
+                        camera_id TEXT NOT NULL,
+                        object_type TEXT NOT NULL,
+                        {period_column} {period_type} NOT NULL,
+                        warning_count BIGINT NOT NULL DEFAULT 0,
+                        confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (camera_id, {period_column}, object_type)
+                    )
+                ''')
+                
+                await conn.execute(f'''
+                    CREATE INDEX idx_{table}_{period_column}
+                    ON {table}({period_column} DESC)
+                ''')
+                
+                await conn.execute(f'''
+                    INSERT INTO {table} (camera_id, object_type, {period_column}, warning_count, confidence_sum)
+                    SELECT camera_id, object_type, date_trunc('{granularity}', ts)::{period_type},
+                           COUNT(*), COALESCE(SUM(confidence), 0)
+                    FROM neural_detections
+                    WHERE detection_type = 'warning'
+                    GROUP BY 1, 2, 3
+                ''')
+            
+            logger.info(f"Создана таблица агрегатов предупреждений {table}")
+    
+    async def _create_partitions(
+        self, conn: asyncpg.Connection, first_day: date, last_day: date, table: str = 'neural_network_results'
+    ) -> int:
+        """Создание дневных секций таблицы с first_day по last_day включительно"""
+        created = 0
+        day = first_day
+        while day <= last_day:
+            # Имена и границы формируются из констант и дат, а не из пользовательского ввода
+            await conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table}_p{day:%Y%m%d}
+                PARTITION OF {table}
+                FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')
+            ''')
+            created += 1
+            day += timedelta(days=1)
+        return created
+    
+    async def ensure_partitions(
+        self, conn: Optional[asyncpg.Connection] = None, table: Optional[str] = None
+    ) -> None:
+        """Создание секций на сегодня и DB_PARTITION_PREMAKE_DAYS дней вперед (по умолчанию во всех таблицах)"""
+        today = date.today()
+        last_day = today + timedelta(days=settings.db_partition_premake_days)
+        tables = (table,) if table else PARTITIONED_TABLES
+        
+        if conn is not None:
+            for name in tables:
+                await self._create_partitions(conn, today, last_day, name)
+            return
+        
+        async with self.pool.acquire() as conn:
+            for name in tables:
+                await self._create_partitions(conn, today, last_day, name)
+    
+    async def _list_partitions(
+        self, conn: asyncpg.Connection, table: str = 'neural_network_results'
+    ) -> List[Tuple[str, date, float]]:
+        """Список дневных секций таблицы: (имя, день, оценка числа строк)"""
+        rows = await conn.fetch('''
+            SELECT c.relname, c.reltuples
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = $1::regclass
+        ''', table)
+        
+        partitions = []
+        for row in rows:
+            match = PARTITION_SUFFIX_PATTERN.search(row['relname'])
+            if match:
+                partitions.append((row['relname'], datetime.strptime(match.group(1), '%Y%m%d').date(),
+                                   max(row['reltuples'], 0)))
+        return sorted(partitions, key=lambda partition: partition[1])
+    
+    async def start_maintenance(self) -> None:
+        """Запуск фонового обслуживания: заблаговременное создание секций"""
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+    
+    async def stop_maintenance(self) -> None:
+        """Остановка фонового обслуживания"""
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+    
+    async def _maintenance_loop(self) -> None:
+        """Цикл обслуживания секций"""
+        while True:
+            await asyncio.sleep(settings.db_partition_maintenance_interval)
+            try:
+                await self.ensure_partitions()
+            except Exception as e:
+                logger.error(f"Ошибка создания секций таблицы результатов: {e}")
+    
     async def save_neural_result(
         self, 
         detection_results: List[Dict[str, Any]], 
-        processing_time: float = 0.0
-    ) -> int:
-        """Сохранение результатов работы нейронной сети"""
+        processing_time: float = 0.0,
+        camera_id: str = "main",
+        timestamp: Optional[datetime] = None
+    ) -> Optional[int]:
+        """
+        Сохранение результатов работы нейронной сети
+
+        При запущенной отложенной записи результат только ставится в буфер
+        (ID станет известен при сбросе пачки, возвращается None),
+        иначе записывается сразу. timestamp передается, когда результат
+        рассылается клиентам до записи: пара (camera_id, timestamp)
+        совпадает с записанной и служит ключом результата без ID.
+        """
+        record = {
+            "camera_id": camera_id,
+            "timestamp": timestamp or datetime.now(),
+            "detection_results": detection_results,
+            "processing_time": processing_time
+        }
+        
+        if self.write_buffer.running:
+            self.write_buffer.add(record)
+            return None
+        
         try:
-            async with self.pool.acquire() as conn:
-                # Сохранение результата
-                result = await conn.fetchrow('''
-                    INSERT INTO neural_network_results 
-                    (frame_data, detection_results, processing_time)
-                    VALUES ($1, $2, $3)
-                    RETURNING id
-                ''', 
-                json.dumps({"frame_processed": True, "timestamp": datetime.now().isoformat()}),
-                json.dumps(detection_results),
-                processing_time
-                )
-                
-                # Обновление статистики
-                await self.update_daily_statistics(len(detection_results), processing_time)
-                
-                logger.info(f"Результаты нейронной сети сохранены с ID: {result['id']}")
-                return result['id']
+            ids = await self.save_neural_results_batch([record])
+            logger.info(f"Результаты нейронной сети сохранены с ID: {ids[0]}")
+            return ids[0]
                 
         except Exception as e:
             logger.error(f"Ошибка сохранения в базу данных: {e}")
             raise
     
-    async def get_recent_results(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Получение последних результатов из базы данных"""
+    async def save_neural_results_batch(self, records: List[Dict[str, Any]]) -> List[int]:
+        """
+        Пакетное сохранение результатов в одной транзакции
+
+        ID выделяются заранее одним запросом к последовательности, строки
+        записываются через COPY, дневная и почасовая статистика обновляются
+        одним UPSERT на таблицу. Если для дня записи еще нет секции
+        (обслуживание не успело ее создать), секции создаются и пачка
+        записывается повторно один раз. Возвращает ID записей в порядке records.
+        """
+        if not records:
+            return []
+        
         try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch('''
-                    SELECT 
-                        id, 
-                        timestamp, 
-                        frame_data, 
-                        detection_results, 
-                        processing_time,
-                        created_at
-                    FROM neural_network_results
-                    ORDER BY timestamp DESC
-                    LIMIT $1
-                ''', limit)
+            return await self._write_results_batch(records)
+        except asyncpg.CheckViolationError as e:
+            if 'no partition of relation' not in str(e):
+                raise
+            logger.warning(f"Нет секции для записи результатов, создание секций и повтор: {e}")
+        
+        days = [record["timestamp"].date() for record in records]
+        async with self.pool.acquire() as conn:
+            for table in PARTITIONED_TABLES:
+                await self._create_partitions(conn, min(days), max(days), table)
+            await self.ensure_partitions(conn)
+        
+        return await self._write_results_batch(records)
+    
+    async def _write_results_batch(self, records: List[Dict[str, Any]]) -> List[int]:
+        """Запись пачки результатов, детекций и агрегатов в одной транзакции"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                id_rows = await conn.fetch('''
+                    SELECT nextval(pg_get_serial_sequence('neural_network_results', 'id')) AS id
+                    FROM generate_series(1, $1)
+                ''', len(records))
+                ids = [row['id'] for row in id_rows]
                 
-                # Преобразование результатов
-                results = []
-                for row in rows:
-                    results.append({
-                        'id': row['id'],
-                        'timestamp': row['timestamp'].isoformat() if row['timestamp'] else None,
-                        'frame_data': row['frame_data'],
-                        'detection_results': row['detection_results'],
-                        'processing_time': row['processing_time'],
-                        'created_at': row['created_at'].isoformat() if row['created_at'] else None
-                    })
+                rows = []
+                detection_rows = []
+                daily_totals: Dict[date, List[float]] = {}
+                hourly_totals: Dict[tuple, List[float]] = {}
+                warning_totals: Dict[str, Dict[tuple, List[float]]] = {'hour': {}, 'day': {}}
+                for result_id, record in zip(ids, records):
+                    timestamp = record["timestamp"]
+                    detection_results = record["detection_results"]
+                    rows.append((
+                        result_id,
+                        record["camera_id"],
+                        timestamp,
+                        json.dumps({"frame_processed": True, "timestamp": timestamp.isoformat()}),
+                        json.dumps(detection_results),
+                        record["processing_time"],
+                        timestamp
+                    ))
+                    record_detections = self._make_detection_rows(
+                        result_id, record["camera_id"], timestamp, detection_results
+                    )
+                    detection_rows.extend(record_detections)
+                    
+                    # Агрегаты по дате и по (камера, час): [кадров, объектов, суммарное время обработки]
+                    hour = timestamp.replace(minute=0, second=0, microsecond=0)
+                    for totals in (daily_totals.setdefault(timestamp.date(), [0, 0, 0.0]),
+                                   hourly_totals.setdefault((record["camera_id"], hour), [0, 0, 0.0])):
+                        totals[0] += 1
+                        totals[1] += len(detection_results)
+                        totals[2] += record["processing_time"]
+                    
+                    # Агрегаты предупреждений по (камера, тип, час/день): [количество, сумма уверенности]
+                    for _, camera_id, _, object_type, detection_type, confidence, _ in record_detections:
+                        if detection_type != "warning":
+                            continue
+                        for granularity, period in (('hour', hour), ('day', timestamp.date())):
+                            totals = warning_totals[granularity].setdefault((camera_id, object_type, period), [0, 0.0])
+                            totals[0] += 1
+                            totals[1] += confidence or 0.0
                 
-                logger.debug(f"Получено {len(results)} записей из базы данных")
-                return results
+                await conn.copy_records_to_table(
+                    'neural_network_results',
+                    records=rows,
+                    columns=['id', 'camera_id', 'timestamp', 'frame_data',
+                             'detection_results', 'processing_time', 'created_at']
+                )
                 
-        except Exception as e:
+                if detection_rows:
+                    await conn.copy_records_to_table(
+                        'neural_detections',
+                        records=detection_rows,
+                        columns=['result_id', 'camera_id', 'ts', 'object_type',
+                                 'detection_type', 'confidence', 'bbox']
+                    )
+                
+                await self._apply_statistics(conn, daily_totals, hourly_totals)
+                await self._apply_warning_rollups(conn, warning_totals)
+        
+        logger.debug(f"Сохранено {len(ids)} результатов нейронной сети (ID {ids[0]}..{ids[-1]})")
+        return ids
+    
+    @staticmethod
+    def _make_detection_rows(
+        result_id: int, camera_id: str, timestamp: datetime, detection_results: List[Dict[str, Any]]
+    ) -> List[tuple]:
+        """Строки neural_detections для детекций одного результата"""
+        rows = []
+        for detection in detection_results:
+            if not isinstance(detection, dict) or not detection.get("object_type"):
+                continue
+            
+            bbox = detection.get("bbox")
+            if isinstance(bbox, (list, tuple)):
+                bbox = [min(max(int(round(value)), SMALLINT_MIN), SMALLINT_MAX) for value in bbox]
+            else:
+                bbox = None
+            
+            confidence = detection.get("confidence")
+            rows.append((
+                result_id,
+                camera_id,
+                timestamp,
+                str(detection["object_type"]),
+                detection.get("detection_type"),
+                float(confidence) if confidence is not None else None,
+                bbox
+            ))
+        return rows
+    
+    async def start_write_buffer(self) -> None:
+        """Запуск отложенной пакетной записи результатов"""
+        if settings.db_write_behind:
+            self.write_buffer.start()
+    
+    async def stop_write_buffer(self) -> None:
+        """Остановка отложенной записи с дозаписью буфера"""
+        await self.write_buffer.stop()
+    
+    async def get_recent_results(self, limit: int = 50, camera_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Получение последних результатов из базы данных (опционально по одной камере)"""
+        try:
+            page = await self.get_results_page(limit, camera_id=camera_id)
+            return page['data']
+        except ValueError as e:
             logger.error(f"Ошибка получения данных из базы: {e}")
             return []
     
-    async def update_daily_statistics(self, detected_objects_count: int, processing_time: float = 0.0) -> None:
-        """Обновление ежедневной статистики"""
+    async def get_results_page(
+        self,
+        limit: int = 50,
+        camera_id: Optional[str] = None,
+        object_type: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Страница результатов анализа (новые первыми) с курсорной пагинацией по (timestamp, id)
+
+        cursor - значение next_cursor предыдущей страницы; object_type - тип объекта
+        или предупреждения в detection_results; since/until - диапазон времени [since, until);
+        fields - список возвращаемых полей (id и timestamp возвращаются всегда).
+        Некорректные cursor или fields приводят к ValueError.
+        """
+        columns = self._resolve_result_fields(fields)
+        after = decode_results_cursor(cursor) if cursor else None
+        since = _to_local_naive(since)
+        until = _to_local_naive(until)
+        
+        conditions = []
+        args: List[Any] = []
+        
+        def add_condition(template: str, *values: Any) -> None:
+            placeholders = []
+            for value in values:
+                args.append(value)
+                placeholders.append(f'${len(args)}')
+            conditions.append(template.format(*placeholders))
+        
+        if camera_id:
+            add_condition('camera_id = {0}', camera_id)
+        if object_type:
+            # Поиск по содержимому массива обслуживается GIN индексом (jsonb_path_ops)
+            add_condition('detection_results @> {0}::jsonb', json.dumps([{'object_type': object_type}]))
+        if since:
+            add_condition('timestamp >= {0}', since)
+        if until:
+            add_condition('timestamp < {0}', until)
+        if after:
+            add_condition('(timestamp, id) < ({0}, {1})', *after)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        args.append(limit + 1)
+        
         try:
-            current_date = date.today()
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(f'''
+                    SELECT {', '.join(columns)}
+                    FROM neural_network_results
+                    {where}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ${len(args)}
+                ''', *args)
+        except Exception as e:
+            logger.error(f"Ошибка получения данных из базы: {e}")
+            return {'data': [], 'next_cursor': None}
+        
+        # Лишняя строка показывает, что есть следующая страница
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        results = []
+        for row in rows:
+            item = dict(row)
+            for column in ('timestamp', 'created_at'):
+                if item.get(column) is not None:
+                    item[column] = item[column].isoformat()
+            results.append(item)
+        
+        next_cursor = encode_results_cursor(rows[-1]['timestamp'], rows[-1]['id']) if has_more else None
+        
+        logger.debug(f"Получено {len(results)} записей из базы данных")
+        return {'data': results, 'next_cursor': next_cursor}
+    
+    @staticmethod
+    def _resolve_result_fields(fields: Optional[List[str]]) -> List[str]:
+        """Проверка проекции полей результатов"""
+        if not fields:
+            return list(RESULT_FIELDS)
+        
+        unknown = [field for field in fields if field not in RESULT_FIELDS]
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+        
+        # id и timestamp нужны для курсора
+        return [field for field in RESULT_FIELDS if field in fields or field in ('id', 'timestamp')]
+    
+    async def _apply_statistics(
+        self,
+        conn: asyncpg.Connection,
+        daily_totals: Dict[date, List[float]],
+        hourly_totals: Dict[tuple, List[float]]
+    ) -> None:
+        """
+        Добавление агрегатов к дневной и почасовой статистике
+
+        Каждая таблица обновляется одним атомарным INSERT ... ON CONFLICT DO UPDATE:
+        счетчики и сумма времени обработки увеличиваются на стороне базы, поэтому
+        одновременные сбросы не теряют обновлений. Значения агрегатов -
+        [кадров, объектов, суммарное время обработки].
+        """
+        if daily_totals:
+            await conn.execute('''
+                INSERT INTO camera_statistics (date, analyzed_frames, detected_objects, processing_time_sum)
+                SELECT * FROM unnest($1::date[], $2::int[], $3::int[], $4::float8[])
+                ON CONFLICT (date) DO UPDATE
+                SET analyzed_frames = camera_statistics.analyzed_frames + EXCLUDED.analyzed_frames,
+                    detected_objects = camera_statistics.detected_objects + EXCLUDED.detected_objects,
+                    processing_time_sum = camera_statistics.processing_time_sum + EXCLUDED.processing_time_sum,
+                    updated_at = CURRENT_TIMESTAMP
+            ''',
+            list(daily_totals.keys()),
+            [int(totals[0]) for totals in daily_totals.values()],
+            [int(totals[1]) for totals in daily_totals.values()],
+            [float(totals[2]) for totals in daily_totals.values()]
+            )
+        
+        if hourly_totals:
+            await conn.execute('''
+                INSERT INTO camera_statistics_hourly
+                (camera_id, hour, analyzed_frames, detected_objects, processing_time_sum)
+                SELECT * FROM unnest($1::text[], $2::timestamp[], $3::bigint[], $4::bigint[], $5::float8[])
+                ON CONFLICT (camera_id, hour) DO UPDATE
+                SET analyzed_frames = camera_statistics_hourly.analyzed_frames + EXCLUDED.analyzed_frames,
+                    detected_objects = camera_statistics_hourly.detected_objects + EXCLUDED.detected_objects,
+                    processing_time_sum = camera_statistics_hourly.processing_time_sum + EXCLUDED.processing_time_sum,
+                    updated_at = CURRENT_TIMESTAMP
+            ''',
+            [camera_id for camera_id, _ in hourly_totals.keys()],
+            [hour for _, hour in hourly_totals.keys()],
+            [int(totals[0]) for totals in hourly_totals.values()],
+            [int(totals[1]) for totals in hourly_totals.values()],
+            [float(totals[2]) for totals in hourly_totals.values()]
+            )
+    
+    async def _apply_warning_rollups(
+        self, conn: asyncpg.Connection, warning_totals: Dict[str, Dict[tuple, List[float]]]
+    ) -> None:
+        """
+        Добавление пачки предупреждений к почасовым и дневным агрегатам
+
+        Ключи - (камера, тип, период), значения - [количество, сумма уверенности];
+        каждая таблица обновляется одним UPSERT, как и статистика кадров.
+        """
+        for granularity, totals in warning_totals.items():
+            if not totals:
+                continue
             
+            table, period_column = WARNING_ROLLUP_TABLES[granularity]
+            period_type = 'timestamp' if granularity == 'hour' else 'date'
+            await conn.execute(f'''
+                INSERT INTO {table} (camera_id, object_type, {period_column}, warning_count, confidence_sum)
+                SELECT * FROM unnest($1::text[], $2::text[], $3::{period_type}[], $4::bigint[], $5::float8[])
+                ON CONFLICT (camera_id, {period_column}, object_type) DO UPDATE
+                SET warning_count = {table}.warning_count + EXCLUDED.warning_count,
+                    confidence_sum = {table}.confidence_sum + EXCLUDED.confidence_sum,
+                    updated_at = CURRENT_TIMESTAMP
+            ''',
+            [key[0] for key in totals.keys()],
+            [key[1] for key in totals.keys()],
+            [key[2] for key in totals.keys()],
+            [int(value[0]) for value in totals.values()],
+            [float(value[1]) for value in totals.values()]
+            )
+    
+    async def get_warning_rollup(
+        self,
+        granularity: str = 'hour',
+        periods: int = 24,
+        camera_id: Optional[str] = None,
+        object_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Агрегаты предупреждений за последние periods часов или дней
+
+        Читаются только таблицы агрегатов; к строкам добавляется число
+        проанализированных кадров камеры за тот же период (из почасовой статистики).
+        """
+        if granularity not in WARNING_ROLLUP_TABLES:
+            raise ValueError(f"Неизвестная гранулярность: {granularity}")
+        
+        table, period_column = WARNING_ROLLUP_TABLES[granularity]
+        period_type = 'timestamp' if granularity == 'hour' else 'date'
+        period_start = (
+            "date_trunc('hour', LOCALTIMESTAMP) - make_interval(hours => $1 - 1)" if granularity == 'hour'
+            else "CURRENT_DATE - ($1 - 1)"
+        )
+        
+        try:
             async with self.pool.acquire() as conn:
-                # Проверяем, существует ли запись для текущей даты
-                existing_record = await conn.fetchrow('''
-                    SELECT id, analyzed_frames, detected_objects, average_processing_time
-                    FROM camera_statistics 
-                    WHERE date = $1
-                ''', current_date)
-                
-                if existing_record:
-                    # Обновляем существующую запись
-                    old_analyzed_frames = existing_record['analyzed_frames']
-                    old_detected_objects = existing_record['detected_objects']
-                    old_avg_time = existing_record['average_processing_time']
-                    
-                    # Расчет нового среднего времени обработки
-                    new_analyzed_frames = old_analyzed_frames + 1
-                    new_detected_objects = old_detected_objects + detected_objects_count
-                    
-                    if old_analyzed_frames > 0:
-                        new_avg_time = ((old_avg_time * old_analyzed_frames) + processing_time) / new_analyzed_frames
-                    else:
-                        new_avg_time = processing_time
-                    
-                    await conn.execute('''
-                        UPDATE camera_statistics 
-                        SET analyzed_frames = $1,
-                            detected_objects = $2,
-                            average_processing_time = $3,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE date = $4
-                    ''', new_analyzed_frames, new_detected_objects, new_avg_time, current_date)
-                    
-                    logger.debug(f"Обновлена статистика для {current_date}: кадров={new_analyzed_frames}, объектов={new_detected_objects}")
-                else:
-                    # Создаем новую запись
-                    await conn.execute('''
-                        INSERT INTO camera_statistics 
-                        (date, analyzed_frames, detected_objects, average_processing_time)
-                        VALUES ($1, 1, $2, $3)
-                    ''', current_date, detected_objects_count, processing_time)
-                    
-                    logger.debug(f"Создана новая статистика для {current_date}: объектов={detected_objects_count}")
+                rows = await conn.fetch(f'''
+                    WITH frames AS (
+                        SELECT camera_id, date_trunc('{granularity}', hour)::{period_type} AS period,
+                               SUM(analyzed_frames) AS analyzed_frames
+                        FROM camera_statistics_hourly
+                        WHERE hour >= {period_start}
+                          AND ($2::text IS NULL OR camera_id = $2)
+                        GROUP BY 1, 2
+                    )
+                    SELECT
+                        r.{period_column} AS period,
+                        r.camera_id,
+                        r.object_type,
+                        r.warning_count,
+                        r.confidence_sum / NULLIF(r.warning_count, 0) AS average_confidence,
+                        f.analyzed_frames
+                    FROM {table} r
+                    LEFT JOIN frames f ON f.camera_id = r.camera_id AND f.period = r.{period_column}
+                    WHERE r.{period_column} >= {period_start}
+                      AND ($2::text IS NULL OR r.camera_id = $2)
+                      AND ($3::text IS NULL OR r.object_type = $3)
+                    ORDER BY period DESC, r.camera_id, r.object_type
+                ''', periods, camera_id, object_type)
+                
+                return [
+                    {
+                        'period': row['period'].isoformat(),
+                        'camera_id': row['camera_id'],
+                        'object_type': row['object_type'],
+                        'warning_count': row['warning_count'],
+                        'average_confidence': row['average_confidence'],
+                        'analyzed_frames': row['analyzed_frames']
+                    }
+                    for row in rows
+                ]
                 
         except Exception as e:
-            logger.error(f"Ошибка обновления статистики: {e}")
+            logger.error(f"Ошибка получения агрегатов предупреждений: {e}")
+            return []
     
     async def get_statistics(self, days: int = 7) -> List[Dict[str, Any]]:
         """Получение статистики за последние дни"""
@@ -212,7 +875,7 @@ class DatabaseManager:
                         total_frames,
                         analyzed_frames,
                         detected_objects,
-                        average_processing_time,
+                        processing_time_sum / NULLIF(analyzed_frames, 0) AS average_processing_time,
                         created_at,
                         updated_at
                     FROM camera_statistics
@@ -238,21 +901,117 @@ class DatabaseManager:
             logger.error(f"Ошибка получения статистики: {e}")
             return []
     
+    async def get_hourly_statistics(self, hours: int = 24, camera_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Получение почасовой статистики по камерам за последние часы"""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch('''
+                    SELECT 
+                        camera_id,
+                        hour,
+                        analyzed_frames,
+                        detected_objects,
+                        processing_time_sum / NULLIF(analyzed_frames, 0) AS average_processing_time,
+                        updated_at
+                    FROM camera_statistics_hourly
+                    WHERE hour >= date_trunc('hour', LOCALTIMESTAMP) - make_interval(hours => $1)
+                      AND ($2::text IS NULL OR camera_id = $2)
+                    ORDER BY hour DESC, camera_id
+                ''', hours, camera_id)
+                
+                return [
+                    {
+                        'camera_id': row['camera_id'],
+                        'hour': row['hour'].isoformat() if row['hour'] else None,
+                        'analyzed_frames': row['analyzed_frames'],
+                        'detected_objects': row['detected_objects'],
+                        'average_processing_time': row['average_processing_time'],
+                        'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
+                    }
+                    for row in rows
+                ]
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения почасовой статистики: {e}")
+            return []
+    
+    async def get_detection_counts(
+        self,
+        hours: int = 24,
+        granularity: str = 'hour',
+        camera_id: Optional[str] = None,
+        object_type: Optional[str] = None,
+        detection_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Количество детекций по (период, камера, тип объекта) за последние часы
+
+        Считается по neural_detections без разбора JSONB. granularity - 'hour' или 'day';
+        detection_type - например, 'warning' для подсчета только предупреждений.
+        """
+        if granularity not in DETECTION_GRANULARITIES:
+            raise ValueError(f"Неизвестная гранулярность: {granularity}")
+        
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch('''
+                    SELECT
+                        date_trunc($1, ts) AS period,
+                        camera_id,
+                        object_type,
+                        COUNT(*) AS count,
+                        AVG(confidence) AS average_confidence
+                    FROM neural_detections
+                    WHERE ts >= date_trunc('hour', LOCALTIMESTAMP) - make_interval(hours => $2)
+                      AND ($3::text IS NULL OR camera_id = $3)
+                      AND ($4::text IS NULL OR object_type = $4)
+                      AND ($5::text IS NULL OR detection_type = $5)
+                    GROUP BY period, camera_id, object_type
+                    ORDER BY period DESC, camera_id, object_type
+                ''', granularity, hours, camera_id, object_type, detection_type)
+                
+                return [
+                    {
+                        'period': row['period'].isoformat(),
+                        'camera_id': row['camera_id'],
+                        'object_type': row['object_type'],
+                        'count': row['count'],
+                        'average_confidence': row['average_confidence']
+                    }
+                    for row in rows
+                ]
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения количества детекций: {e}")
+            return []
+    
     async def cleanup_old_data(self, days_to_keep: int = 30) -> int:
-        """Очистка старых данных"""
+        """
+        Очистка старых данных
+
+        Результаты анализа удаляются целыми дневными секциями (DETACH + DROP),
+        без построчного DELETE. Секция удаляется, когда весь ее день старше
+        days_to_keep дней. Возвращает оценку числа удаленных строк.
+        """
         try:
             async with self.pool.acquire() as conn:
                 # Очистка старых результатов анализа
-                result = await conn.fetchrow('''
-                    WITH deleted AS (
-                        DELETE FROM neural_network_results
-                        WHERE created_at < CURRENT_TIMESTAMP - INTERVAL '%s days'
-                        RETURNING id
-                    )
-                    SELECT COUNT(*) as deleted_count FROM deleted
-                ''' % days_to_keep)
+                cutoff_day = date.today() - timedelta(days=days_to_keep)
+                deleted_count = 0
+                dropped_partitions = []
                 
-                deleted_count = result['deleted_count'] if result else 0
+                for table in PARTITIONED_TABLES:
+                    for name, day, estimated_rows in await self._list_partitions(conn, table):
+                        if day + timedelta(days=1) > cutoff_day:
+                            break
+                        
+                        await conn.execute(f'ALTER TABLE {table} DETACH PARTITION "{name}"')
+                        await conn.execute(f'DROP TABLE "{name}"')
+                        dropped_partitions.append(name)
+                        
+                        # Возвращается число результатов, детекции удаляются вместе с ними
+                        if table == 'neural_network_results':
+                            deleted_count += int(estimated_rows)
                 
                 # Очистка старой статистики (оставляем больше данных для статистики)
                 stats_days = max(days_to_keep * 2, 90)  # Минимум 90 дней статистики
@@ -261,8 +1020,19 @@ class DatabaseManager:
                     WHERE date < CURRENT_DATE - INTERVAL '%s days'
                 ''' % stats_days)
                 
-                if deleted_count > 0:
-                    logger.info(f"Удалено {deleted_count} старых записей")
+                await conn.execute('''
+                    DELETE FROM camera_statistics_hourly
+                    WHERE hour < CURRENT_DATE - INTERVAL '%s days'
+                ''' % stats_days)
+                
+                for table, period_column in WARNING_ROLLUP_TABLES.values():
+                    await conn.execute(f'''
+                        DELETE FROM {table}
+                        WHERE {period_column} < CURRENT_DATE - make_interval(days => $1)
+                    ''', stats_days)
+                
+                if dropped_partitions:
+                    logger.info(f"Удалено секций: {len(dropped_partitions)} (~{deleted_count} старых записей)")
                 
                 return deleted_count
                 
@@ -288,6 +1058,8 @@ class DatabaseManager:
                     SELECT COUNT(*) FROM camera_statistics
                 ''')
                 
+                partitions = await self._list_partitions(conn, 'neural_network_results')
+                
                 # Последняя активность
                 last_result = await conn.fetchrow('''
                     SELECT created_at FROM neural_network_results 
@@ -296,8 +1068,11 @@ class DatabaseManager:
                 
                 return {
                     'database_size': db_size['size'] if db_size else 'Unknown',
+                    'write_buffer': self.write_buffer.get_statistics(),
                     'results_count': results_count,
                     'statistics_count': stats_count,
+                    'results_partitions': len(partitions),
+                    'oldest_partition': partitions[0][1].isoformat() if partitions else None,
                     'last_activity': last_result['created_at'].isoformat() if last_result and last_result['created_at'] else None,
                     'pool_size': len(self.pool._holders) if self.pool else 0,
                     'pool_max_size': self.pool._maxsize if self.pool else 0
@@ -52,6 +52,7 @@ class DetectionResult:
 class NeuralNetworkResult:
     """Модель результата работы нейронной сети"""
     id: Optional[int] = None
+    camera_id: str = "main"
     timestamp: Optional[datetime] = None
     frame_data: Dict[str, Any] = field(default_factory=dict)
     detection_results: List[DetectionResult] = field(default_factory=list)
@@ -78,6 +79,7 @@ class NeuralNetworkResult:
         """Преобразование в словарь"""
         return {
             "id": self.id,
+            "camera_id": self.camera_id,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None,
             "frame_data": self.frame_data,
             "detection_results": [d.to_dict() for d in self.detection_results],
@@ -93,7 +95,8 @@ class CameraStatistics:
     total_frames: int = 0
     analyzed_frames: int = 0
     detected_objects: int = 0
-    average_processing_time: float = 0.0
+    average_processing_time: float = 0.0  # Вычисляется при чтении: processing_time_sum / analyzed_frames
+    processing_time_sum: float = 0.0
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
@@ -117,6 +120,7 @@ class CameraStatistics:
             "analyzed_frames": self.analyzed_frames,
             "detected_objects": self.detected_objects,
             "average_processing_time": self.average_processing_time,
+            "processing_time_sum": self.processing_time_sum,
             "analysis_rate": self.calculate_analysis_rate(),
             "detection_rate": self.calculate_detection_rate(),
             "created_at": self.created_at.isoformat() if self.created_at else None,
@@ -0,0 +1,150 @@
+"""
+Отложенная пакетная запись результатов анализа в базу данных
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+
+class ResultWriteBuffer:
+    """
+    Буфер отложенной записи (write-behind) результатов анализа.
+
+    Результаты накапливаются в памяти и записываются одной пачкой, когда
+    набирается batch_size записей или проходит flush_interval секунд.
+    Если запись не удалась, пачка возвращается в буфер и повторяется при
+    следующем сбросе; сверх max_pending вытесняются самые старые записи.
+    Методы вызываются только из event loop.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000
+    ):
+        self.flush_fn = flush_fn
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max(self.batch_size, max_pending)
+
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._flush_event: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+        self.added_count = 0
+        self.written_count = 0
+        self.dropped_count = 0
+        self.flush_count = 0
+        self.failed_flush_count = 0
+        self.last_flush_time: Optional[float] = None
+        self.last_flush_duration = 0.0
+
+    @property
+    def running(self) -> bool:
+        """Запущен ли фоновый сброс"""
+        return self._running
+
+    def start(self) -> None:
+        """Запуск фонового сброса буфера"""
+        if self._running:
+            return
+
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Отложенная запись результатов запущена (пачка {self.batch_size}, интервал {self.flush_interval}с)")
+
+    async def stop(self) -> None:
+        """Остановка фонового сброса с дозаписью оставшихся результатов"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._flush_event.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+        await self.flush()
+        if self._pending:
+            logger.error(f"При остановке не записано {len(self._pending)} результатов анализа")
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Добавление результата в буфер (без ожидания записи)"""
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped_count += 1
+
+        self._pending.append(record)
+        self.added_count += 1
+
+        if len(self._pending) >= self.batch_size:
+            self._flush_event.set()
+
+    async def flush(self) -> int:
+        """Запись всех накопленных результатов, возвращает число записанных"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = list(self._pending)
+            self._pending.clear()
+            start_time = time.time()
+
+            try:
+                await self.flush_fn(batch)
+            except Exception as e:
+                self.failed_flush_count += 1
+                logger.error(f"Ошибка пакетной записи {len(batch)} результатов: {e}")
+
+                # Возврат пачки в начало буфера для повторной попытки
+                self._pending.extendleft(reversed(batch))
+                while len(self._pending) > self.max_pending:
+                    self._pending.popleft()
+                    self.dropped_count += 1
+                return 0
+
+            self.flush_count += 1
+            self.written_count += len(batch)
+            self.last_flush_time = time.time()
+            self.last_flush_duration = self.last_flush_time - start_time
+            metrics.observe("db_flush", self.last_flush_duration)
+            logger.debug(f"Записано {len(batch)} результатов анализа за {self.last_flush_duration:.3f}с")
+            return len(batch)
+
+    async def _run(self) -> None:
+        """Цикл сброса буфера по размеру пачки или по времени"""
+        while self._running:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._flush_event.clear()
+            if self._running:
+                await self.flush()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Статистика буфера записи"""
+        return {
+            "running": self._running,
+            "pending": len(self._pending),
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "added_count": self.added_count,
+            "written_count": self.written_count,
+            "dropped_count": self.dropped_count,
+            "flush_count": self.flush_count,
+            "failed_flush_count": self.failed_flush_count,
+            "average_batch_size": round(self.written_count / self.flush_count, 1) if self.flush_count > 0 else 0,
+            "last_flush_duration": round(self.last_flush_duration, 4)
+        }
@@ -1,5 +1,5 @@
 """
-Основное приложение FastAPI (без WebSocket)
+Основное приложение FastAPI
 """
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
@@ -9,7 +9,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.database.connection import db_manager
 from app.services.neural_service import neural_service
+from app.services.storage import frame_writer
+from app.services.camera_manager import camera_manager
 from app.api.routes import router
+from app.api.websocket import websocket_live_handler, live_status_publisher
 from app.utils.logger import logger
 
 
@@ -22,8 +25,24 @@ async def lifespan(app: FastAPI):
         # Инициализация базы данных
         await db_manager.create_pool()
         
-        # Инициализация нейронной сети
-        await neural_service.initialize_model()
+        # Отложенная пакетная запись результатов анализа
+        await db_manager.start_write_buffer()
+        
+        # Заблаговременное создание дневных секций таблицы результатов
+        await db_manager.start_maintenance()
+        
+        # Фоновая запись кадров на диск
+        frame_writer.start()
+        
+        # Инициализация нейронной сети: в фоне (сервер отвечает сразу, готовность - /ready)
+        # или с ожиданием загрузки моделей до начала приема запросов
+        if settings.model_load_mode == "background":
+            neural_service.start_initialization()
+        else:
+            await neural_service.initialize_model()
+        
+        # Публикация изменений статуса для клиентов /ws/live
+        live_status_publisher.start()
         
         logger.info("Приложение успешно запущено (режим анализа)")
         
@@ -36,6 +55,20 @@ async def lifespan(app: FastAPI):
         # Завершение работы
         logger.info("Завершение работы приложения...")
         
+        # Остановка живых обновлений и всех камер
+        await live_status_publisher.stop()
+        await camera_manager.stop_all()
+        
+        # Остановка воркеров инференса
+        await neural_service.shutdown()
+        
+        # Дозапись оставшихся кадров
+        frame_writer.stop()
+        
+        # Дозапись буфера результатов (после остановки камер новых результатов нет)
+        await db_manager.stop_write_buffer()
+        await db_manager.stop_maintenance()
+        
         # Закрытие соединений
         await db_manager.close_pool()
         
@@ -67,6 +100,9 @@ def create_app() -> FastAPI:
     # Подключение маршрутов
     app.include_router(router)
     
+    # Живые обновления дашборда вместо опроса REST API
+    app.add_api_websocket_route("/ws/live", websocket_live_handler)
+    
     return app
 
 
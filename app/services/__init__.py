@@ -8,25 +8,29 @@
 
 Основные сервисы:
 - CameraService: Управление камерой и видеопотоком
+- CameraManager: Реестр камер с общим пулом инференса
 - NeuralNetworkService: Анализ кадров нейронной сетью
+- EventBus: Шина событий для живых обновлений дашборда
 - Utils: Вспомогательные функции и декораторы
 
 Архитектура:
-    CameraService получает кадры -> NeuralNetworkService анализирует -> 
-    результаты сохраняются в базу данных
+    CameraManager -> CameraService (по одному на камеру) получает кадры ->
+    NeuralNetworkService анализирует -> результаты сохраняются в базу данных
 
 Использование:
-    from app.services import camera_service, neural_service
+    from app.services import camera_manager, neural_service
     
     # Запуск камеры
-    await camera_service.start_streaming()
+    await camera_manager.get("main").start_streaming()
     
     # Обработка кадра
     results = await neural_service.process_frame(frame)
 """
 
-from app.services.camera_service import CameraService, camera_service
+from app.services.camera_service import CameraService
+from app.services.camera_manager import CameraManager, camera_manager
 from app.services.neural_service import NeuralNetworkService, neural_service
+from app.services.event_bus import EventBus, event_bus
 from app.services.utils import (
     async_retry,
     measure_time,
@@ -39,9 +43,12 @@ from app.services.utils import (
 __all__ = [
     # Сервисы
     "CameraService",
-    "camera_service",
+    "CameraManager",
+    "camera_manager",
     "NeuralNetworkService", 
     "neural_service",
+    "EventBus",
+    "event_bus",
     
     # Утилиты
     "async_retry",
@@ -0,0 +1,112 @@
+"""
+Ограниченное окно одновременных анализов кадров одной камеры
+"""
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import numpy as np
+
+
+ANALYSIS_DROP_POLICIES = ("drop_oldest", "drop_newest", "coalesce")
+
+
+class AnalysisWindow:
+    """
+    Окно анализов камеры: не больше max_in_flight анализов одновременно
+    и не больше pending_size кадров в ожидании.
+
+    Политики при заполненном окне:
+    - drop_oldest: новый кадр встает в очередь, при переполнении вытесняется самый старый;
+    - drop_newest: новый кадр отбрасывается, если очередь заполнена;
+    - coalesce: кадры не хранятся, запоминается только необходимость анализа -
+      при освобождении окна анализируется самый свежий кадр камеры.
+
+    Объем памяти ограничен: max_in_flight + pending_size кадров (coalesce - только max_in_flight).
+    Методы вызываются только из event loop.
+    """
+
+    def __init__(self, max_in_flight: int = 1, pending_size: int = 1, policy: str = "coalesce"):
+        if policy not in ANALYSIS_DROP_POLICIES:
+            raise ValueError(f"Неизвестная политика сброса кадров: {policy}")
+
+        self.max_in_flight = max(1, max_in_flight)
+        self.pending_size = max(0, pending_size) if policy != "coalesce" else min(1, max(0, pending_size))
+        self.policy = policy
+
+        self._pending: Deque[Optional[np.ndarray]] = deque()
+        self.in_flight = 0
+
+        self.started_count = 0
+        self.queued_count = 0
+        self.dropped_count = 0
+        self.coalesced_count = 0
+
+    @property
+    def stores_frames(self) -> bool:
+        """Нужно ли передавать кадр в defer (при coalesce кадр берется при запуске)"""
+        return self.policy != "coalesce" and self.pending_size > 0
+
+    def try_acquire(self) -> bool:
+        """Занять место в окне для немедленного анализа"""
+        if self.in_flight >= self.max_in_flight:
+            return False
+        self.in_flight += 1
+        self.started_count += 1
+        return True
+
+    def defer(self, frame: Optional[np.ndarray]) -> None:
+        """Отложить кадр при заполненном окне согласно политике"""
+        if self.pending_size == 0:
+            self.dropped_count += 1
+            return
+
+        if self.policy == "coalesce":
+            if self._pending:
+                self.coalesced_count += 1
+            else:
+                self._pending.append(None)
+                self.queued_count += 1
+            return
+
+        if len(self._pending) >= self.pending_size:
+            self.dropped_count += 1
+            if self.policy == "drop_newest":
+                return
+            self._pending.popleft()
+
+        self._pending.append(frame)
+        self.queued_count += 1
+
+    def release(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Освободить место после завершения анализа.
+
+        Возвращает (True, кадр) если из очереди нужно сразу запустить следующий анализ
+        (кадр None - взять самый свежий кадр камеры), иначе (False, None).
+        """
+        self.in_flight = max(0, self.in_flight - 1)
+
+        if not self._pending:
+            return False, None
+
+        self.in_flight += 1
+        self.started_count += 1
+        return True, self._pending.popleft()
+
+    def clear(self) -> None:
+        """Сброс ожидающих кадров (остановка камеры)"""
+        self._pending.clear()
+
+    def get_statistics(self) -> dict:
+        """Статистика окна анализов"""
+        return {
+            "policy": self.policy,
+            "max_in_flight": self.max_in_flight,
+            "pending_size": self.pending_size,
+            "in_flight": self.in_flight,
+            "pending": len(self._pending),
+            "started_count": self.started_count,
+            "queued_count": self.queued_count,
+            "dropped_count": self.dropped_count,
+            "coalesced_count": self.coalesced_count
+        }
@@ -0,0 +1,94 @@
+"""
+Реестр камер: несколько CameraService с общим пулом инференса
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from app.utils.logger import logger
+from app.config import settings
+from app.services.camera_service import CameraService
+
+
+class CameraManager:
+    """
+    Менеджер камер.
+
+    Каждая камера имеет собственный поток захвата, интервал анализа и
+    статистику, а инференс выполняется общим пулом воркеров NeuralNetworkService.
+    """
+
+    def __init__(self, cameras_config: List[dict]):
+        self.cameras: Dict[str, CameraService] = {}
+        self.names: Dict[str, Optional[str]] = {}
+
+        for camera in cameras_config:
+            self.cameras[camera["id"]] = CameraService(
+                camera["rtsp_url"],
+                camera_id=camera["id"],
+                analysis_interval=camera.get("analysis_interval")
+            )
+            self.names[camera["id"]] = camera.get("name")
+
+        self.default_camera_id = cameras_config[0]["id"] if cameras_config else None
+
+    def get(self, camera_id: str) -> Optional[CameraService]:
+        """Получение сервиса камеры по идентификатору"""
+        return self.cameras.get(camera_id)
+
+    def get_default(self) -> Optional[CameraService]:
+        """Получение камеры по умолчанию (первой в конфигурации)"""
+        return self.cameras.get(self.default_camera_id) if self.default_camera_id else None
+
+    def is_any_running(self) -> bool:
+        """Проверка, запущена ли хотя бы одна камера"""
+        return any(camera.is_running() for camera in self.cameras.values())
+
+    async def start_all(self) -> Dict[str, bool]:
+        """Параллельный запуск всех камер"""
+        camera_ids = list(self.cameras)
+        results = await asyncio.gather(
+            *[self.cameras[camera_id].start_streaming() for camera_id in camera_ids],
+            return_exceptions=True
+        )
+
+        started = {camera_id: result is True for camera_id, result in zip(camera_ids, results)}
+        logger.info(f"Запущено камер: {sum(started.values())}/{len(started)}")
+        return started
+
+    async def stop_all(self) -> None:
+        """Остановка всех камер"""
+        await asyncio.gather(
+            *[camera.stop_streaming() for camera in self.cameras.values() if camera.is_running()],
+            return_exceptions=True
+        )
+
+    def list_cameras(self) -> List[Dict[str, Any]]:
+        """Краткая информация по всем камерам"""
+        return [
+            {
+                "camera_id": camera_id,
+                "name": self.names.get(camera_id),
+                "rtsp_url": camera.rtsp_url,
+                "active": camera.is_running(),
+                "analysis_interval": camera.analysis_interval,
+                "frame_count": camera.frame_count,
+                "analyzed_frame_count": camera.analyzed_frame_count,
+                "error_count": camera.error_count
+            }
+            for camera_id, camera in self.cameras.items()
+        ]
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Сводная статистика по камерам"""
+        running = [camera for camera in self.cameras.values() if camera.is_running()]
+        return {
+            "total": len(self.cameras),
+            "running": len(running),
+            "default_camera_id": self.default_camera_id,
+            "total_frames": sum(camera.frame_count for camera in running),
+            "analyzed_frames": sum(camera.analyzed_frame_count for camera in running)
+        }
+
+
+# Глобальный реестр камер
+camera_manager = CameraManager(settings.get_cameras_config())
@@ -7,19 +7,30 @@ import numpy as np
 from typing import Optional
 import time
 import os
+import random
+from datetime import datetime
 
 from app.utils.logger import logger
 from app.config import settings
-from app.services.neural_service import neural_service
+from app.services.neural_service import neural_service, ModelNotReadyError
+from app.services.inference_executor import InferenceQueueFullError
+from app.services.frame_capture import FrameCapture
+from app.services.analysis_window import AnalysisWindow
+from app.services.event_bus import event_bus
+from app.utils.metrics import metrics
 from app.database.connection import db_manager
 
 
 class CameraService:
     """Сервис для работы с IP камерой (оптимизирован для 25 FPS)"""
     
-    def __init__(self, rtsp_url: str):
+    def __init__(self, rtsp_url: str, camera_id: str = "main", analysis_interval: Optional[float] = None):
+        self.camera_id = camera_id
         self.rtsp_url = rtsp_url
+        self.analysis_interval = analysis_interval or settings.analysis_interval
         self.cap: Optional[cv2.VideoCapture] = None
+        self.capture: Optional[FrameCapture] = None
+        self.camera_info: dict = {}
         self.running = False
         self.last_analysis_time = 0
         self.frame_count = 0
@@ -28,119 +39,180 @@ class CameraService:
         self.error_count = 0
         self.max_errors = 10
         self.frame_skip_counter = 0  # Счетчик для пропуска кадров
+        self.rejected_analysis_count = 0  # Кадры, не принятые переполненной очередью инференса
+        self.not_ready_skip_count = 0  # Кадры, пропущенные до окончания загрузки модели
+        self.analysis_window = self._create_analysis_window()
+        
+        # Анализ по движению: интервал между ANALYSIS_INTERVAL (движение) и ANALYSIS_MAX_INTERVAL (статичная сцена)
+        self.motion_gating = settings.motion_gating
+        self.max_analysis_interval = max(settings.analysis_max_interval, self.analysis_interval)
+        self.current_interval = self.analysis_interval
+        self.motion_analysis_count = 0  # Анализы, запущенные при обнаруженном движении
+        self.static_analysis_count = 0  # Анализы статичной сцены (по нижней частоте)
         
     async def start_streaming(self) -> bool:
         """Запуск обработки потока с камеры (оптимизирован для 25 FPS)"""
         if self.running:
-            logger.warning("Камера уже запущена")
+            logger.warning(f"[{self.camera_id}] Камера уже запущена")
             return False
         
         try:
-            # Подключение к камере
-            self.cap = cv2.VideoCapture(self.rtsp_url)
-            
-            # Настройка параметров камеры для 25 FPS
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, settings.camera_width)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, settings.camera_height)
-            self.cap.set(cv2.CAP_PROP_FPS, settings.camera_fps)
-            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, settings.buffer_size)
-            
-            # Дополнительные настройки для RTSP и 25 FPS
-            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('H', '2', '6', '4'))
-            
-            # Настройки для уменьшения задержки при высоком FPS
-            os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = (
-                'rtsp_transport;udp|'
-                'fflags;nobuffer|'
-                'flags;low_delay|'
-                'framedrop;1'
-            )
-            
-            if not self.cap.isOpened():
-                logger.error("Не удалось подключиться к камере")
+            # Подключение к камере и тестовое чтение выполняются вне event loop
+            test_frame = await asyncio.to_thread(self._open_capture)
+            if test_frame is None:
+                await self.stop_streaming()
                 return False
             
-            # Тестовое чтение кадра
-            ret, test_frame = self.cap.read()
-            if not ret:
-                logger.error("Не удалось получить тестовый кадр с камеры")
-                return False
-            
-            # Получение фактических параметров камеры
-            actual_fps = self.cap.get(cv2.CAP_PROP_FPS)
-            actual_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            actual_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            
             self.running = True
             self.frame_count = 0
             self.analyzed_frame_count = 0
             self.error_count = 0
             self.frame_skip_counter = 0
+            self.rejected_analysis_count = 0
+            self.not_ready_skip_count = 0
+            self.analysis_window = self._create_analysis_window()
+            self.motion_analysis_count = 0
+            self.static_analysis_count = 0
+            self.current_interval = self.analysis_interval
             self.start_time = time.time()
-            self.last_analysis_time = time.time()
+            # Случайная фаза разносит анализ разных камер во времени
+            self.last_analysis_time = time.time() - random.uniform(0, self.analysis_interval)
+            
+            # Запуск потока захвата с кольцевым буфером кадров
+            self.capture = FrameCapture(
+                self.cap,
+                buffer_slots=settings.capture_buffer_slots,
+                motion_sample_every=settings.motion_sample_every_n if self.motion_gating else 0,
+                camera_id=self.camera_id
+            )
+            self.capture.start(test_frame, name=f"capture-{self.camera_id}")
             
-            logger.info(f"Камера подключена: {self.rtsp_url}")
-            logger.info(f"Параметры: {actual_width}x{actual_height} @ {actual_fps} FPS")
-            logger.info(f"Анализ: каждые {settings.analysis_interval} сек (примерно каждый {int(actual_fps * settings.analysis_interval)} кадр)")
+            logger.info(f"[{self.camera_id}] Камера подключена: {self.rtsp_url}")
+            logger.info(f"[{self.camera_id}] Параметры: {self.camera_info['width']}x{self.camera_info['height']} @ {self.camera_info['fps']} FPS")
+            logger.info(f"[{self.camera_id}] Анализ: каждые {self.analysis_interval} сек (примерно каждый {int(self.camera_info['fps'] * self.analysis_interval)} кадр)")
+            if self.motion_gating:
+                logger.info(f"[{self.camera_id}] Без движения интервал анализа растет до {self.max_analysis_interval} сек")
             
-            # Запуск асинхронной обработки кадров
+            # Запуск асинхронного планировщика анализа кадров
             asyncio.create_task(self._process_frames())
             
             return True
             
         except Exception as e:
-            logger.error(f"Ошибка при запуске камеры: {e}")
+            logger.error(f"[{self.camera_id}] Ошибка при запуске камеры: {e}")
             await self.stop_streaming()
             return False
     
+    def _open_capture(self) -> Optional[np.ndarray]:
+        """Подключение к камере и чтение тестового кадра (блокирующее)"""
+        # Подключение к камере
+        self.cap = cv2.VideoCapture(self.rtsp_url)
+        
+        # Настройка параметров камеры для 25 FPS
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, settings.camera_width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, settings.camera_height)
+        self.cap.set(cv2.CAP_PROP_FPS, settings.camera_fps)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, settings.buffer_size)
+        
+        # Дополнительные настройки для RTSP и 25 FPS
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('H', '2', '6', '4'))
+        
+        # Настройки для уменьшения задержки при высоком FPS
+        os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = (
+            'rtsp_transport;udp|'
+            'fflags;nobuffer|'
+            'flags;low_delay|'
+            'framedrop;1'
+        )
+        
+        if not self.cap.isOpened():
+            logger.error(f"[{self.camera_id}] Не удалось подключиться к камере")
+            return None
+        
+        # Тестовое чтение кадра
+        ret, test_frame = self.cap.read()
+        if not ret:
+            logger.error(f"[{self.camera_id}] Не удалось получить тестовый кадр с камеры")
+            return None
+        
+        # Фактические параметры камеры запоминаются один раз:
+        # после запуска VideoCapture принадлежит потоку захвата
+        fourcc = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        self.camera_info = {
+            "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.cap.get(cv2.CAP_PROP_FPS),
+            "codec": "".join([chr((fourcc >> 8 * i) & 0xFF) for i in range(4)]),
+            "buffer_size": int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE))
+        }
+        
+        return test_frame
+    
+    def _create_analysis_window(self) -> AnalysisWindow:
+        """Окно одновременных анализов камеры по настройкам"""
+        return AnalysisWindow(
+            max_in_flight=settings.analysis_max_in_flight,
+            pending_size=settings.analysis_pending_size,
+            policy=settings.analysis_drop_policy
+        )
+    
     async def stop_streaming(self) -> None:
         """Остановка обработки потока"""
         self.running = False
+        self.analysis_window.clear()
+        
+        if self.capture:
+            await asyncio.to_thread(self.capture.stop)
+            self.capture = None
         
         if self.cap:
             self.cap.release()
             self.cap = None
         
-        logger.info("Камера остановлена")
+        logger.info(f"[{self.camera_id}] Камера остановлена")
     
     async def _process_frames(self) -> None:
-        """Основной цикл обработки кадров (оптимизирован для 25 FPS)"""
-        consecutive_errors = 0
+        """Планировщик анализа: берет самый свежий кадр из потока захвата"""
         last_fps_log = time.time()
+        last_sequence = 0
+        capture = self.capture
         
-        # Расчет интервала для анализа кадров
-        frames_per_analysis = int(settings.camera_fps * settings.analysis_interval)
-        
-        logger.info(f"Запуск обработки: анализ каждого {frames_per_analysis}-го кадра")
+        logger.info(f"[{self.camera_id}] Запуск обработки: анализ последнего кадра каждые {self.analysis_interval} сек")
         
         while self.running:
-            loop_start = time.time()
-            
             try:
-                # Получение кадра
-                ret, frame = self.cap.read()
+                # Камера перезапущена или остановлена - этот цикл больше не актуален
+                if self.capture is not capture:
+                    break
                 
-                if not ret:
-                    consecutive_errors += 1
-                    logger.warning(f"Не удалось получить кадр с камеры (ошибка {consecutive_errors})")
-                    
-                    if consecutive_errors >= 5:
-                        logger.error("Слишком много ошибок чтения кадров, останавливаем поток")
-                        break
-                    
-                    await asyncio.sleep(0.1)
-                    continue
+                if not capture.is_alive():
+                    logger.error(f"[{self.camera_id}] Поток захвата кадров остановлен, останавливаем камеру")
+                    break
                 
-                # Сброс счетчика ошибок при успешном чтении
-                consecutive_errors = 0
-                self.frame_count += 1
+                self.frame_count = capture.frame_count
                 current_time = time.time()
                 
-                # Анализ кадра по таймеру (каждую секунду)
-                if current_time - self.last_analysis_time >= settings.analysis_interval:
+                # Анализ кадра по таймеру: всегда самый свежий кадр, без очереди устаревших.
+                # При движении в кадре - с основной частотой, иначе по растущему интервалу
+                motion_detected = self._is_motion_detected(capture)
+                target_interval = self.analysis_interval if motion_detected else self.current_interval
+                
+                if current_time - self.last_analysis_time >= target_interval and capture.sequence != last_sequence:
+                    window = self.analysis_window
                     self.last_analysis_time = current_time
-                    self.analyzed_frame_count += 1
-                    asyncio.create_task(self._analyze_frame(frame.copy()))
+                    self._update_interval(capture, motion_detected)
+                    
+                    # Окно анализов камеры ограничено: при перегрузке кадры не копятся
+                    # без предела, а откладываются или отбрасываются по политике
+                    if window.try_acquire():
+                        last_sequence, frame = capture.get_latest()
+                        self._start_analysis(frame, window)
+                    elif window.stores_frames:
+                        last_sequence, frame = capture.get_latest()
+                        window.defer(frame)
+                    else:
+                        last_sequence = capture.sequence
+                        window.defer(None)
                 
                 # Логирование FPS каждые 30 секунд
                 if current_time - last_fps_log >= 30:
@@ -148,44 +220,114 @@ class CameraService:
                     current_fps = self.frame_count / uptime if uptime > 0 else 0
                     analysis_rate = self.analyzed_frame_count / uptime if uptime > 0 else 0
                     
-                    logger.info(f"Статистика: {current_fps:.1f} FPS получено, {analysis_rate:.2f} анализов/сек")
+                    logger.info(f"[{self.camera_id}] Статистика: {current_fps:.1f} FPS получено, {analysis_rate:.2f} анализов/сек")
                     last_fps_log = current_time
                 
-                # Адаптивная задержка для снижения нагрузки CPU
-                # Не пытаемся поддерживать точный FPS, просто уменьшаем нагрузку
-                processing_time = time.time() - loop_start
-                if processing_time < 0.02:  # Если обработка заняла меньше 20мс
-                    await asyncio.sleep(0.01)  # Небольшая пауза
+                # Ожидание до следующего анализа (не дольше секунды, чтобы замечать остановку захвата;
+                # при анализе по движению - не дольше основного интервала, чтобы не пропустить движение)
+                max_sleep = min(1.0, self.analysis_interval) if self.motion_gating else 1.0
+                next_analysis_in = target_interval - (time.time() - self.last_analysis_time)
+                await asyncio.sleep(min(max(next_analysis_in, 0.01), max_sleep))
                 
             except Exception as e:
                 self.error_count += 1
-                logger.error(f"Ошибка в цикле обработки кадров: {e}")
+                logger.error(f"[{self.camera_id}] Ошибка в цикле обработки кадров: {e}")
                 
                 if self.error_count >= self.max_errors:
-                    logger.error("Превышен лимит ошибок, останавливаем камеру")
+                    logger.error(f"[{self.camera_id}] Превышен лимит ошибок, останавливаем камеру")
                     break
                 
                 await asyncio.sleep(1.0)
         
-        # Остановка при выходе из цикла
-        await self.stop_streaming()
+        # Остановка при выходе из цикла (если сессия захвата все еще текущая)
+        if self.running and self.capture is capture:
+            await self.stop_streaming()
     
-    async def _analyze_frame(self, frame: np.ndarray) -> None:
+    def _is_motion_detected(self, capture: FrameCapture) -> bool:
+        """Было ли движение в кадре с момента последнего анализа"""
+        if not self.motion_gating:
+            return True
+        return capture.motion_peak >= settings.motion_threshold
+    
+    def _update_interval(self, capture: FrameCapture, motion_detected: bool) -> None:
+        """Пересчет интервала анализа: движение - основная частота, статичная сцена - удвоение до верхней границы"""
+        if not self.motion_gating:
+            return
+        
+        capture.take_motion_peak()
+        if motion_detected:
+            self.motion_analysis_count += 1
+            self.current_interval = self.analysis_interval
+        else:
+            self.static_analysis_count += 1
+            self.current_interval = min(self.current_interval * 2, self.max_analysis_interval)
+    
+    def _start_analysis(self, frame: np.ndarray, window: AnalysisWindow) -> None:
+        """Запуск анализа кадра, место в окне уже занято"""
+        self.analyzed_frame_count += 1
+        metrics.inc("frames_analyzed", self.camera_id)
+        asyncio.create_task(self._analyze_frame(frame, window))
+    
+    def _finish_analysis(self, window: AnalysisWindow) -> None:
+        """Освобождение места в окне и запуск отложенного анализа, если он есть"""
+        # Окно прошлой сессии камеры или камера остановлена - отложенные кадры не нужны,
+        # место освобождается один раз без запуска следующего анализа
+        if window is not self.analysis_window or not self.running or self.capture is None:
+            window.clear()
+            window.release()
+            return
+        
+        has_next, frame = window.release()
+        if not has_next:
+            return
+        
+        if frame is None:
+            _, frame = self.capture.get_latest()
+        self._start_analysis(frame, window)
+    
+    async def _analyze_frame(self, frame: np.ndarray, window: AnalysisWindow) -> None:
         """Асинхронный анализ кадра нейронной сетью"""
         try:
             analysis_start = time.time()
             
             # Обработка кадра нейронной сетью
-            results, processing_time = await neural_service.process_frame(frame)
+            results, processing_time = await neural_service.process_frame(frame, self.camera_id)
+            
+            # Сохранение результатов в базу данных (при отложенной записи - постановка в буфер)
+            save_start = time.perf_counter()
+            result_time = datetime.now()
+            result_id = await db_manager.save_neural_result(results, processing_time, self.camera_id, result_time)
+            metrics.observe("db_save", time.perf_counter() - save_start, self.camera_id)
             
-            # Сохранение результатов в базу данных
-            await db_manager.save_neural_result(results, processing_time)
+            # Рассылка результата клиентам /ws/live (без обращения к базе). При отложенной
+            # записи id еще нет (None), клиенты различают результаты по (camera_id, timestamp)
+            timestamp = result_time.isoformat()
+            event_bus.publish("result", {
+                "id": result_id,
+                "camera_id": self.camera_id,
+                "timestamp": timestamp,
+                "created_at": timestamp,
+                "detection_results": results,
+                "processing_time": processing_time
+            })
             
             total_time = time.time() - analysis_start
-            logger.debug(f"Анализ кадра завершен за {total_time:.3f}с (нейросеть: {processing_time:.3f}с)")
+            metrics.observe("analysis", total_time, self.camera_id)
+            logger.debug(f"[{self.camera_id}] Анализ кадра завершен за {total_time:.3f}с (нейросеть: {processing_time:.3f}с)")
                 
+        except InferenceQueueFullError as e:
+            self.rejected_analysis_count += 1
+            metrics.inc("frames_rejected", self.camera_id)
+            logger.debug(f"[{self.camera_id}] Кадр пропущен: {e}")
+        except ModelNotReadyError as e:
+            # Модели еще загружаются в фоне: кадр пропускается без записи пустого результата
+            self.not_ready_skip_count += 1
+            logger.debug(f"[{self.camera_id}] Кадр пропущен: {e}")
         except Exception as e:
-            logger.error(f"Ошибка при анализе кадра: {e}")
+            logger.error(f"[{self.camera_id}] Ошибка при анализе кадра: {e}")
+        finally:
+            del frame
+            self._finish_analysis(window)
     
     def get_status(self) -> dict:
         """Получение статуса камеры"""
@@ -194,6 +336,7 @@ class CameraService:
         analysis_rate = self.analyzed_frame_count / uptime if uptime > 0 else 0
         
         return {
+            "camera_id": self.camera_id,
             "active": self.running,
             "frame_count": self.frame_count,
             "analyzed_frame_count": self.analyzed_frame_count,
@@ -201,12 +344,17 @@ class CameraService:
             "current_fps": round(fps, 2),
             "analysis_rate": round(analysis_rate, 3),
             "target_fps": settings.camera_fps,
-            "analysis_interval": settings.analysis_interval,
+            "analysis_interval": self.analysis_interval,
+            "current_analysis_interval": self.current_interval,
+            "motion_gating": self.motion_gating,
+            "motion_score": round(self.capture.motion_score, 2) if self.capture else None,
+            "motion_analysis_count": self.motion_analysis_count,
+            "static_analysis_count": self.static_analysis_count,
             "rtsp_url": self.rtsp_url,
             "error_count": self.error_count,
             "last_analysis": self.last_analysis_time,
             "analysis_only": True,
-            "efficiency": round((analysis_rate / (1/settings.analysis_interval)) * 100, 1) if settings.analysis_interval > 0 else 0
+            "efficiency": round((analysis_rate / (1/self.analysis_interval)) * 100, 1) if self.analysis_interval > 0 else 0
         }
     
     def is_running(self) -> bool:
@@ -215,40 +363,26 @@ class CameraService:
     
     async def restart_camera(self) -> bool:
         """Перезапуск камеры"""
-        logger.info("Перезапуск камеры...")
+        logger.info(f"[{self.camera_id}] Перезапуск камеры...")
         await self.stop_streaming()
         await asyncio.sleep(3)  # Увеличенная пауза для стабильности
         return await self.start_streaming()
     
     def get_camera_info(self) -> dict:
         """Получение информации о камере"""
-        if not self.cap or not self.cap.isOpened():
+        if not self.running or not self.camera_info:
             return {"connected": False}
         
-        try:
-            width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = self.cap.get(cv2.CAP_PROP_FPS)
-            fourcc = int(self.cap.get(cv2.CAP_PROP_FOURCC))
-            buffer_size = int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE))
-            
-            # Декодирование FOURCC
-            fourcc_str = "".join([chr((fourcc >> 8 * i) & 0xFF) for i in range(4)])
-            
-            return {
-                "connected": True,
-                "width": width,
-                "height": height,
-                "fps": fps,
-                "target_fps": settings.camera_fps,
-                "codec": fourcc_str,
-                "buffer_size": buffer_size,
-                "analysis_only": True,
-                "optimized_for_25fps": True
-            }
-        except Exception as e:
-            logger.error(f"Ошибка получения информации о камере: {e}")
-            return {"connected": False, "error": str(e)}
+        return {
+            "connected": True,
+            **self.camera_info,
+            "target_fps": settings.camera_fps,
+            "capture_thread_alive": self.capture.is_alive() if self.capture else False,
+            "capture_buffer_slots": self.capture.buffer_slots if self.capture else 0,
+            "latest_sequence": self.capture.sequence if self.capture else 0,
+            "analysis_only": True,
+            "optimized_for_25fps": True
+        }
     
     def get_performance_stats(self) -> dict:
         """Получение статистики производительности"""
@@ -258,21 +392,31 @@ class CameraService:
         uptime = time.time() - self.start_time
         fps = self.frame_count / uptime if uptime > 0 else 0
         analysis_rate = self.analyzed_frame_count / uptime if uptime > 0 else 0
-        expected_analysis_rate = 1 / settings.analysis_interval if settings.analysis_interval > 0 else 0
+        expected_analysis_rate = 1 / self.analysis_interval if self.analysis_interval > 0 else 0
         
         return {
+            "camera_id": self.camera_id,
             "uptime_seconds": uptime,
             "total_frames": self.frame_count,
             "analyzed_frames": self.analyzed_frame_count,
             "average_fps": round(fps, 2),
             "analysis_rate_per_second": round(analysis_rate, 3),
+            # Частоты за скользящее окно METRICS_WINDOW (средние выше - за все время работы)
+            "window_fps": round(metrics.get_rate("frames_captured", self.camera_id), 2),
+            "window_analysis_rate": round(metrics.get_rate("frames_analyzed", self.camera_id), 3),
+            "window_rejected_rate": round(metrics.get_rate("frames_rejected", self.camera_id), 3),
+            "stage_latency": metrics.get_stage_summary(self.camera_id),
             "expected_analysis_rate": round(expected_analysis_rate, 3),
             "analysis_efficiency_percent": round((analysis_rate / expected_analysis_rate) * 100, 1) if expected_analysis_rate > 0 else 0,
             "frames_per_analysis": round(fps / analysis_rate, 1) if analysis_rate > 0 else 0,
             "error_count": self.error_count,
+            "read_error_count": self.capture.read_error_count if self.capture else 0,
+            "rejected_analysis_count": self.rejected_analysis_count,
+            "not_ready_skip_count": self.not_ready_skip_count,
+            "analysis_window": self.analysis_window.get_statistics(),
+            "dropped_analysis_count": self.analysis_window.dropped_count,
+            "queued_analysis_count": self.analysis_window.queued_count,
+            "coalesced_analysis_count": self.analysis_window.coalesced_count,
             "error_rate_percent": round((self.error_count / self.frame_count) * 100, 2) if self.frame_count > 0 else 0
         }
 
-
-# Глобальный экземпляр сервиса камеры
-camera_service = CameraService(settings.rtsp_url)
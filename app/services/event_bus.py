@@ -0,0 +1,73 @@
+"""
+Внутрипроцессная шина событий для живых обновлений дашборда
+"""
+import asyncio
+import time
+from typing import Any, Dict, Set
+
+from app.config import settings
+from app.utils.logger import logger
+
+
+class EventBus:
+    """
+    Публикация событий подписчикам (pub/sub) в пределах процесса.
+
+    У каждого подписчика своя ограниченная очередь: publish не ждет
+    медленных клиентов, при переполнении у подписчика вытесняется самое
+    старое событие. Стоимость публикации без подписчиков - одна проверка.
+    Методы вызываются только из event loop.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = max(1, queue_size)
+        self._subscribers: Set[asyncio.Queue] = set()
+
+        self.published_count = 0
+        self.delivered_count = 0
+        self.dropped_count = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        """Количество подписчиков"""
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Подписка на события, возвращает очередь подписчика"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        logger.debug(f"Новый подписчик шины событий (всего {len(self._subscribers)})")
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Отписка от событий"""
+        self._subscribers.discard(queue)
+
+    def publish(self, event_type: str, data: Any) -> None:
+        """Публикация события всем подписчикам (без ожидания)"""
+        if not self._subscribers:
+            return
+
+        event = {"type": event_type, "time": time.time(), "data": data}
+        self.published_count += 1
+
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped_count += 1
+            queue.put_nowait(event)
+            self.delivered_count += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Статистика шины событий"""
+        return {
+            "subscribers": len(self._subscribers),
+            "queue_size": self.queue_size,
+            "published_count": self.published_count,
+            "delivered_count": self.delivered_count,
+            "dropped_count": self.dropped_count
+        }
+
+
+# Глобальный экземпляр шины событий
+event_bus = EventBus(queue_size=settings.live_queue_size)
@@ -0,0 +1,161 @@
+"""
+Поток захвата кадров с камеры с кольцевым буфером
+"""
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+
+class FrameCapture:
+    """
+    Захват кадров в отдельном потоке.
+
+    Поток непрерывно декодирует поток камеры в заранее выделенные слоты
+    кольцевого буфера и публикует номер последнего кадра. Потребители
+    из event loop получают только самый свежий кадр и никогда не
+    блокируются на VideoCapture.
+
+    При motion_sample_every > 0 на каждом N-м кадре оценивается движение:
+    средняя разница уменьшенных полутоновых копий соседних замеров.
+    """
+
+    MOTION_THUMBNAIL_SIZE = (64, 36)
+
+    def __init__(self, cap: cv2.VideoCapture, buffer_slots: int = 3, max_consecutive_errors: int = 5,
+                 motion_sample_every: int = 0, camera_id: Optional[str] = None):
+        self.cap = cap
+        self.camera_id = camera_id
+        self.buffer_slots = max(2, buffer_slots)
+        self.max_consecutive_errors = max_consecutive_errors
+        self.motion_sample_every = motion_sample_every
+
+        self._slots: List[Optional[np.ndarray]] = [None] * self.buffer_slots
+        self._latest_index = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.frame_count = 0
+        self.read_error_count = 0
+        self.last_frame_time: Optional[float] = None
+        self.failed = False
+
+        self._motion_thumbnail: Optional[np.ndarray] = None
+        self._motion_peak = 0.0
+        self.motion_score = 0.0
+
+    def start(self, first_frame: np.ndarray, name: str = "frame-capture") -> None:
+        """Выделение буфера по размеру первого кадра и запуск потока захвата"""
+        for i in range(self.buffer_slots):
+            self._slots[i] = np.empty_like(first_frame)
+        np.copyto(self._slots[0], first_frame)
+        self._publish(0)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановка потока захвата (блокирующая, вызывать вне event loop)"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_alive(self) -> bool:
+        """Проверка, работает ли поток захвата"""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def sequence(self) -> int:
+        """Номер последнего опубликованного кадра"""
+        return self._sequence
+
+    def get_latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        """Получение копии последнего кадра и его номера"""
+        with self._lock:
+            if self._latest_index < 0:
+                return 0, None
+            return self._sequence, self._slots[self._latest_index].copy()
+
+    def take_motion_peak(self) -> float:
+        """Максимальная оценка движения с прошлого вызова (со сбросом)"""
+        with self._lock:
+            peak, self._motion_peak = self._motion_peak, 0.0
+            return peak
+
+    @property
+    def motion_peak(self) -> float:
+        """Максимальная оценка движения с прошлого take_motion_peak (без сброса)"""
+        return self._motion_peak
+
+    def _update_motion(self, frame: np.ndarray) -> None:
+        """Оценка движения по уменьшенной полутоновой копии кадра"""
+        small = cv2.resize(frame, self.MOTION_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        thumbnail = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        if self._motion_thumbnail is not None:
+            self.motion_score = float(cv2.absdiff(thumbnail, self._motion_thumbnail).mean())
+            with self._lock:
+                self._motion_peak = max(self._motion_peak, self.motion_score)
+
+        self._motion_thumbnail = thumbnail
+
+    def _publish(self, index: int) -> None:
+        """Публикация слота как последнего кадра"""
+        with self._lock:
+            self._latest_index = index
+            self._sequence += 1
+            self.frame_count += 1
+            self.last_frame_time = time.time()
+
+    def _run(self) -> None:
+        """Цикл потока захвата"""
+        consecutive_errors = 0
+
+        while not self._stop_event.is_set():
+            # Запись идет в слот, следующий за последним опубликованным,
+            # поэтому читаемый потребителем кадр не перезаписывается
+            index = (self._latest_index + 1) % self.buffer_slots
+            buffer = self._slots[index]
+
+            read_start = time.perf_counter()
+            try:
+                ret, frame = self.cap.read(buffer)
+            except Exception as e:
+                logger.error(f"Ошибка чтения кадра в потоке захвата: {e}")
+                ret, frame = False, None
+
+            if not ret or frame is None:
+                consecutive_errors += 1
+                self.read_error_count += 1
+                logger.warning(f"Не удалось получить кадр с камеры (ошибка {consecutive_errors})")
+
+                if consecutive_errors >= self.max_consecutive_errors:
+                    logger.error("Слишком много ошибок чтения кадров, останавливаем поток захвата")
+                    self.failed = True
+                    break
+
+                self._stop_event.wait(0.1)
+                continue
+
+            consecutive_errors = 0
+            metrics.observe("capture", time.perf_counter() - read_start, self.camera_id)
+            metrics.inc("frames_captured", self.camera_id)
+
+            # При смене разрешения потока OpenCV выделяет новый массив
+            if frame is not buffer:
+                self._slots[index] = frame
+
+            # Оценка движения по только что декодированному кадру (в потоке захвата, вне event loop)
+            if self.motion_sample_every > 0 and self.frame_count % self.motion_sample_every == 0:
+                self._update_motion(frame)
+
+            self._publish(index)
@@ -0,0 +1,176 @@
+"""
+Исполнитель инференса нейронной сети вне event loop
+"""
+import asyncio
+import multiprocessing
+import queue
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+
+# Процессор воркера в режиме пула процессов (по одному на процесс)
+_process_worker_processor = None
+
+
+def _init_process_worker(processor_factory: Callable[[], Any]) -> None:
+    """Инициализация процесса-воркера: создание собственного процессора"""
+    global _process_worker_processor
+    _process_worker_processor = processor_factory()
+
+
+def _warm_up_process_worker() -> bool:
+    """Пустая задача для запуска процессов пула заранее"""
+    return _process_worker_processor is not None
+
+
+def _run_in_process_worker(analyze_fn: Callable, submitted_at: float, *args) -> Tuple[float, Any]:
+    """Выполнение анализа процессором текущего процесса, возвращает (ожидание в очереди, результат)"""
+    # time.monotonic() - общие для процессов системные часы
+    queue_wait = time.monotonic() - submitted_at
+    return queue_wait, analyze_fn(_process_worker_processor, *args)
+
+
+class InferenceQueueFullError(Exception):
+    """Исключение, выбрасываемое при переполнении очереди инференса"""
+
+
+class InferenceExecutor:
+    """
+    Пул воркеров инференса с ограниченной очередью.
+
+    В режиме thread каждый поток получает собственный экземпляр процессора
+    из пула (MediaPipe и OpenVINO модели не разделяются между потоками),
+    в режиме process процессор создается в каждом процессе-воркере.
+    """
+
+    MODES = ("thread", "process")
+
+    def __init__(
+        self,
+        processor_factory: Callable[[], Any],
+        analyze_fn: Callable,
+        mode: str = "thread",
+        workers: int = 1,
+        queue_size: int = 4
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"Неизвестный режим исполнителя инференса: {mode}")
+
+        self.processor_factory = processor_factory
+        self.analyze_fn = analyze_fn
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+
+        self._pool: Optional[Executor] = None
+        self._processors: "queue.Queue[Any]" = queue.Queue()
+        self._in_flight = 0
+
+        self.completed_count = 0
+        self.rejected_count = 0
+
+    @property
+    def capacity(self) -> int:
+        """Максимальное количество задач (выполняемые + ожидающие)"""
+        return self.workers + self.queue_size
+
+    @property
+    def in_flight(self) -> int:
+        """Текущее количество задач в исполнителе"""
+        return self._in_flight
+
+    async def start(self) -> None:
+        """Создание пула воркеров и процессоров для них"""
+        loop = asyncio.get_running_loop()
+
+        if self.mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+            processors = await asyncio.gather(*[
+                loop.run_in_executor(self._pool, self.processor_factory)
+                for _ in range(self.workers)
+            ])
+            for processor in processors:
+                self._processors.put(processor)
+        else:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self.processor_factory,)
+            )
+            await asyncio.gather(*[
+                loop.run_in_executor(self._pool, _warm_up_process_worker)
+                for _ in range(self.workers)
+            ])
+
+        logger.info(
+            f"Исполнитель инференса запущен: режим {self.mode}, воркеров {self.workers}, "
+            f"очередь {self.queue_size}"
+        )
+
+    async def submit(self, frame, *args, camera_id: Optional[str] = None) -> Any:
+        """
+        Анализ кадра в пуле воркеров.
+
+        Выбрасывает InferenceQueueFullError, если все воркеры заняты
+        и очередь ожидания заполнена. Время ожидания свободного воркера
+        учитывается в метрике queue_wait камеры camera_id.
+        """
+        if self._pool is None:
+            raise RuntimeError("Исполнитель инференса не запущен")
+
+        if self._in_flight >= self.capacity:
+            self.rejected_count += 1
+            raise InferenceQueueFullError(
+                f"Очередь инференса заполнена ({self._in_flight}/{self.capacity})"
+            )
+
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        submitted_at = time.monotonic()
+        try:
+            if self.mode == "thread":
+                queue_wait, result = await loop.run_in_executor(
+                    self._pool, self._run_in_thread, submitted_at, frame, *args)
+            else:
+                queue_wait, result = await loop.run_in_executor(
+                    self._pool, _run_in_process_worker, self.analyze_fn, submitted_at, frame, *args)
+            self.completed_count += 1
+            metrics.observe("queue_wait", queue_wait, camera_id)
+            return result
+        finally:
+            self._in_flight -= 1
+
+    def _run_in_thread(self, submitted_at: float, frame, *args) -> Tuple[float, Any]:
+        """Выполнение анализа в потоке пула со свободным процессором, возвращает (ожидание, результат)"""
+        processor = self._processors.get()
+        queue_wait = time.monotonic() - submitted_at
+        try:
+            return queue_wait, self.analyze_fn(processor, frame, *args)
+        finally:
+            self._processors.put(processor)
+
+    async def shutdown(self) -> None:
+        """Остановка пула воркеров"""
+        if self._pool is None:
+            return
+
+        pool, self._pool = self._pool, None
+        await asyncio.get_running_loop().run_in_executor(None, pool.shutdown, True)
+        logger.info("Исполнитель инференса остановлен")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Получение статистики исполнителя"""
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+            "completed": self.completed_count,
+            "rejected": self.rejected_count,
+            "running": self._pool is not None
+        }
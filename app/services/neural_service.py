@@ -5,7 +5,8 @@ import asyncio
 import numpy as np
 import cv2
 import time
-from typing import List, Dict, Any, Tuple
+import functools
+from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime
 import sys
 from pathlib import Path
@@ -14,26 +15,58 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 
 from app.utils.logger import logger
+from app.config import settings
 from app.database.models import DetectionResult
+from app.services.storage import frame_writer
+from app.services.inference_executor import InferenceExecutor, InferenceQueueFullError
+from app.utils.metrics import metrics
 
-# Импорт вашей нейросети
-try:
-    from src.main import initialize_processor, analyze_image
-    from src.core.image_processor import ImageProcessor
-    NEURAL_NETWORK_AVAILABLE = True
+
+def _import_network() -> bool:
+    """
+    Импорт вашей нейросети (OpenVINO, MediaPipe)
+
+    Выполняется при инициализации модели в отдельном потоке, а не при
+    загрузке модуля, чтобы сервер начинал отвечать до импорта библиотек.
+    """
+    try:
+        import src.main
+        import src.core
+        import src.detectors
+    except ImportError as e:
+        logger.warning(f"Не удалось загрузить нейронную сеть: {e}")
+        logger.warning("Будет использован режим эмуляции")
+        return False
+    
     logger.info("Нейронная сеть для анализа безопасности водителя загружена успешно")
-except ImportError as e:
-    NEURAL_NETWORK_AVAILABLE = False
-    logger.warning(f"Не удалось загрузить нейронную сеть: {e}")
-    logger.warning("Будет использован режим эмуляции")
+    return True
+
+
+class ModelNotReadyError(Exception):
+    """Исключение, выбрасываемое при анализе кадра до окончания загрузки модели"""
 
 
 class NeuralNetworkService:
     """Сервис для анализа кадров нейронной сетью"""
     
+    # Состояния загрузки модели
+    STATE_NOT_LOADED = "not_loaded"
+    STATE_LOADING = "loading"
+    STATE_READY = "ready"
+    STATE_FAILED = "failed"
+    
     def __init__(self):
         self.model_loaded = False
-        self.processor = None
+        self.network_available: Optional[bool] = None  # None - нейросеть еще не импортирована
+        self.state = self.STATE_NOT_LOADED
+        self.load_error: Optional[str] = None
+        self.load_started_at: Optional[float] = None
+        self.import_time: Optional[float] = None
+        self._init_task: Optional[asyncio.Task] = None
+        self.executor: Optional[InferenceExecutor] = None
+        self.shared_detector = None
+        self.pose_trackers = None
+        self.wheel_roi_cache = None
         self.processed_frames = 0
         self.total_processing_time = 0.0
         self.error_count = 0
@@ -60,23 +93,115 @@ class NeuralNetworkService:
             "person": 0
         }
     
+    def start_initialization(self) -> None:
+        """Запуск инициализации модели в фоне (сервер отвечает на запросы, пока модели загружаются)"""
+        if self._init_task is None or self._init_task.done():
+            self.state = self.STATE_LOADING
+            self._init_task = asyncio.create_task(self.initialize_model())
+    
+    @property
+    def is_ready(self) -> bool:
+        """Готова ли модель к анализу кадров"""
+        return self.state == self.STATE_READY
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        """Состояние загрузки модели для проверки готовности"""
+        loading_time = None
+        if self.state == self.STATE_LOADING and self.load_started_at:
+            loading_time = round(time.time() - self.load_started_at, 2)
+        
+        return {
+            "ready": self.is_ready,
+            "state": self.state,
+            "error": self.load_error,
+            "loading_time": loading_time,
+            "import_time": round(self.import_time, 2) if self.import_time is not None else None,
+            "initialization_time": round(self.initialization_time, 2) if self.initialization_time else None,
+            "network_available": self.network_available
+        }
+    
     async def initialize_model(self) -> bool:
         """Инициализация модели нейронной сети"""
         start_time = time.time()
+        self.state = self.STATE_LOADING
+        self.load_started_at = start_time
+        self.load_error = None
         
         try:
-            if not NEURAL_NETWORK_AVAILABLE:
+            # Импорт библиотек нейросети вне event loop
+            if self.network_available is None:
+                self.network_available = await asyncio.to_thread(_import_network)
+                self.import_time = time.time() - start_time
+            
+            if not self.network_available:
                 logger.warning("Нейронная сеть недоступна, используется режим эмуляции")
                 self.model_loaded = True
+                self.state = self.STATE_READY
                 self.initialization_time = time.time() - start_time
                 return True
             
+            from src.main import initialize_processor, initialize_timed_processor, analyze_frame, analyze_frame_timed
+            from src.core import WheelRoiCache
+            from src.detectors import ObjectDetectorForCPU, PoseTrackers
+            
             logger.info("Инициализация нейронной сети для анализа безопасности водителя...")
             
-            # Инициализация вашего процессора
-            self.processor = initialize_processor()
+            # При батчинге или асинхронном инференсе в режиме потоков все воркеры используют
+            # общий детектор: запросы разных камер объединяются в батч или идут в общую
+            # очередь запросов OpenVINO вместо отдельной копии моделей на каждый поток
+            detector_options = settings.get_detector_config()
+            share_detector = settings.inference_batch_size > 1 or settings.openvino_infer_requests > 0
+            if settings.inference_mode == "thread" and share_detector:
+                self.shared_detector = await asyncio.to_thread(ObjectDetectorForCPU, **detector_options)
+                factory_options = {"object_detector": self.shared_detector}
+            else:
+                factory_options = {"detector_options": detector_options}
+            
+            # Отслеживание позы: в режиме потоков реестр трекеров общий, чтобы кадры камеры
+            # попадали в ее трекер на любом воркере; в режиме процессов реестр свой в каждом процессе
+            pose_options = settings.get_pose_config()
+            if settings.inference_mode == "thread" and pose_options["tracking"]:
+                tracker_options = {key: value for key, value in pose_options.items() if key != "tracking"}
+                self.pose_trackers = PoseTrackers(**tracker_options)
+                factory_options["pose_trackers"] = self.pose_trackers
+            else:
+                factory_options["pose_options"] = pose_options
+            
+            # Кэш области руля: общий для воркеров в режиме потоков, свой в каждом процессе
+            wheel_roi_options = settings.get_wheel_roi_config()
+            if settings.inference_mode == "thread" and wheel_roi_options["enabled"]:
+                cache_options = {key: value for key, value in wheel_roi_options.items() if key != "enabled"}
+                self.wheel_roi_cache = WheelRoiCache(**cache_options)
+                factory_options["wheel_roi_cache"] = self.wheel_roi_cache
+            else:
+                factory_options["wheel_roi_options"] = wheel_roi_options
+            
+            # Пробный поиск позы при создании процессора, в том числе детектором отслеживания
+            # (модели детектора прогреваются по detector_options)
+            factory_options["warm_up"] = settings.model_warm_up
+            
+            # С метриками каждый процессор замеряет свои этапы (поза, модели, NMS),
+            # длительности возвращаются вместе с результатом анализа кадра
+            if settings.metrics_enabled:
+                processor_factory = functools.partial(initialize_timed_processor, **factory_options)
+                analyze_fn = analyze_frame_timed
+            else:
+                processor_factory = functools.partial(initialize_processor, **factory_options)
+                analyze_fn = analyze_frame
+            
+            # Запуск пула воркеров инференса, каждый со своим процессором
+            # (процессоры воркеров создаются параллельно)
+            self.executor = InferenceExecutor(
+                processor_factory,
+                analyze_fn,
+                mode=settings.inference_mode,
+                workers=settings.inference_workers,
+                queue_size=settings.inference_queue_size
+            )
+            await self.executor.start()
             
             self.model_loaded = True
+            self.state = self.STATE_READY
             self.initialization_time = time.time() - start_time
             
             logger.info(f"Модель нейронной сети успешно инициализирована за {self.initialization_time:.2f}с")
@@ -85,32 +210,43 @@ class NeuralNetworkService:
         except Exception as e:
             logger.error(f"Ошибка инициализации модели: {e}")
             self.model_loaded = False
+            self.state = self.STATE_FAILED
+            self.load_error = str(e)
             return False
     
-    async def process_frame(self, frame: np.ndarray) -> Tuple[List[Dict[str, Any]], float]:
-        """Обработка кадра нейронной сетью"""
+    async def process_frame(self, frame: np.ndarray, camera_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Обработка кадра нейронной сетью
+
+        Инференс выполняется в пуле воркеров, event loop не блокируется.
+        camera_id включает отслеживание позы между кадрами этой камеры.
+        При переполнении очереди инференса выбрасывается InferenceQueueFullError,
+        до окончания загрузки модели - ModelNotReadyError.
+        """
         if not self.model_loaded:
-            logger.warning("Модель не загружена")
-            return [], 0.0
+            raise ModelNotReadyError(f"Модель не готова к анализу (состояние: {self.state})")
         
         start_time = time.time()
         
         try:
-            if not NEURAL_NETWORK_AVAILABLE or self.processor is None:
+            if not self.network_available or self.executor is None:
                 # Режим эмуляции
                 return await self._generate_mock_results(frame)
             
             # Реальная обработка вашей нейросетью
-            results = await self._process_with_real_network(frame)
+            results = await self._process_with_real_network(frame, camera_id)
             
             processing_time = time.time() - start_time
             self.processed_frames += 1
             self.total_processing_time += processing_time
+            metrics.observe("inference", processing_time, camera_id)
             
             logger.debug(f"Кадр обработан за {processing_time:.3f}с, найдено {len(results)} объектов/предупреждений")
             
             return results, processing_time
             
+        except InferenceQueueFullError:
+            raise
         except Exception as e:
             self.error_count += 1
             self.last_error_time = datetime.now()
@@ -119,19 +255,20 @@ class NeuralNetworkService:
             logger.error(f"Ошибка обработки кадра: {e}")
             return [], processing_time
     
-    async def _process_with_real_network(self, frame: np.ndarray) -> List[Dict[str, Any]]:
+    async def _process_with_real_network(self, frame: np.ndarray, camera_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Обработка кадра реальной нейронной сетью"""
         results = []
         
         try:
-            # Сохраняем кадр во временный файл для обработки
-            # temp_image_path = "/tmp/temp_frame.jpg"
-            # cv2.imwrite(temp_image_path, frame)
+            # Обработка вашей нейросетью в пуле воркеров (кадр передается в памяти, без записи на диск)
+            result = await self.executor.submit(frame, camera_id, camera_id=camera_id)
+            warnings, image_with_boxes = result[0], result[1]
+            if len(result) > 2:
+                metrics.observe_stages(result[2], camera_id)
             
-            frame_path = save_frame(frame)
-
-            # Обработка вашей нейросетью
-            warnings, image_with_boxes = analyze_image(self.processor, frame_path)
+            # Сохранение кадра на диск в фоне (по политике FRAME_SAVE_POLICY)
+            if frame_writer.should_save(len(warnings) > 0):
+                frame_writer.submit(image_with_boxes if image_with_boxes is not None else frame)
             
             current_time = datetime.now().isoformat()
             frame_height, frame_width = frame.shape[:2]
@@ -189,12 +326,8 @@ class NeuralNetworkService:
                     "detection_type": "positive"
                 })
             
-            # Очищаем временный файл
-            # try:
-            #     Path(temp_image_path).unlink()
-            # except:
-            #     pass
-                
+        except InferenceQueueFullError:
+            raise
         except Exception as e:
             logger.error(f"Ошибка в обработке реальной нейросетью: {e}")
             # Возвращаем пустой результат при ошибке
@@ -325,7 +458,8 @@ class NeuralNetworkService:
         
         return {
             "model_loaded": self.model_loaded,
-            "model_type": "bus_driver_safety_analysis" if NEURAL_NETWORK_AVAILABLE else "mock_emulation",
+            "model_type": "bus_driver_safety_analysis" if self.network_available else "mock_emulation",
+            "model_state": self.state,
             "processed_frames": self.processed_frames,
             "total_processing_time": round(self.total_processing_time, 2),
             "average_processing_time": round(avg_processing_time, 3),
@@ -334,6 +468,13 @@ class NeuralNetworkService:
             "initialization_time": round(self.initialization_time, 2) if self.initialization_time else None,
             "warning_statistics": self.warning_stats.copy(),
             "detected_objects_statistics": self.detected_objects_stats.copy(),
+            "frame_storage": frame_writer.get_statistics(),
+            "executor": self.executor.get_statistics() if self.executor else None,
+            "batching": self.shared_detector.get_batching_statistics() if self.shared_detector else None,
+            "openvino": self.shared_detector.get_model_statistics() if self.shared_detector else None,
+            "pose_tracking": self.pose_trackers.get_statistics() if self.pose_trackers else None,
+            "wheel_roi_cache": self.wheel_roi_cache.get_statistics() if self.wheel_roi_cache else None,
+            "stage_latency": metrics.get_stage_summary(),
             "efficiency": round((self.processed_frames / (self.processed_frames + self.error_count)) * 100, 1) if (self.processed_frames + self.error_count) > 0 else 100
         }
     
@@ -354,6 +495,27 @@ class NeuralNetworkService:
         
         logger.info("Статистика нейронной сети сброшена")
     
+    async def shutdown(self) -> None:
+        """Остановка фоновой загрузки модели и пула воркеров инференса"""
+        if self._init_task and not self._init_task.done():
+            self._init_task.cancel()
+            try:
+                await self._init_task
+            except asyncio.CancelledError:
+                pass
+        self._init_task = None
+        
+        if self.executor:
+            await self.executor.shutdown()
+            self.executor = None
+        if self.shared_detector:
+            await asyncio.to_thread(self.shared_detector.close)
+            self.shared_detector = None
+        self.pose_trackers = None
+        self.wheel_roi_cache = None
+        self.model_loaded = False
+        self.state = self.STATE_NOT_LOADED
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Получение информации о модели"""
         return {
@@ -377,7 +539,7 @@ class NeuralNetworkService:
             ],
             "framework": "MediaPipe + YOLO + OpenVINO",
             "initialization_time": self.initialization_time,
-            "available": NEURAL_NETWORK_AVAILABLE
+            "available": self.network_available
         }
 
 
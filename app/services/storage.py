@@ -1,11 +1,14 @@
 import os
-from typing import Union
+import queue
+import threading
+from typing import Union, Optional
 import cv2
 import numpy as np
 import json
 from datetime import datetime
 
 from app.config import settings
+from app.utils.logger import logger
 
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
@@ -36,3 +39,93 @@ def save_result(result: Union[np.ndarray, dict], prefix: str = "result") -> str:
     else:
         raise ValueError("Результат должен быть np.ndarray или dict")
     return filepath
+
+
+class FrameWriter:
+    """
+    Фоновая запись кадров на диск.
+
+    Кадры попадают в ограниченную очередь и кодируются в JPEG отдельным потоком,
+    поэтому анализ никогда не ждет диска. При переполнении очереди кадр
+    отбрасывается, а не блокирует вызывающего.
+    """
+
+    def __init__(self, policy: str = "warnings", every_n: int = 1, queue_size: int = 32):
+        self.policy = policy
+        self.every_n = max(1, every_n)
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._eligible_count = 0
+        self.saved_count = 0
+        self.dropped_count = 0
+
+    def start(self) -> None:
+        """Запуск потока записи"""
+        if self.policy == "none" or (self._thread and self._thread.is_alive()):
+            return
+
+        self._thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"Фоновая запись кадров запущена (политика: {self.policy}, каждый {self.every_n}-й)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановка потока записи с дозаписью оставшихся кадров"""
+        if not self._thread:
+            return
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info(f"Фоновая запись кадров остановлена (сохранено: {self.saved_count}, пропущено: {self.dropped_count})")
+
+    def should_save(self, has_warnings: bool) -> bool:
+        """Проверка, нужно ли сохранять кадр согласно политике и частоте выборки"""
+        if self.policy == "none" or (self.policy == "warnings" and not has_warnings):
+            return False
+
+        self._eligible_count += 1
+        return (self._eligible_count - 1) % self.every_n == 0
+
+    def submit(self, frame: np.ndarray, prefix: str = "frame") -> bool:
+        """Постановка кадра в очередь записи (без блокировки)"""
+        if not self._thread:
+            return False
+
+        try:
+            self._queue.put_nowait((frame, prefix))
+            return True
+        except queue.Full:
+            self.dropped_count += 1
+            return False
+
+    def _run(self) -> None:
+        """Цикл потока записи"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            frame, prefix = item
+            try:
+                save_frame(frame, prefix)
+                self.saved_count += 1
+            except Exception as e:
+                logger.error(f"Ошибка записи кадра на диск: {e}")
+
+    def get_statistics(self) -> dict:
+        """Получение статистики записи"""
+        return {
+            "policy": self.policy,
+            "every_n": self.every_n,
+            "saved": self.saved_count,
+            "dropped": self.dropped_count,
+            "queued": self._queue.qsize()
+        }
+
+
+# Глобальный экземпляр фоновой записи кадров
+frame_writer = FrameWriter(
+    settings.frame_save_policy,
+    settings.frame_save_every_n,
+    settings.frame_writer_queue_size
+)
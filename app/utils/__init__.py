@@ -3,10 +3,12 @@
 
 Содержит вспомогательные модули для:
 - Логирования с настройкой уровней и форматирования
+- Метрик задержек этапов обработки (гистограммы, формат Prometheus)
 - Общих утилит для работы с файлами, временем, форматированием
 
 Основные модули:
 - logger: Настройка и управление логированием
+- metrics: Гистограммы этапов по камерам, частоты за скользящее окно
 - helpers: Вспомогательные функции (будущее расширение)
 
 Логирование:
@@ -26,11 +28,14 @@
 """
 
 from app.utils.logger import setup_logger, logger
+from app.utils.metrics import MetricsRegistry, metrics
 
 # Экспорт основных компонентов
 __all__ = [
     "setup_logger",
     "logger",
+    "MetricsRegistry",
+    "metrics",
 ]
 
 # Информация о пакете
@@ -0,0 +1,343 @@
+"""
+Метрики задержек этапов обработки и частоты событий в формате Prometheus
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Границы корзин гистограммы задержек (секунды): от захвата кадра до инференса моделей
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.03, 0.04, 0.05,
+    0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0
+)
+
+# Квантили, публикуемые по скользящему окну
+WINDOW_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _WindowSlots:
+    """
+    Кольцо интервалов скользящего окна.
+
+    Окно делится на slot_count интервалов; наблюдение попадает в интервал
+    текущего времени, устаревший интервал обнуляется при повторном
+    использовании. Стоимость наблюдения не зависит от длины окна.
+    """
+
+    def __init__(self, window: float, slot_count: int, width: int):
+        self.slot_count = max(1, slot_count)
+        self.slot_seconds = window / self.slot_count
+        self.width = width
+        self._epochs = [-1] * self.slot_count
+        self._values = [[0.0] * width for _ in range(self.slot_count)]
+
+    def slot(self, now: float) -> List[float]:
+        """Значения интервала, соответствующего моменту now"""
+        epoch = int(now // self.slot_seconds)
+        index = epoch % self.slot_count
+        if self._epochs[index] != epoch:
+            self._epochs[index] = epoch
+            values = self._values[index]
+            for i in range(self.width):
+                values[i] = 0.0
+        return self._values[index]
+
+    def total(self, now: float, created_at: float) -> Tuple[List[float], float]:
+        """
+        Сумма значений по окну и фактическая длительность окна в секундах.
+
+        Длительность не зависит от того, в каких интервалах были наблюдения:
+        это покрываемая окном часть времени (текущий интервал - по прошедшей
+        его части), но не больше времени жизни серии с created_at.
+        """
+        current = int(now // self.slot_seconds)
+        totals = [0.0] * self.width
+        for epoch, values in zip(self._epochs, self._values):
+            if current - self.slot_count < epoch <= current:
+                for i, value in enumerate(values):
+                    totals[i] += value
+
+        covered = (self.slot_count - 1) * self.slot_seconds + (now - current * self.slot_seconds)
+        elapsed = min(covered, now - created_at)
+        return totals, max(elapsed, 1e-9)
+
+
+class Histogram:
+    """
+    Гистограмма задержек одной серии (этап + камера).
+
+    Хранит накопительные корзины за все время (для rate() в Prometheus)
+    и те же корзины по скользящему окну (для квантилей и частоты
+    за последние window секунд). Потокобезопасна.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, window: float = 60.0, slot_count: int = 6,
+                 created_at: Optional[float] = None):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        # Корзины окна, затем сумма и количество
+        self._window = _WindowSlots(window, slot_count, len(self.buckets) + 3)
+        self._created_at = time.monotonic() if created_at is None else created_at
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, now: Optional[float] = None) -> None:
+        """Добавление наблюдения (секунды)"""
+        index = bisect.bisect_left(self.buckets, value)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+            slot = self._window.slot(now)
+            slot[index] += 1
+            slot[-2] += value
+            slot[-1] += 1
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, object]:
+        """Накопительные значения и значения скользящего окна"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            counts = list(self._counts)
+            total_sum, total_count = self._sum, self._count
+            window_values, elapsed = self._window.total(now, self._created_at)
+
+        window_counts = window_values[:-2]
+        window_count = window_values[-1]
+        return {
+            "counts": counts,
+            "sum": total_sum,
+            "count": total_count,
+            "window_count": int(window_count),
+            "window_sum": window_values[-2],
+            "window_rate": window_count / elapsed,
+            "window_quantiles": {
+                q: self._quantile(window_counts, window_count, q) for q in WINDOW_QUANTILES
+            }
+        }
+
+    def _quantile(self, counts: List[float], total: float, q: float) -> Optional[float]:
+        """Оценка квантиля по корзинам (линейная интерполяция внутри корзины)"""
+        if total <= 0:
+            return None
+
+        rank = q * total
+        cumulative = 0.0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index >= len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class Counter:
+    """Счетчик событий серии: всего и частота по скользящему окну. Потокобезопасен"""
+
+    def __init__(self, window: float = 60.0, slot_count: int = 6, created_at: Optional[float] = None):
+        self._total = 0.0
+        self._window = _WindowSlots(window, slot_count, 1)
+        self._created_at = time.monotonic() if created_at is None else created_at
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, now: Optional[float] = None) -> None:
+        """Увеличение счетчика"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._total += amount
+            self._window.slot(now)[0] += amount
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Значение за все время и частота по окну (событий в секунду)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            values, elapsed = self._window.total(now, self._created_at)
+            total = self._total
+        return {"total": total, "window_total": values[0], "window_rate": values[0] / elapsed}
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Метки серии в формате Prometheus"""
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Число в формате Prometheus"""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик приложения.
+
+    Задержки этапов (захват, ожидание в очереди инференса, поза, модели
+    OpenVINO, NMS, запись в базу, рассылка WebSocket) собираются в
+    гистограммы по паре (этап, камера), события (кадры получены,
+    проанализированы, отклонены) - в счетчики. Наблюдение - поиск серии
+    в словаре и обновление под коротким локом, вызывается из любых потоков.
+    """
+
+    def __init__(self, prefix: str = "bus", window: float = 60.0, slot_count: int = 6,
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, enabled: bool = True):
+        self.prefix = prefix
+        self.window = window
+        self.slot_count = slot_count
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str], Counter] = {}
+        # Серии создаются при первом наблюдении, но частота по окну
+        # считается от запуска реестра, а не от первого события серии
+        self._created_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, camera_id: Optional[str] = None) -> None:
+        """Добавление длительности этапа (секунды)"""
+        if not self.enabled:
+            return
+
+        key = (stage, camera_id or "")
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    key, Histogram(self.buckets, self.window, self.slot_count, self._created_at))
+        histogram.observe(seconds)
+
+    def observe_stages(self, durations: Dict[str, List[float]], camera_id: Optional[str] = None) -> None:
+        """Добавление длительностей нескольких этапов ({этап: [секунды, ...]}, как у StageTimer)"""
+        for stage, values in durations.items():
+            for seconds in values:
+                self.observe(stage, seconds, camera_id)
+
+    def inc(self, event: str, camera_id: Optional[str] = None, amount: float = 1.0) -> None:
+        """Увеличение счетчика события"""
+        if not self.enabled:
+            return
+
+        key = (event, camera_id or "")
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter(self.window, self.slot_count, self._created_at))
+        counter.inc(amount)
+
+    def get_rate(self, event: str, camera_id: Optional[str] = None) -> float:
+        """Частота события за скользящее окно (событий в секунду)"""
+        counter = self._counters.get((event, camera_id or ""))
+        return counter.snapshot()["window_rate"] if counter else 0.0
+
+    def get_stage_summary(self, camera_id: Optional[str] = None) -> Dict[str, Dict[str, object]]:
+        """Квантили задержек этапов (мс) и частота за скользящее окно, по всем камерам или по одной"""
+        summary = {}
+        histograms, _ = self._series()
+        for (stage, series_camera), histogram in histograms:
+            if camera_id is not None and series_camera != camera_id:
+                continue
+
+            snapshot = histogram.snapshot()
+            if snapshot["window_count"] == 0:
+                continue
+
+            name = f"{stage}[{series_camera}]" if camera_id is None and series_camera else stage
+            item = {"count": snapshot["window_count"], "rate": round(snapshot["window_rate"], 3)}
+            for q, value in snapshot["window_quantiles"].items():
+                item[f"p{int(q * 100)}_ms"] = round(value * 1000, 2) if value is not None else None
+            summary[name] = item
+        return summary
+
+    def _series(self) -> Tuple[List[Tuple[Tuple[str, str], Histogram]], List[Tuple[Tuple[str, str], Counter]]]:
+        """Копия списков серий (новые серии могут добавляться из других потоков)"""
+        with self._lock:
+            return sorted(self._histograms.items()), sorted(self._counters.items())
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus (exposition format 0.0.4)"""
+        now = time.monotonic()
+        window = _format_value(self.window)
+        histograms, counters = self._series()
+        lines = []
+
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines.append(f"# HELP {name} Длительность этапов обработки за все время")
+        lines.append(f"# TYPE {name} histogram")
+        snapshots = []
+        for (stage, camera_id), histogram in histograms:
+            snapshot = histogram.snapshot(now)
+            snapshots.append(((stage, camera_id), snapshot))
+            labels = {"stage": stage, "camera": camera_id}
+
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), snapshot["counts"]):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+        name = f"{self.prefix}_stage_window_duration_seconds"
+        lines.append(f"# HELP {name} Квантили длительности этапов за последние {window} с")
+        lines.append(f"# TYPE {name} gauge")
+        for (stage, camera_id), snapshot in snapshots:
+            for q, value in snapshot["window_quantiles"].items():
+                if value is None:
+                    continue
+                labels = _format_labels({"stage": stage, "camera": camera_id, "quantile": _format_value(q)})
+                lines.append(f"{name}{labels} {_format_value(value)}")
+
+        name = f"{self.prefix}_stage_window_rate"
+        lines.append(f"# HELP {name} Выполнений этапа в секунду за последние {window} с")
+        lines.append(f"# TYPE {name} gauge")
+        for (stage, camera_id), snapshot in snapshots:
+            labels = _format_labels({"stage": stage, "camera": camera_id})
+            lines.append(f"{name}{labels} {_format_value(round(snapshot['window_rate'], 4))}")
+
+        counter_snapshots = [(key, counter.snapshot(now)) for key, counter in counters]
+
+        name = f"{self.prefix}_events_total"
+        lines.append(f"# HELP {name} Количество событий за все время")
+        lines.append(f"# TYPE {name} counter")
+        for (event, camera_id), snapshot in counter_snapshots:
+            labels = _format_labels({"event": event, "camera": camera_id})
+            lines.append(f"{name}{labels} {_format_value(snapshot['total'])}")
+
+        name = f"{self.prefix}_events_window_rate"
+        lines.append(f"# HELP {name} Событий в секунду за последние {window} с")
+        lines.append(f"# TYPE {name} gauge")
+        for (event, camera_id), snapshot in counter_snapshots:
+            labels = _format_labels({"event": event, "camera": camera_id})
+            lines.append(f"{name}{labels} {_format_value(round(snapshot['window_rate'], 4))}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _create_registry() -> MetricsRegistry:
+    """Глобальный реестр по настройкам приложения"""
+    from app.config import settings
+    return MetricsRegistry(
+        window=settings.metrics_window,
+        slot_count=settings.metrics_window_slots,
+        enabled=settings.metrics_enabled
+    )
+
+
+# Глобальный реестр метрик
+metrics = _create_registry()
@@ -0,0 +1,104 @@
+import os
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.ts', '.m4v')
+
+
+# Загрузка корпуса кадров: папка с изображениями, видеофайл (первые count кадров с шагом step)
+# или синтетические кадры кабины (path=None), всегда в одном и том же порядке
+def load_corpus(path=None, count=16, size=(1920, 1080), step=25, seed=0):
+    if path is None:
+        return [make_synthetic_cabin_frame(size, seed + i) for i in range(count)]
+
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))[:count]
+        frames = [cv2.imread(os.path.join(path, name)) for name in names]
+        frames = [frame for frame in frames if frame is not None]
+    elif path.lower().endswith(VIDEO_EXTENSIONS):
+        frames = []
+        capture = cv2.VideoCapture(path)
+        index = 0
+        while len(frames) < count:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            if index % step == 0:
+                frames.append(frame)
+            index += 1
+        capture.release()
+    else:
+        raise ValueError('Корпус должен быть папкой с кадрами или видеофайлом: {}'.format(path))
+
+    if not frames:
+        raise ValueError('В корпусе нет кадров: {}'.format(path))
+    return frames
+
+
+# Синтетический кадр кабины: приборная панель, руль и силуэт водителя с руками на руле.
+# Кадр детерминирован по seed (положение фигуры и шум), модели на нем могут ничего не найти -
+# покрытие этапов отражается в отчете бенчмарка
+def make_synthetic_cabin_frame(size=(1920, 1080), seed=0):
+    width, height = size
+    rng = np.random.default_rng(seed)
+
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = np.linspace(40, 90, height, dtype=np.uint8)[:, None, None]
+
+    # Приборная панель и руль
+    cv2.rectangle(frame, (0, int(height * 0.72)), (width, height), (35, 35, 35), -1)
+    wheel_center = (int(width * 0.5), int(height * 0.72))
+    wheel_axes = (int(width * 0.14), int(height * 0.1))
+    cv2.ellipse(frame, wheel_center, wheel_axes, 0, 0, 360, (20, 20, 20), max(4, width // 120))
+
+    # Водитель: голова, торс, руки до руля, ремень по диагонали
+    shift = int(rng.integers(-width // 40, width // 40))
+    cx = int(width * 0.5) + shift
+    head_radius = height // 12
+    head_center = (cx, int(height * 0.18))
+    cv2.circle(frame, head_center, head_radius, (150, 170, 200), -1)
+    shoulders_y = head_center[1] + head_radius + height // 40
+    torso = np.array([[cx - width // 9, shoulders_y], [cx + width // 9, shoulders_y],
+                      [cx + width // 11, int(height * 0.75)], [cx - width // 11, int(height * 0.75)]], np.int32)
+    cv2.fillPoly(frame, [torso], (90, 60, 40))
+    thickness = max(6, width // 60)
+    for side in (-1, 1):
+        shoulder = (cx + side * width // 9, shoulders_y + height // 30)
+        elbow = (cx + side * width // 6, int(height * 0.5))
+        hand = (wheel_center[0] + side * wheel_axes[0], wheel_center[1] - height // 40)
+        cv2.line(frame, shoulder, elbow, (90, 60, 40), thickness)
+        cv2.line(frame, elbow, hand, (150, 170, 200), thickness)
+        cv2.circle(frame, hand, thickness, (150, 170, 200), -1)
+    cv2.line(frame, (cx - width // 10, shoulders_y), (cx + width // 12, int(height * 0.68)),
+             (30, 30, 30), max(4, width // 160))
+
+    noise = rng.normal(0, 4, frame.shape)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+# Эмуляция видеопотока из корпуса: каждый кадр корпуса повторяется hold раз с небольшим
+# детерминированным дрожанием (сдвиг и шум), как у неподвижной камеры в кабине
+class EmulatedVideo(object):
+
+    def __init__(self, frames, hold=25, max_shift=3, noise=2.0, seed=0):
+        self.frames = frames
+        self.hold = max(1, hold)
+        self.max_shift = max_shift
+        self.noise = noise
+        self.seed = seed
+
+    # Кадр потока с номером index
+    def frame(self, index):
+        base = self.frames[(index // self.hold) % len(self.frames)]
+        rng = np.random.default_rng(self.seed * 1000003 + index)
+
+        dx, dy = rng.integers(-self.max_shift, self.max_shift + 1, size=2)
+        matrix = np.float32([[1, 0, dx], [0, 1, dy]])
+        frame = cv2.warpAffine(base, matrix, (base.shape[1], base.shape[0]), borderMode=cv2.BORDER_REPLICATE)
+
+        if self.noise > 0:
+            noise = rng.normal(0, self.noise, frame.shape).astype(np.int16)
+            frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        return frame
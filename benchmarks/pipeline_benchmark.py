@@ -0,0 +1,357 @@
+# Бенчмарк конвейера ImageProcessor на фиксированном корпусе кадров:
+#     python -m benchmarks.pipeline_benchmark --save benchmarks/baselines/current.json
+#     python -m benchmarks.pipeline_benchmark --corpus /data/cabin_frames --compare benchmarks/baselines/current.json
+# Сценарии: images - отдельные кадры без отслеживания, video - эмулированный видеопоток
+# (отслеживание позы и кэш области руля). Для каждого сценария: задержки этапов p50/p95/p99
+# на одном воркере, кадры в секунду на 1, 4 и N воркерах, пиковый RSS. Результат сохраняется
+# в JSON и сравнивается с базовым прогоном (код возврата 1 при регрессии сверх порога)
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from benchmarks.corpus import load_corpus, EmulatedVideo
+
+SCENARIOS = ('images', 'video')
+WORKER_MODES = ('process', 'thread')
+PERCENTILES = (50, 95, 99)
+
+# Метрики сравнения с базовым прогоном, для которых хуже - больше (для fps хуже - меньше)
+HIGHER_IS_WORSE = ('p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb')
+
+
+# Сводка длительностей этапа в миллисекундах
+def summarize_durations(durations):
+    values = np.asarray(durations, dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return {'count': 0}
+
+    summary = {'count': int(values.size), 'mean_ms': round(float(values.mean()), 3)}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary['p{}_ms'.format(percentile)] = round(float(value), 3)
+    return summary
+
+
+# Пиковый RSS процесса в МБ (ru_maxrss в Linux - КБ, в macOS - байты)
+def get_peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+# Создание процессора с замером этапов (общий детектор - для воркеров-потоков)
+def make_processor(scenario, threads=None, object_detector=None, pose_trackers=None):
+    from src.core import StageTimer
+    from src.main import initialize_processor
+
+    timer = StageTimer()
+    video = scenario == 'video'
+    processor = initialize_processor(
+        object_detector=object_detector,
+        detector_options={'num_threads': threads} if object_detector is None else None,
+        pose_trackers=pose_trackers,
+        pose_options={'tracking': video},
+        wheel_roi_options={'enabled': video},
+        stage_timer=timer
+    )
+    return processor, timer
+
+
+# Цикл одного воркера: прогрев, ожидание остальных воркеров, замеряемая обработка frames кадров
+def run_worker_loop(processor, timer, corpus, scenario, frames, warmup, worker_index, barrier):
+    video = EmulatedVideo(corpus, seed=worker_index) if scenario == 'video' else None
+    stream_id = 'bench-{}'.format(worker_index) if video is not None else None
+
+    def get_frame(index):
+        return video.frame(index) if video is not None else corpus[index % len(corpus)]
+
+    for index in range(warmup):
+        processor(get_frame(index), stream_id)
+    timer.get_durations(reset=True)
+
+    # Кадры готовятся до замера, чтобы эмуляция видео не попадала во время обработки
+    prepared = [get_frame(warmup + index) for index in range(min(frames, len(corpus) * 25))]
+
+    barrier.wait()
+    started = time.perf_counter()
+    for index in range(frames):
+        frame_start = time.perf_counter()
+        processor(prepared[index % len(prepared)], stream_id)
+        timer.record('total', time.perf_counter() - frame_start)
+    finished = time.perf_counter()
+
+    return {'started': started, 'finished': finished, 'frames': frames, 'durations': timer.get_durations()}
+
+
+# Воркер-процесс: собственный процессор, корпус загружается в процессе.
+# При ошибке барьер сбрасывается (остальные воркеры не ждут вечно), а вместо результата
+# в очередь отправляется текст исключения
+def _process_worker(config, worker_index, barrier, results):
+    try:
+        import cv2
+        cv2.setNumThreads(1)
+
+        init_start = time.perf_counter()
+        processor, timer = make_processor(config['scenario'], threads=config['threads'])
+        init_time = time.perf_counter() - init_start
+
+        corpus = load_corpus(config['corpus'], config['corpus_size'])
+        result = run_worker_loop(processor, timer, corpus, config['scenario'], config['frames'],
+                                 config['warmup'], worker_index, barrier)
+        result['init_time'] = init_time
+        result['peak_rss_mb'] = get_peak_rss_mb()
+    except Exception:
+        barrier.abort()
+        result = {'error': traceback.format_exc()}
+    results.put(result)
+
+
+# Сбор результатов воркеров-процессов: ошибка воркера или его завершение без результата
+# (например, по сигналу) прерывает прогон вместо бесконечного ожидания
+def collect_process_results(processes, results_queue, poll_interval=1.0):
+    results = []
+    while len(results) < len(processes):
+        try:
+            result = results_queue.get(timeout=poll_interval)
+        except queue.Empty:
+            dead = [process for process in processes if process.exitcode not in (None, 0)]
+            if dead:
+                raise RuntimeError('воркер бенчмарка завершился с кодом {} без результата'.format(dead[0].exitcode))
+            if all(process.exitcode is not None for process in processes):
+                raise RuntimeError('воркеры бенчмарка завершились, не вернув все результаты')
+            continue
+
+        if 'error' in result:
+            raise RuntimeError('ошибка в воркере бенчмарка:\n{}'.format(result['error']))
+        results.append(result)
+    return results
+
+
+# Запуск сценария на workers воркерах (процессы или потоки с общим детектором)
+def run_scenario(config, workers, mode):
+    config = dict(config, threads=config['threads'] or max(1, (os.cpu_count() or 1) // workers))
+
+    if mode == 'process':
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(workers)
+        results_queue = context.Queue()
+        processes = [context.Process(target=_process_worker, args=(config, index, barrier, results_queue))
+                     for index in range(workers)]
+        for process in processes:
+            process.start()
+        try:
+            results = collect_process_results(processes, results_queue)
+        except RuntimeError:
+            for process in processes:
+                process.terminate()
+            raise
+        finally:
+            for process in processes:
+                process.join()
+        peak_rss = sum(result['peak_rss_mb'] for result in results)
+    else:
+        from src.detectors import ObjectDetectorForCPU, PoseTrackers
+
+        init_start = time.perf_counter()
+        detector = ObjectDetectorForCPU(num_threads=config['threads'] * workers)
+        pose_trackers = PoseTrackers() if config['scenario'] == 'video' else None
+        init_time = time.perf_counter() - init_start
+
+        corpus = load_corpus(config['corpus'], config['corpus_size'])
+        barrier = threading.Barrier(workers)
+        results = [None] * workers
+
+        # Ошибка воркера-потока, как и процесса, сбрасывает барьер, чтобы остальные не ждали вечно
+        def thread_worker(index):
+            try:
+                processor, timer = make_processor(config['scenario'], object_detector=detector,
+                                                  pose_trackers=pose_trackers)
+                results[index] = run_worker_loop(processor, timer, corpus, config['scenario'], config['frames'],
+                                                 config['warmup'], index, barrier)
+                results[index]['init_time'] = init_time
+            except Exception:
+                barrier.abort()
+                results[index] = {'error': traceback.format_exc()}
+
+        threads = [threading.Thread(target=thread_worker, args=(index,)) for index in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        detector.close()
+
+        errors = [result['error'] for result in results if 'error' in result]
+        if errors:
+            raise RuntimeError('ошибка в воркере бенчмарка:\n{}'.format(errors[0]))
+        peak_rss = get_peak_rss_mb()
+
+    wall = max(result['finished'] for result in results) - min(result['started'] for result in results)
+    frames = sum(result['frames'] for result in results)
+
+    stages = {}
+    for result in results:
+        for stage, durations in result['durations'].items():
+            stages.setdefault(stage, []).extend(durations)
+
+    return {
+        'workers': workers,
+        'frames': frames,
+        'wall_time': round(wall, 3),
+        'fps': round(frames / wall, 2) if wall > 0 else 0,
+        'peak_rss_mb': round(peak_rss, 1),
+        'init_time': round(max(result['init_time'] for result in results), 3),
+        'stages': {stage: summarize_durations(durations) for stage, durations in sorted(stages.items())}
+    }
+
+
+# Описание окружения прогона для сопоставимости базовых результатов
+def get_environment():
+    environment = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count()
+    }
+
+    try:
+        environment['git_commit'] = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        environment['git_commit'] = None
+
+    try:
+        import openvino
+        environment['openvino'] = openvino.__version__
+    except (ImportError, AttributeError):
+        environment['openvino'] = None
+    return environment
+
+
+# Сравнение с базовым прогоном, возвращает список регрессий сверх threshold (доля)
+def compare_reports(baseline, current, threshold=0.1):
+    regressions = []
+    lines = []
+
+    for scenario, runs in current['scenarios'].items():
+        for workers, run in runs.items():
+            base_run = baseline.get('scenarios', {}).get(scenario, {}).get(workers)
+            if base_run is None:
+                continue
+
+            metrics = [('fps', base_run.get('fps'), run.get('fps')),
+                       ('peak_rss_mb', base_run.get('peak_rss_mb'), run.get('peak_rss_mb'))]
+            for stage, summary in run['stages'].items():
+                base_summary = base_run.get('stages', {}).get(stage, {})
+                for name in ('p50_ms', 'p95_ms', 'p99_ms'):
+                    metrics.append(('{}.{}'.format(stage, name), base_summary.get(name), summary.get(name)))
+
+            for name, base_value, value in metrics:
+                if not base_value or value is None:
+                    continue
+
+                change = (value - base_value) / base_value
+                worse = change > threshold if name.split('.')[-1] in HIGHER_IS_WORSE else -change > threshold
+                label = '{}/{}w/{}'.format(scenario, workers, name)
+                lines.append('{:<48} {:>10} -> {:>10} ({:+.1%}){}'.format(
+                    label, base_value, value, change, '  РЕГРЕССИЯ' if worse else ''))
+                if worse:
+                    regressions.append(label)
+
+    print('\n'.join(lines))
+    return regressions
+
+
+def parse_workers(value):
+    counts = []
+    for item in value.split(','):
+        item = item.strip().lower()
+        count = os.cpu_count() or 1 if item in ('n', 'max') else int(item)
+        if count not in counts:
+            counts.append(count)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк этапов ImageProcessor')
+    parser.add_argument('--corpus', default=None,
+                        help='папка с кадрами кабины или видеофайл (по умолчанию - синтетические кадры)')
+    parser.add_argument('--corpus-size', type=int, default=16, help='кадров в корпусе')
+    parser.add_argument('--frames', type=int, default=200, help='замеряемых кадров на воркер')
+    parser.add_argument('--warmup', type=int, default=10, help='кадров прогрева на воркер')
+    parser.add_argument('--workers', type=parse_workers, default=parse_workers('1,4,n'),
+                        help='число воркеров через запятую, n - число ядер')
+    parser.add_argument('--mode', choices=WORKER_MODES, default='process',
+                        help='воркеры-процессы или потоки с общим детектором (как INFERENCE_MODE)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='потоков инференса на воркер (по умолчанию - ядра / воркеры)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='сценарии через запятую')
+    parser.add_argument('--save', default=None, help='сохранить результат в JSON')
+    parser.add_argument('--compare', default=None, help='сравнить с базовым JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='допустимое ухудшение (доля)')
+    args = parser.parse_args(argv)
+
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(',') if scenario.strip()]
+    unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+    if unknown:
+        parser.error('неизвестные сценарии: {}'.format(', '.join(unknown)))
+
+    config = {
+        'corpus': args.corpus,
+        'corpus_size': args.corpus_size,
+        'frames': args.frames,
+        'warmup': args.warmup,
+        'threads': args.threads
+    }
+    report = {
+        'environment': get_environment(),
+        'config': dict(config, mode=args.mode, workers=args.workers),
+        'scenarios': {}
+    }
+
+    for scenario in scenarios:
+        report['scenarios'][scenario] = {}
+        for workers in args.workers:
+            try:
+                run = run_scenario(dict(config, scenario=scenario), workers, args.mode)
+            except RuntimeError as ex:
+                print('Прогон {} на {} воркерах прерван: {}'.format(scenario, workers, ex), file=sys.stderr)
+                return 1
+            report['scenarios'][scenario][str(workers)] = run
+
+            total = run['stages'].get('total', {})
+            print('{:<7} {:>3} воркеров: {:>8.2f} кадр/с, p50 {} мс, p95 {} мс, p99 {} мс, RSS {} МБ'.format(
+                scenario, workers, run['fps'], total.get('p50_ms'), total.get('p95_ms'), total.get('p99_ms'),
+                run['peak_rss_mb']), flush=True)
+
+    if args.save:
+        if os.path.dirname(args.save):
+            os.makedirs(os.path.dirname(args.save), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        print('Результат сохранен: {}'.format(args.save))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_reports(baseline, report, args.threshold)
+        if regressions:
+            print('Регрессий: {}'.format(len(regressions)))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
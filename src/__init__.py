@@ -1,4 +1,5 @@
 __all__ = ['core']
 
 from .main import analyze_image
+from .main import analyze_frame
 from .main import initialize_processor
@@ -0,0 +1,382 @@
+# Пакетный анализ записанного видео и папок с кадрами:
+#     python -m src.batch_analysis /data/depot/2024-05-01 /data/depot/bus7.mp4 -o results.jsonl --workers 4
+# Источники делятся на части по --chunk-frames кадров, части обрабатываются пулом процессов
+# (в каждом свой ImageProcessor), результаты пишутся в JSONL или Parquet (нужен pyarrow).
+# Завершенные части отмечаются в файле контрольных точек: повторный запуск с тем же выходом
+# продолжает работу с места остановки. При аварийной остановке между записью результатов части
+# и контрольной точкой результаты этой части могут повториться (ключ - source и frame_index)
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+import cv2
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.ts', '.m4v', '.h264', '.h265')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+# Процессор кадров и шаг прореживания рабочего процесса (задаются один раз при запуске процесса),
+# ошибка создания процессора передается в основной процесс при обработке первой части
+_processor = None
+_processor_error = None
+_every_n = 1
+
+
+# Часть источника: видеофайл с диапазоном кадров [start, end) или список файлов кадров
+class BatchChunk(object):
+
+    def __init__(self, source, kind, start, end, files=None):
+        self.source = source
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.files = files
+
+    # Стабильный идентификатор части для контрольных точек
+    @property
+    def chunk_id(self):
+        return '{}#{}-{}'.format(self.source, self.start, self.end)
+
+
+# Класс пакетного анализа: разбиение источников на части, пул процессов, запись результатов и контрольные точки
+class BatchAnalyzer(object):
+
+    def __init__(self, inputs, output, output_format='jsonl', workers=None, chunk_frames=1500, every_n=1,
+                 tracking=True, threads_per_worker=None, resume=True, cache_dir=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError('Неизвестный формат результатов: {}'.format(output_format))
+
+        self.inputs = inputs
+        self.output = output
+        self.output_format = output_format
+        self.workers = workers or max(1, os.cpu_count() or 1)
+        self.chunk_frames = max(1, chunk_frames)
+        self.every_n = max(1, every_n)
+        self.tracking = tracking
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.resume = resume
+        # Кэш скомпилированных моделей OpenVINO: модели компилирует только первый процесс
+        self.cache_dir = cache_dir
+
+        if output_format == 'parquet':
+            self.checkpoint_path = os.path.join(output, '_checkpoint.jsonl')
+        else:
+            self.checkpoint_path = output + '.checkpoint.jsonl'
+
+    # Запуск анализа, возвращает итоговую статистику
+    def run(self):
+        # Отсутствие pyarrow обнаруживается до запуска пула, а не после первой части
+        if self.output_format == 'parquet':
+            _import_pyarrow()
+
+        chunks = self.__make_chunks()
+        done = self.__load_checkpoint() if self.resume else set()
+        pending = [chunk for chunk in chunks if chunk.chunk_id not in done]
+
+        self.__report_line('Частей: {}, уже обработано: {}, к обработке: {}, процессов: {}'.format(
+            len(chunks), len(chunks) - len(pending), len(pending), self.workers))
+
+        if self.output_format == 'parquet':
+            os.makedirs(self.output, exist_ok=True)
+        elif os.path.dirname(self.output):
+            os.makedirs(os.path.dirname(self.output), exist_ok=True)
+
+        if not self.resume:
+            self.__remove_previous_results()
+
+        options = {'tracking': self.tracking, 'threads': self.threads_per_worker, 'every_n': self.every_n,
+                   'cache_dir': self.cache_dir}
+        stats = {'chunks': 0, 'frames': 0, 'warnings': 0, 'processing_time': 0.0}
+        start_time = time.time()
+
+        if not pending:
+            return self.__summary(stats, start_time)
+
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(processes=min(self.workers, len(pending)), initializer=_init_worker,
+                          initargs=(options,)) as pool, open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+            for chunk_id, records, processing_time in pool.imap_unordered(_process_chunk, pending):
+                self.__write_records(chunk_id, records)
+
+                # Часть отмечается завершенной только после записи ее результатов
+                checkpoint.write(json.dumps({'chunk': chunk_id, 'frames': len(records)}, ensure_ascii=False) + '\n')
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+
+                stats['chunks'] += 1
+                stats['frames'] += len(records)
+                stats['warnings'] += sum(1 for record in records if record['warnings'])
+                stats['processing_time'] += processing_time
+                self.__report_progress(stats, len(pending), start_time)
+
+        return self.__summary(stats, start_time)
+
+    # Разбиение источников на части
+    def __make_chunks(self):
+        chunks = []
+        for source, kind in self.__find_sources():
+            if kind == 'video':
+                capture = cv2.VideoCapture(source)
+                frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+                capture.release()
+
+                # Число кадров неизвестно (поток без индекса) - видео обрабатывается одной частью
+                if frame_count <= 0:
+                    chunks.append(BatchChunk(source, kind, 0, -1))
+                    continue
+
+                for start in range(0, frame_count, self.chunk_frames):
+                    chunks.append(BatchChunk(source, kind, start, min(start + self.chunk_frames, frame_count)))
+            else:
+                files = sorted(name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+                for start in range(0, len(files), self.chunk_frames):
+                    part = files[start:start + self.chunk_frames]
+                    chunks.append(BatchChunk(source, kind, start, start + len(part),
+                                             [os.path.join(source, name) for name in part]))
+        return chunks
+
+    # Поиск источников: видеофайлы и папки с кадрами (рекурсивно)
+    def __find_sources(self):
+        sources = []
+        for path in self.inputs:
+            path = os.path.abspath(path)
+            if os.path.isfile(path):
+                if path.lower().endswith(VIDEO_EXTENSIONS):
+                    sources.append((path, 'video'))
+                continue
+
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                if any(name.lower().endswith(IMAGE_EXTENSIONS) for name in files):
+                    sources.append((root, 'frames'))
+                for name in sorted(files):
+                    if name.lower().endswith(VIDEO_EXTENSIONS):
+                        sources.append((os.path.join(root, name), 'video'))
+        return sources
+
+    # Удаление результатов прошлого запуска (--restart): контрольные точки, файл JSONL
+    # или части Parquet вместе с недописанными временными файлами
+    def __remove_previous_results(self):
+        paths = [self.checkpoint_path]
+        if self.output_format == 'jsonl':
+            paths.append(self.output)
+        else:
+            paths.extend(os.path.join(self.output, name) for name in os.listdir(self.output)
+                         if name.startswith('part-') and name.endswith('.parquet') or name.endswith('.tmp'))
+
+        for path in paths:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    # Чтение завершенных частей из файла контрольных точек
+    def __load_checkpoint(self):
+        done = set()
+        if not os.path.isfile(self.checkpoint_path):
+            return done
+
+        with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+            for line in checkpoint:
+                try:
+                    done.add(json.loads(line)['chunk'])
+                except (ValueError, KeyError):
+                    # Недописанная строка при аварийной остановке
+                    continue
+        return done
+
+    # Запись результатов части: строки JSONL или отдельный файл Parquet на часть
+    def __write_records(self, chunk_id, records):
+        if self.output_format == 'jsonl':
+            with open(self.output, 'a', encoding='utf-8') as output:
+                for record in records:
+                    output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                output.flush()
+                os.fsync(output.fileno())
+            return
+
+        pyarrow = _import_pyarrow()
+        part_name = 'part-{}.parquet'.format(hashlib.sha1(chunk_id.encode('utf-8')).hexdigest()[:16])
+        part_path = os.path.join(self.output, part_name)
+        table = pyarrow.Table.from_pylist(records, schema=_parquet_schema(pyarrow))
+        pyarrow.parquet.write_table(table, part_path + '.tmp')
+        os.replace(part_path + '.tmp', part_path)
+
+    def __report_progress(self, stats, total_chunks, start_time):
+        elapsed = time.time() - start_time
+        fps = stats['frames'] / elapsed if elapsed > 0 else 0
+        remaining = (total_chunks - stats['chunks']) * elapsed / stats['chunks'] if stats['chunks'] else 0
+        self.__report_line('[{}/{}] кадров: {}, {:.1f} кадр/с, осталось ~{:.0f}с'.format(
+            stats['chunks'], total_chunks, stats['frames'], fps, remaining))
+
+    def __summary(self, stats, start_time):
+        elapsed = time.time() - start_time
+        summary = {
+            'chunks': stats['chunks'],
+            'frames': stats['frames'],
+            'frames_with_warnings': stats['warnings'],
+            'wall_time': round(elapsed, 2),
+            'frames_per_second': round(stats['frames'] / elapsed, 2) if elapsed > 0 else 0,
+            'average_processing_time': round(stats['processing_time'] / stats['frames'], 4) if stats['frames'] else 0
+        }
+        self.__report_line('Готово: ' + json.dumps(summary, ensure_ascii=False))
+        return summary
+
+    @staticmethod
+    def __report_line(message):
+        print(message, file=sys.stderr, flush=True)
+
+
+# Необязательная зависимость для формата parquet
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('Для формата parquet необходим пакет pyarrow (pip install pyarrow)')
+    return pyarrow
+
+
+# Схема Parquet (колонки совпадают с полями записей JSONL)
+def _parquet_schema(pyarrow):
+    return pyarrow.schema([
+        ('source', pyarrow.string()),
+        ('frame_index', pyarrow.int64()),
+        ('position_ms', pyarrow.float64()),
+        ('warnings', pyarrow.list_(pyarrow.string())),
+        ('processing_time', pyarrow.float64()),
+    ])
+
+
+# Инициализация рабочего процесса: собственный процессор кадров с ограничением потоков.
+# Исключение из инициализатора пула завершает процесс, и пул перезапускает его бесконечно,
+# поэтому ошибка сохраняется и выбрасывается из _process_chunk
+def _init_worker(options):
+    global _processor, _processor_error, _every_n
+
+    # Параллелизм обеспечивается процессами, внутри процесса потоки OpenCV не нужны
+    cv2.setNumThreads(1)
+    _every_n = options['every_n']
+
+    try:
+        from src.main import initialize_processor
+        _processor = initialize_processor(
+            detector_options={'num_threads': options['threads'], 'cache_dir': options['cache_dir']},
+            pose_options={'tracking': options['tracking']},
+            wheel_roi_options={'enabled': options['tracking']}
+        )
+    except Exception:
+        _processor_error = traceback.format_exc()
+
+
+# Обработка части в рабочем процессе: декодирование -> анализ (предобработка, инференс, постобработка)
+def _process_chunk(chunk):
+    if _processor is None:
+        raise RuntimeError('Не удалось создать процессор кадров в рабочем процессе:\n{}'.format(_processor_error))
+
+    stream_id = chunk.chunk_id if _processor.pose_trackers is not None else None
+    records = []
+    processing_time = 0.0
+
+    for frame_index, position_ms, frame in _read_frames(chunk, _every_n):
+        frame_start = time.time()
+        warnings, _ = _processor(frame, stream_id)
+        elapsed = time.time() - frame_start
+        processing_time += elapsed
+
+        records.append({
+            'source': chunk.source,
+            'frame_index': frame_index,
+            'position_ms': position_ms,
+            'warnings': warnings,
+            'processing_time': round(elapsed, 4)
+        })
+
+    # Состояние отслеживания позы и кэша руля этой части больше не понадобится
+    if stream_id is not None:
+        _processor.pose_trackers.remove(stream_id)
+        if _processor.wheel_roi_cache is not None:
+            _processor.wheel_roi_cache.invalidate(stream_id)
+
+    return chunk.chunk_id, records, processing_time
+
+
+# Чтение кадров части (каждый every_n-й), возвращает (номер кадра, позиция в мс, кадр)
+def _read_frames(chunk, every_n):
+    if chunk.kind == 'frames':
+        for offset, path in enumerate(chunk.files):
+            if offset % every_n:
+                continue
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield chunk.start + offset, None, frame
+        return
+
+    capture = cv2.VideoCapture(chunk.source)
+    try:
+        if chunk.start > 0:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, chunk.start)
+
+        frame_index = chunk.start
+        while chunk.end < 0 or frame_index < chunk.end:
+            # Пропускаемые кадры только извлекаются из потока, без преобразования в изображение
+            if (frame_index - chunk.start) % every_n:
+                if not capture.grab():
+                    break
+                frame_index += 1
+                continue
+
+            ret, frame = capture.read()
+            if not ret:
+                break
+            # Временная метка только что декодированного кадра
+            position_ms = round(capture.get(cv2.CAP_PROP_POS_MSEC), 1)
+            yield frame_index, position_ms, frame
+            frame_index += 1
+    finally:
+        capture.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Пакетный анализ записанного видео и папок с кадрами')
+    parser.add_argument('inputs', nargs='+', help='видеофайлы и папки (с кадрами или видеофайлами, рекурсивно)')
+    parser.add_argument('-o', '--output', required=True,
+                        help='файл результатов .jsonl или папка для частей parquet')
+    parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='jsonl')
+    parser.add_argument('--workers', type=int, default=None, help='число процессов (по умолчанию - число ядер)')
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help='потоков инференса на процесс (по умолчанию - ядра / процессы)')
+    parser.add_argument('--chunk-frames', type=int, default=1500, help='кадров в одной части')
+    parser.add_argument('--every-n', type=int, default=1, help='анализировать каждый N-й кадр')
+    parser.add_argument('--no-tracking', action='store_true',
+                        help='искать позу и руль на каждом кадре заново (для несвязанных кадров)')
+    parser.add_argument('--restart', action='store_true', help='начать заново, игнорируя контрольные точки')
+    parser.add_argument('--cache-dir', default='cache/openvino',
+                        help='папка кэша скомпилированных моделей OpenVINO (пустая строка - без кэша)')
+    args = parser.parse_args(argv)
+
+    analyzer = BatchAnalyzer(
+        args.inputs,
+        args.output,
+        output_format=args.output_format,
+        workers=args.workers,
+        chunk_frames=args.chunk_frames,
+        every_n=args.every_n,
+        tracking=not args.no_tracking,
+        threads_per_worker=args.threads_per_worker,
+        resume=not args.restart,
+        cache_dir=args.cache_dir or None
+    )
+    try:
+        analyzer.run()
+    except RuntimeError as ex:
+        print('Ошибка пакетного анализа: {}'.format(ex), file=sys.stderr, flush=True)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
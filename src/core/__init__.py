@@ -1,3 +1,5 @@
 from .image_processor import ImageProcessor
+from .wheel_roi_cache import WheelRoiCache
+from .stage_timer import StageTimer
 
-__all__ = ['ImageProcessor']
\ No newline at end of file
+__all__ = ['ImageProcessor', 'WheelRoiCache', 'StageTimer']
\ No newline at end of file
@@ -1,5 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+
 from src.detectors import *
 from .output_image_processor import OutputImageProcessor
+from .wheel_roi_cache import WheelRoiCache
 from src.exceptions import *
 from src.utils import *
 
@@ -7,46 +13,73 @@ from src.utils import *
 # Класс, содержащий основной функционал модуля
 class ImageProcessor(object):
 
-    def __init__(self):
+    # object_detector - готовый (например, общий для нескольких процессоров) детектор,
+    # detector_options - параметры для создания собственного ObjectDetectorForCPU,
+    # pose_trackers - готовый (общий) реестр детекторов позы с отслеживанием по видеопотокам,
+    # pose_options - параметры для создания собственного реестра (tracking=True включает отслеживание),
+    # wheel_roi_cache - готовый (общий) кэш области руля по видеопотокам,
+    # wheel_roi_options - параметры для создания собственного кэша (enabled=True включает кэш),
+    # stage_timer - StageTimer для замера длительности этапов обработки (профилирование, бенчмарки),
+    # warm_up=True выполняет пробный поиск позы на пустом кадре статическим детектором и детектором
+    # отслеживания (прогрев моделей детектора - detector_options)
+    def __init__(self, object_detector=None, detector_options=None, pose_trackers=None, pose_options=None,
+                 wheel_roi_cache=None, wheel_roi_options=None, stage_timer=None, warm_up=False):
+        pose_options = dict(pose_options or {})
+        tracking = pose_options.pop('tracking', False)
+        wheel_roi_options = dict(wheel_roi_options or {})
+        wheel_roi_enabled = wheel_roi_options.pop('enabled', False)
+
+        # Собственный детектор загружается в отдельном потоке параллельно с моделью позы
+        detector_future = None
+        if object_detector is None:
+            loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='detector-loader')
+            detector_future = loader.submit(ObjectDetectorForCPU, **(detector_options or {}))
+            loader.shutdown(wait=False)
+
         self.pose_detector = PoseDetector()
-        self.object_detector = ObjectDetectorForCPU()
+        if warm_up:
+            self.pose_detector.get_pose_landmarks(np.zeros((480, 640, 3), dtype=np.uint8))
+
+        self.pose_trackers = pose_trackers or (PoseTrackers(**pose_options) if tracking else None)
+        if warm_up and self.pose_trackers is not None:
+            self.pose_trackers.warm_up()
+        self.wheel_roi_cache = wheel_roi_cache or (WheelRoiCache(**wheel_roi_options) if wheel_roi_enabled else None)
+        self.object_detector = object_detector or detector_future.result()
         self.output_processor = OutputImageProcessor()
+        self.stage_timer = stage_timer
 
-    def __call__(self, image):
+    # stream_id - идентификатор видеопотока (камеры): кадры одного потока обрабатываются с отслеживанием позы,
+    # без него (отдельные изображения) поза ищется на каждом кадре заново
+    def __call__(self, image, stream_id=None):
         try:
-            return self.__process_image(image)
+            return self.__process_image(image, stream_id)
         except NotDetectedException as ex:
             return [ex.message], None
 
     # Метод инициализации обработки изображения
-    def __process_image(self, image):
+    def __process_image(self, image, stream_id=None):
         warning_list = []
 
         # Получение данных о позе
-        pose_landmarks, left_hand_landmark, right_hand_landmark = self.__check_pose(image)
+        with self.__measure('pose'):
+            pose_landmarks, left_hand_landmark, right_hand_landmark = self.__check_pose(
+                image, self.__get_pose_detector(stream_id))
 
-        # Обрезка фотографии до квадратного вокруг водителя
-        squared_image_for_belt_and_wheel, start_point_squared_image_for_belt_and_wheel = (
-            cut_image_to_square_by_driver_body(image, pose_landmarks))
-
-        # Получение данных о ремне и рулевом колесе
-        detected_data_wheel_and_belt = self.object_detector.detect_wheel_and_belt(squared_image_for_belt_and_wheel)
+        # Получение данных о ремне и рулевом колесе (для видеопотока - из кэша области руля, если сцена не менялась)
+        belt_detected, wheel_coordinates = self.__get_wheel_and_belt(image, pose_landmarks, stream_id)
 
         # Проверка на наличие ремня безопасности
         try:
-            self.__check_belt(detected_data_wheel_and_belt)
+            self.__check_belt(belt_detected)
         except NotDetectedException as ex:
             warning_list.append(ex.message)
 
-        # Проверка рулевого колеса
-        wheel_coordinates = self.__check_wheel(detected_data_wheel_and_belt, image,
-                                               start_point_squared_image_for_belt_and_wheel)
-
         # Проверка рук на руле
         left_hand_on_the_wheel, right_hand_on_the_wheel = None, None
         try:
-            left_hand_on_the_wheel, right_hand_on_the_wheel = self.__check_hands_on_wheel(
-                left_hand_landmark, right_hand_landmark, wheel_coordinates, image)
+            with self.__measure('hands_on_wheel'):
+                left_hand_on_the_wheel, right_hand_on_the_wheel = self.__check_hands_on_wheel(
+                    left_hand_landmark, right_hand_landmark, wheel_coordinates, image)
         except HandsAreNotOnWheelException as ex:
             warning_list.append(ex.message)
 
@@ -55,9 +88,39 @@ class ImageProcessor(object):
 
         return warning_list, image_with_boxes
 
+    # Метод поиска ремня и рулевого колеса, возвращает (ремень найден, расширенные координаты руля)
+    def __get_wheel_and_belt(self, image, pose_landmarks, stream_id):
+        # Обрезка фотографии до квадратного вокруг водителя
+        with self.__measure('square_crop'):
+            squared_image, start_point = cut_image_to_square_by_driver_body(image, pose_landmarks)
+
+        cache = self.wheel_roi_cache if stream_id is not None else None
+        if cache is not None:
+            with self.__measure('wheel_roi_cache'):
+                cached = cache.get(stream_id, squared_image)
+            if cached is not None:
+                return cached
+
+        with self.__measure('wheel_belt_detection'):
+            detected_data = self.object_detector.detect_wheel_and_belt(squared_image, self.stage_timer)
+        belt_detected = 'belt' in detected_data
+
+        # Проверка рулевого колеса (без руля кэшировать нечего - следующий кадр снова проверяется моделью)
+        try:
+            wheel_coordinates = self.__check_wheel(detected_data, image, start_point)
+        except NotDetectedException:
+            if cache is not None:
+                cache.invalidate(stream_id)
+            raise
+
+        if cache is not None:
+            cache.put(stream_id, squared_image, belt_detected, wheel_coordinates)
+
+        return belt_detected, wheel_coordinates
+
     # Метод проверки обнаружения ремня безопасности
-    def __check_belt(self, data):
-        if 'belt' not in data:
+    def __check_belt(self, belt_detected):
+        if not belt_detected:
             raise NotDetectedException('Ремень не распознан. Возможно, водитель не пристегнут!')
 
     # Метод проверки обнаружения рулевого колеса, возвращает координаты
@@ -86,9 +149,22 @@ class ImageProcessor(object):
 
         return left_hand_on_the_wheel, right_hand_on_the_wheel
 
+    # Замер этапа обработки (без stage_timer - пустой контекст)
+    def __measure(self, stage):
+        if self.stage_timer is None:
+            return nullcontext()
+        return self.stage_timer.measure(stage)
+
+    # Метод выбора детектора позы: с отслеживанием для видеопотока или без него для отдельного изображения
+    def __get_pose_detector(self, stream_id):
+        if stream_id is None or self.pose_trackers is None:
+            return self.pose_detector
+
+        return self.pose_trackers.get(stream_id)
+
     # Метод проверки обнаружения важных для дальнейшей обработки точек тела
-    def __check_pose(self, img):
-        result = self.pose_detector.get_pose_landmarks(img)
+    def __check_pose(self, img, pose_detector):
+        result = pose_detector.get_pose_landmarks(img)
 
         if result is None:
             raise NotDetectedException('Водитель не распознан!')
@@ -97,7 +173,7 @@ class ImageProcessor(object):
             or (result.landmark[14] is None):
             raise NotDetectedException('Не распознан торс водителя!')
 
-        left_hand, right_hand = self.pose_detector.get_hands_anchor_points(result.landmark)
+        left_hand, right_hand = pose_detector.get_hands_anchor_points(result.landmark)
 
         if (left_hand is None) or (right_hand is None):
             raise NotDetectedException('Не распознаны руки водителя!')
@@ -108,14 +184,17 @@ class ImageProcessor(object):
     def __check_objects_in_hands(self, img, warnings, left_landmark, right_landmark):
         detected_data = {}
 
+        with self.__measure('hands_detection'):
+            left_hand_data, right_hand_data = self.__detect_objects_in_hands(img, left_landmark, right_landmark)
+
         try:
-            self.__check_objects_in_hand(img, left_landmark, 'левой')
+            self.__check_objects_in_hand(left_hand_data, 'левой')
         except ExtraObjectInHandsException as ex:
             warnings.append(ex.message)
             detected_data = merge_dicts(detected_data, ex.groups)
 
         try:
-            self.__check_objects_in_hand(img, right_landmark, 'правой')
+            self.__check_objects_in_hand(right_hand_data, 'правой')
         except ExtraObjectInHandsException as ex:
             warnings.append(ex.message)
             detected_data = merge_dicts(detected_data, ex.groups)
@@ -123,19 +202,44 @@ class ImageProcessor(object):
         if len(detected_data) == 0:
             return None
 
-        return self.output_processor(img, detected_data)
+        with self.__measure('drawing'):
+            return self.output_processor(img, detected_data)
+
+    # Метод поиска предметов в обеих руках за один вызов каждой модели:
+    # близкие руки - одна общая область, иначе две области в одном батче
+    def __detect_objects_in_hands(self, img, left_landmark, right_landmark):
+        left_area = get_area_around_hand(img, left_landmark)
+        right_area = get_area_around_hand(img, right_landmark)
+        merged_area = merge_hands_areas(left_area, right_area)
+
+        if merged_area is not None:
+            x_start, y_start, x_end, y_end = merged_area
+            detected_data = self.object_detector.detect_objects_in_hands([img[y_start:y_end, x_start:x_end]],
+                                                                          self.stage_timer)[0]
+            detected_data = shift_objects_boxes(self.__filter_hand_objects(detected_data), x_start, y_start)
+
+            img_height, img_width, _ = img.shape
+            hand_points = [(left_landmark.x * img_width, left_landmark.y * img_height),
+                           (right_landmark.x * img_width, right_landmark.y * img_height)]
+            return split_objects_by_hands(detected_data, hand_points)
+
+        areas = [left_area, right_area]
+        images = [img[y_start:y_end, x_start:x_end] for x_start, y_start, x_end, y_end in areas]
+        hands_data = self.object_detector.detect_objects_in_hands(images, self.stage_timer)
 
-    # Метод проверки рук на наличие в них предсказуемого YOLO объекта
-    def __check_objects_in_hand(self, img, hand_landmark, hand_name):
-        area_around_hand, x_start, y_start = cut_area_around_hand(img, hand_landmark)
+        return [shift_objects_boxes(self.__filter_hand_objects(data), area[0], area[1])
+                for data, area in zip(hands_data, areas)]
 
-        detected_data = self.object_detector.detect_object_in_hand(area_around_hand)
+    # Метод удаления классов, не считающихся посторонними предметами в руке
+    def __filter_hand_objects(self, detected_data):
         detected_data.pop('person', None)
         detected_data.pop('motorcycle', None)
         detected_data.pop('toilet', None)
         detected_data.pop('waste', None)
-        detected_data = shift_objects_boxes(detected_data, x_start, y_start)
+        return detected_data
 
+    # Метод проверки руки на наличие в ней предсказуемого YOLO объекта
+    def __check_objects_in_hand(self, detected_data, hand_name):
         if len(detected_data) == 0:
             return
 
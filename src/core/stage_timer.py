@@ -0,0 +1,34 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Класс замера длительности этапов обработки кадра (поза, обрезка, руль и ремень, руки, отрисовка).
+# Передается в ImageProcessor только для профилирования и бенчмарков, без него этапы не замеряются
+class StageTimer(object):
+
+    def __init__(self):
+        self.__durations = {}
+        self.__lock = threading.Lock()
+
+    # Замер этапа: with timer.measure('pose'): ...
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    # Добавить длительность этапа в секундах
+    def record(self, stage, seconds):
+        with self.__lock:
+            self.__durations.setdefault(stage, []).append(seconds)
+
+    # Длительности по этапам (копия), со сбросом при reset=True
+    def get_durations(self, reset=False):
+        with self.__lock:
+            durations = {stage: list(values) for stage, values in self.__durations.items()}
+            if reset:
+                self.__durations = {}
+        return durations
@@ -0,0 +1,72 @@
+import threading
+
+from src.utils import make_scene_thumbnail, get_scene_difference
+
+
+# Класс кэша области рулевого колеса по видеопотокам (камерам): руль в кабине неподвижен,
+# поэтому подтвержденная расширенная рамка руля и результат проверки ремня переиспользуются
+# до следующей перепроверки моделью - каждые verify_every_n кадров или при изменении сцены
+class WheelRoiCache(object):
+
+    # verify_every_n - через сколько кадров из кэша выполняется обязательная перепроверка моделью,
+    # scene_threshold - средняя разница миниатюр (0-255), выше которой сцена считается изменившейся
+    def __init__(self, verify_every_n=10, scene_threshold=8.0):
+        self.verify_every_n = verify_every_n
+        self.scene_threshold = scene_threshold
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+        self.hit_count = 0
+        self.verify_counts = {'empty': 0, 'expired': 0, 'scene_changed': 0}
+
+    # Получить (belt_detected, wheel_coordinates) из кэша или None, если нужна перепроверка моделью
+    def get(self, stream_id, squared_image):
+        thumbnail = make_scene_thumbnail(squared_image)
+
+        with self.__lock:
+            entry = self.__entries.get(stream_id)
+
+            if entry is None:
+                reason = 'empty'
+            elif entry['frames'] >= self.verify_every_n:
+                reason = 'expired'
+            elif get_scene_difference(entry['thumbnail'], thumbnail) > self.scene_threshold:
+                reason = 'scene_changed'
+            else:
+                entry['frames'] += 1
+                self.hit_count += 1
+                return entry['belt_detected'], entry['wheel_coordinates']
+
+            self.verify_counts[reason] += 1
+            return None
+
+    # Сохранить результат проверки моделью
+    def put(self, stream_id, squared_image, belt_detected, wheel_coordinates):
+        entry = {
+            'thumbnail': make_scene_thumbnail(squared_image),
+            'belt_detected': belt_detected,
+            'wheel_coordinates': wheel_coordinates,
+            'frames': 0
+        }
+
+        with self.__lock:
+            self.__entries[stream_id] = entry
+
+    # Удалить запись видеопотока (например, руль не найден - кэшировать нечего)
+    def invalidate(self, stream_id):
+        with self.__lock:
+            self.__entries.pop(stream_id, None)
+
+    # Статистика кэша
+    def get_statistics(self):
+        with self.__lock:
+            verify_count = sum(self.verify_counts.values())
+            total = self.hit_count + verify_count
+
+            return {
+                'hit_count': self.hit_count,
+                'verify_count': verify_count,
+                'verify_reasons': dict(self.verify_counts),
+                'hit_rate': round(self.hit_count / total, 3) if total > 0 else 0.0,
+                'streams': len(self.__entries)
+            }
@@ -1,5 +1,12 @@
-from .object_detection import ObjectDetector
 from .object_detection_for_cpu import ObjectDetectorForCPU
-from .pose_detection import PoseDetector
+from .pose_detection import PoseDetector, PoseTrackers
 
-__all__ = ['ObjectDetector', 'PoseDetector', 'ObjectDetectorForCPU']
\ No newline at end of file
+__all__ = ['PoseDetector', 'PoseTrackers', 'ObjectDetectorForCPU']
+
+
+# ObjectDetector (ultralytics/torch) импортируется только при обращении, чтобы CPU-путь не тянул torch
+def __getattr__(name):
+    if name == 'ObjectDetector':
+        from .object_detection import ObjectDetector
+        return ObjectDetector
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
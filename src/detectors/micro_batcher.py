@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+# Класс, объединяющий запросы инференса из разных потоков (кадров, камер) в один батч
+class MicroBatcher(object):
+
+    def __init__(self, infer_fn, max_batch_size=8, max_wait=0.005, name='micro-batcher'):
+        # infer_fn принимает тензор [N, ...] и возвращает выход модели [N, ...]
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.__pending = []
+        self.__pending_rows = 0
+        self.__condition = threading.Condition()
+        self.__running = True
+
+        self.batches_count = 0
+        self.rows_count = 0
+
+        self.__thread = threading.Thread(target=self.__run, name=name, daemon=True)
+        self.__thread.start()
+
+    # Синхронный вызов: постановка в батч и ожидание результата
+    def __call__(self, input_tensor):
+        return self.submit(input_tensor).result()
+
+    # Постановка тензора [n, ...] в очередь, результат - Future с выходом модели [n, ...]
+    # и длительностью инференса батча в future.inference_time
+    def submit(self, input_tensor):
+        future = Future()
+
+        with self.__condition:
+            if not self.__running:
+                raise RuntimeError('MicroBatcher остановлен')
+
+            self.__pending.append((input_tensor, future))
+            self.__pending_rows += input_tensor.shape[0]
+            self.__condition.notify()
+
+        return future
+
+    # Остановка потока батчинга (оставшиеся запросы будут выполнены)
+    def close(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        self.__thread.join()
+
+    # Средний размер батча с момента запуска
+    def get_statistics(self):
+        return {
+            'batches': self.batches_count,
+            'rows': self.rows_count,
+            'average_batch_size': round(self.rows_count / self.batches_count, 2) if self.batches_count else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000
+        }
+
+    # Сбор очередного батча: ждем первый запрос, затем добираем до max_batch_size не дольше max_wait
+    def __collect_batch(self):
+        with self.__condition:
+            while not self.__pending and self.__running:
+                self.__condition.wait()
+
+            if not self.__pending:
+                return []
+
+            deadline = time.monotonic() + self.max_wait
+            while self.__pending_rows < self.max_batch_size and self.__running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.__condition.wait(remaining)
+
+            batch, rows = [], 0
+            while self.__pending:
+                rows_in_item = self.__pending[0][0].shape[0]
+                if batch and rows + rows_in_item > self.max_batch_size:
+                    break
+                batch.append(self.__pending.pop(0))
+                rows += rows_in_item
+
+            self.__pending_rows -= rows
+            return batch
+
+    # Цикл потока: один вызов модели на батч и раздача результатов вызывающим
+    def __run(self):
+        while True:
+            batch = self.__collect_batch()
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            try:
+                if len(batch) == 1:
+                    outputs = self.infer_fn(batch[0][0])
+                else:
+                    outputs = self.infer_fn(np.concatenate([tensor for tensor, _ in batch]))
+            except Exception as ex:
+                for _, future in batch:
+                    future.set_exception(ex)
+                continue
+
+            # Длительность инференса батча - общая для всех запросов, вошедших в него
+            inference_time = time.perf_counter() - start
+            offset = 0
+            for tensor, future in batch:
+                rows = tensor.shape[0]
+                future.inference_time = inference_time
+                future.set_result(outputs[offset:offset + rows])
+                offset += rows
+
+            self.batches_count += 1
+            self.rows_count += offset
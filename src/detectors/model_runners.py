@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from openvino.runtime import AsyncInferQueue
+
+
+# Класс синхронного инференса скомпилированной модели (вызовы из разных потоков сериализуются)
+class SyncModelRunner(object):
+
+    def __init__(self, compiled_model):
+        self.compiled_model = compiled_model
+        self.__lock = threading.Lock()
+
+    def __call__(self, input_tensor):
+        return self.__infer(input_tensor)[0]
+
+    # Выполнение сразу в вызывающем потоке, результат - завершенный Future
+    # с длительностью инференса этой модели в future.inference_time
+    def submit(self, input_tensor):
+        future = Future()
+        try:
+            output, future.inference_time = self.__infer(input_tensor)
+            future.set_result(output)
+        except Exception as ex:
+            future.set_exception(ex)
+        return future
+
+    # Инференс и его длительность в секундах (без ожидания блокировки)
+    def __infer(self, input_tensor):
+        with self.__lock:
+            start = time.perf_counter()
+            output = self.compiled_model(input_tensor)[0]
+            return output, time.perf_counter() - start
+
+
+# Класс асинхронного инференса через очередь запросов OpenVINO (AsyncInferQueue)
+class AsyncModelRunner(object):
+
+    # num_requests - количество параллельных запросов к модели (0 - оптимальное по мнению OpenVINO)
+    def __init__(self, compiled_model, num_requests=0):
+        self.compiled_model = compiled_model
+        self.infer_queue = AsyncInferQueue(compiled_model, num_requests)
+        self.infer_queue.set_callback(self.__on_done)
+
+    def __call__(self, input_tensor):
+        return self.submit(input_tensor).result()
+
+    # Постановка запроса в очередь (ожидает свободный запрос, если все заняты),
+    # длительность от постановки до завершения запроса - в future.inference_time
+    def submit(self, input_tensor):
+        future = Future()
+        self.infer_queue.start_async({0: input_tensor}, (future, time.perf_counter()))
+        return future
+
+    # Количество запросов в очереди
+    def get_requests_count(self):
+        return len(self.infer_queue)
+
+    # Обработчик завершения запроса: копирование выхода, т.к. запрос будет переиспользован
+    @staticmethod
+    def __on_done(request, userdata):
+        future, start = userdata
+        future.inference_time = time.perf_counter() - start
+        try:
+            future.set_result(request.get_output_tensor(0).data.copy())
+        except Exception as ex:
+            future.set_exception(ex)
@@ -17,7 +17,8 @@ class ObjectDetector(object):
             os.path.join(os.path.dirname(__file__), 'models', 'bottle.pt'))
 
     # Метод поиска на изображении (BGR) ремня безопасности и рулевого колеса
-    def detect_wheel_and_belt(self, img):
+    # (stage_timer принимается для совместимости с ObjectDetectorForCPU, этапы моделей не замеряются)
+    def detect_wheel_and_belt(self, img, stage_timer=None):
         input_frame = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
         results = self.model_wheel_belt(input_frame, imgsz=640)[0]
@@ -25,10 +26,14 @@ class ObjectDetector(object):
         return make_object_groups(results)
 
     # Метод поиска на изображении (BGR) телефона, чашки, бутылки
-    def detect_object_in_hand(self, img):
+    def detect_object_in_hand(self, img, stage_timer=None):
         input_frame = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
         results_1 = self.base_model(input_frame, imgsz=640, conf=0.5)[0]
         results_2 = self.bottle_model(input_frame, imgsz=640, conf=0.7)[0]
 
         return merge_dicts(make_object_groups(results_1), make_object_groups(results_2))
+
+    # Метод поиска предметов сразу на нескольких изображениях (BGR), по одному словарю на изображение
+    def detect_objects_in_hands(self, images, stage_timer=None):
+        return [self.detect_object_in_hand(img) for img in images]
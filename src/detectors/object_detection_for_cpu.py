@@ -1,68 +1,240 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
 import numpy as np
-import torch
-from openvino.runtime import Core
-import cv2
-from ultralytics.utils import ops
+from openvino.runtime import Core, PartialShape, Layout, Type
+from openvino.preprocess import PrePostProcessor
 
-from src.utils import merge_dicts, make_object_groups_for_cpu
+from src.utils import merge_dicts, make_object_groups_for_cpu, non_max_suppression_for_cpu
+from src.utils import letterbox_into_buffer, unmap_letterbox_boxes
 from src.utils import wheel_and_belt_model_classes, base_model_classes, bottles_model_classes
+from .micro_batcher import MicroBatcher
+from .model_runners import SyncModelRunner, AsyncModelRunner
 
 
 # Класс с методами поиска на изображении ожидаемых объектов
 class ObjectDetectorForCPU(object):
 
-    def __init__(self):
+    # batch_size > 1 включает объединение запросов из разных потоков (кадров, камер) в батч,
+    # infer_requests > 0 включает асинхронный инференс через AsyncInferQueue с указанным числом запросов,
+    # num_streams задает число потоков исполнения OpenVINO (например, 'AUTO' или число ядер / 2),
+    # num_threads ограничивает число потоков CPU на инференс (например, при нескольких процессах анализа),
+    # warm_up=True выполняет пробный инференс каждой модели сразу после компиляции,
+    # cache_dir - папка кэша скомпилированных моделей (повторный запуск и другие воркеры не компилируют заново),
+    # performance_hint - 'LATENCY' (одна камера) или 'THROUGHPUT' (много камер, параллельные запросы),
+    # inference_precision - точность вычислений на CPU ('f32', 'bf16', 'f16'),
+    # model_config - свойства OpenVINO отдельных моделей поверх общих: {'wheel_and_belt' | 'base' | 'bottle': {...}}.
+    # Экземпляр детектора можно разделять между потоками
+    def __init__(self, batch_size=1, batch_timeout=0.005, infer_requests=0, num_streams=None, num_threads=None,
+                 warm_up=False, cache_dir=None, performance_hint=None, inference_precision=None, model_config=None):
         self.core = Core()
-        self.model_wheel_belt = self.core.read_model(os.path.join(os.path.dirname(__file__), 'models_for_cpu', 'wheel_and_belt_openvino_model', 'wheel_and_belt.xml'))
-        self.model_wheel_belt = self.core.compile_model(self.model_wheel_belt, 'CPU')
-
-        self.base_model = self.core.read_model(os.path.join(os.path.dirname(__file__), 'models_for_cpu', 'yolo11s_openvino_model', 'yolo11s.xml'))
-        self.base_model = self.core.compile_model(self.base_model, 'CPU')
-
-        self.bottle_model = self.core.read_model(os.path.join(os.path.dirname(__file__), 'models_for_cpu', 'bottle_openvino_model', 'bottle.xml'))
-        self.bottle_model = self.core.compile_model(self.bottle_model, 'CPU')
-
-    # Метод поиска на изображении (BGR) ремня безопасности и рулевого колеса
-    def detect_wheel_and_belt(self, img):
-        original_h, _, _ = img.shape
-        scale = original_h / 640.
-
-        input_tensor = cv2.resize(img, (640, 640))
-        input_tensor = input_tensor.transpose(2, 0, 1)[None]
-        input_tensor = input_tensor.astype(np.float32) / 255.0
-
-        outputs = self.model_wheel_belt(input_tensor)[0]
-
-        predictions = ops.non_max_suppression(
-            torch.from_numpy(outputs),
-            nc=2
-        )[0]
-
-        return make_object_groups_for_cpu(predictions, wheel_and_belt_model_classes, scale)
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.infer_requests = infer_requests
+        self.num_streams = num_streams
+        self.num_threads = num_threads
+        self.warm_up = warm_up
+        self.cache_dir = cache_dir
+        self.performance_hint = performance_hint
+        self.inference_precision = inference_precision
+        self.model_config = model_config or {}
+        # Время чтения и компиляции моделей в секундах (с кэшем - загрузка готовой модели)
+        self.load_times = {}
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.core.set_property({'CACHE_DIR': cache_dir})
+
+        # Входные буферы uint8 [N, 640, 640, 3] создаются один раз на поток и переиспользуются
+        self.__buffers = threading.local()
+
+        # Модели читаются, компилируются и прогреваются параллельно (OpenVINO отпускает GIL),
+        # поэтому запуск занимает время самой медленной модели, а не сумму всех трех.
+        # Модели предметов в руках всегда с динамическим батчем: обе руки идут одним вызовом
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix='model-loader') as pool:
+            wheel_belt_future = pool.submit(self.__load_model, 'wheel_and_belt', 'wheel_and_belt_openvino_model',
+                                            'wheel_and_belt.xml', batch_size > 1)
+            base_future = pool.submit(self.__load_model, 'base', 'yolo11s_openvino_model', 'yolo11s.xml', True)
+            bottle_future = pool.submit(self.__load_model, 'bottle', 'bottle_openvino_model', 'bottle.xml', True)
+
+        self.model_wheel_belt = wheel_belt_future.result()
+        self.base_model = base_future.result()
+        self.bottle_model = bottle_future.result()
+
+        self.__infer_wheel_belt = self.__make_infer(self.model_wheel_belt, 'wheel-belt')
+        self.__infer_base = self.__make_infer(self.base_model, 'base')
+        self.__infer_bottle = self.__make_infer(self.bottle_model, 'bottle')
+
+    # Метод чтения и компиляции модели (при необходимости с динамическим размером батча).
+    # С cache_dir OpenVINO находит скомпилированную модель в кэше по хэшу модели и настроек и загружает ее
+    def __load_model(self, name, model_dir, model_name, dynamic_batch=False):
+        start = time.perf_counter()
+        model = self.core.read_model(os.path.join(os.path.dirname(__file__), 'models_for_cpu', model_dir, model_name))
+
+        if dynamic_batch:
+            model.reshape(PartialShape([-1, 3, 640, 640]))
+
+        # Приведение типа и нормализация выполняются внутри модели: на вход подается letterbox-изображение
+        # uint8 NHWC (BGR, как и раньше), без промежуточных тензоров float32 на стороне Python
+        ppp = PrePostProcessor(model)
+        ppp.input().tensor().set_element_type(Type.u8).set_layout(Layout('NHWC'))
+        ppp.input().model().set_layout(Layout('NCHW'))
+        ppp.input().preprocess().convert_element_type(Type.f32).scale(255.0)
+        model = ppp.build()
+
+        compiled_model = self.core.compile_model(model, 'CPU', self.__get_compile_config(name))
+        self.load_times[name] = time.perf_counter() - start
+
+        # Пробный инференс: первое обращение к модели (выделение памяти, подготовка ядер) происходит при запуске,
+        # а не на первом кадре камеры
+        if self.warm_up:
+            compiled_model(np.zeros((1, 640, 640, 3), dtype=np.uint8))
+
+        return compiled_model
+
+    # Свойства компиляции модели: общие параметры детектора, поверх них - свойства из model_config[name]
+    def __get_compile_config(self, name):
+        config = {}
+        if self.performance_hint:
+            config['PERFORMANCE_HINT'] = str(self.performance_hint).upper()
+        elif self.infer_requests > 0 and not self.num_streams:
+            # Параллельным запросам нужны несколько потоков исполнения
+            config['PERFORMANCE_HINT'] = 'THROUGHPUT'
+        if self.num_streams:
+            config['NUM_STREAMS'] = str(self.num_streams)
+        if self.num_threads:
+            config['INFERENCE_NUM_THREADS'] = str(self.num_threads)
+        if self.inference_precision:
+            config['INFERENCE_PRECISION_HINT'] = str(self.inference_precision)
+
+        config.update({key: str(value) for key, value in self.model_config.get(name, {}).items()})
+        return config
+
+    # Метод получения исполнителя инференса модели: синхронный или асинхронный, при необходимости через батчер
+    def __make_infer(self, compiled_model, name):
+        if self.infer_requests > 0:
+            runner = AsyncModelRunner(compiled_model, self.infer_requests)
+        else:
+            runner = SyncModelRunner(compiled_model)
+
+        if self.batch_size > 1:
+            return MicroBatcher(runner, max_batch_size=self.batch_size, max_wait=self.batch_timeout,
+                                name='batcher-' + name)
+
+        return runner
+
+    # Остановка потоков батчинга
+    def close(self):
+        if self.batch_size > 1:
+            self.__infer_wheel_belt.close()
+            self.__infer_base.close()
+            self.__infer_bottle.close()
+
+    # Статистика батчинга по моделям (пустая, если батчинг выключен)
+    def get_batching_statistics(self):
+        if self.batch_size <= 1:
+            return {}
+
+        return {
+            'wheel_and_belt': self.__infer_wheel_belt.get_statistics(),
+            'base': self.__infer_base.get_statistics(),
+            'bottle': self.__infer_bottle.get_statistics()
+        }
+
+    # Итоговые настройки скомпилированных моделей (после применения подсказок OpenVINO) и время их загрузки
+    def get_model_statistics(self):
+        models = {'wheel_and_belt': self.model_wheel_belt, 'base': self.base_model, 'bottle': self.bottle_model}
+        statistics = {}
+        for name, compiled_model in models.items():
+            properties = {}
+            for key in ('PERFORMANCE_HINT', 'NUM_STREAMS', 'INFERENCE_NUM_THREADS', 'INFERENCE_PRECISION_HINT',
+                        'OPTIMAL_NUMBER_OF_INFER_REQUESTS'):
+                try:
+                    properties[key] = str(compiled_model.get_property(key))
+                except RuntimeError:
+                    properties[key] = None
+            properties['load_time'] = round(self.load_times.get(name, 0.0), 3)
+            statistics[name] = properties
+
+        return {'cache_dir': self.cache_dir, 'models': statistics}
+
+    # Метод поиска на изображении (BGR) ремня безопасности и рулевого колеса.
+    # stage_timer - StageTimer вызывающего процессора для замера инференса модели и NMS (детектор может быть общим)
+    def detect_wheel_and_belt(self, img, stage_timer=None):
+        input_tensor = self.__get_input_buffer('wheel_and_belt', 1)
+        ratio, padding = letterbox_into_buffer(img, input_tensor[0])
+
+        future = self.__infer_wheel_belt.submit(input_tensor)
+        outputs = future.result()
+        self.__record_inference(stage_timer, 'model_wheel_belt', future)
+
+        with self.__measure(stage_timer, 'nms'):
+            detections = non_max_suppression_for_cpu(outputs)[0]
+        predictions = unmap_letterbox_boxes(detections, ratio, padding, img.shape)
+
+        return make_object_groups_for_cpu(predictions, wheel_and_belt_model_classes)
 
     # Метод поиска на изображении (BGR) телефона, чашки, бутылки
-    def detect_object_in_hand(self, img):
-        original_h, _, _ = img.shape
-        scale = original_h / 640.
-
-        input_tensor = cv2.resize(img, (640, 640))
-        input_tensor = input_tensor.transpose(2, 0, 1)[None]
-        input_tensor = input_tensor.astype(np.float32) / 255.0
-
-        outputs_1 = self.base_model(input_tensor)[0]
-        outputs_2 = self.bottle_model(input_tensor)[0]
-
-        predictions_1 = ops.non_max_suppression(
-            torch.from_numpy(outputs_1),
-            conf_thres=0.5,
-            nc=80
-        )[0]
-        predictions_2 = ops.non_max_suppression(
-            torch.from_numpy(outputs_2),
-            conf_thres=0.7,
-            nc=3
-        )[0]
-
-        return merge_dicts(make_object_groups_for_cpu(predictions_1, base_model_classes, scale),
-                           make_object_groups_for_cpu(predictions_2, bottles_model_classes, scale))
+    def detect_object_in_hand(self, img, stage_timer=None):
+        return self.detect_objects_in_hands([img], stage_timer)[0]
+
+    # Метод поиска телефона, чашки, бутылки сразу на нескольких изображениях (BGR):
+    # изображения объединяются в один батч, каждая модель вызывается один раз
+    def detect_objects_in_hands(self, images, stage_timer=None):
+        input_tensor = self.__get_input_buffer('hands', len(images))
+        letterboxes = [letterbox_into_buffer(img, buffer) for img, buffer in zip(images, input_tensor)]
+
+        # Обе модели запускаются параллельно на одном и том же тензоре,
+        # длительность инференса каждой модели замеряет ее исполнитель
+        future_1 = self.__infer_base.submit(input_tensor)
+        future_2 = self.__infer_bottle.submit(input_tensor)
+        outputs_1 = future_1.result()
+        outputs_2 = future_2.result()
+        self.__record_inference(stage_timer, 'model_base', future_1)
+        self.__record_inference(stage_timer, 'model_bottle', future_2)
+
+        with self.__measure(stage_timer, 'nms'):
+            predictions_1 = non_max_suppression_for_cpu(outputs_1, conf_thres=0.5)
+            predictions_2 = non_max_suppression_for_cpu(outputs_2, conf_thres=0.7)
+
+        results = []
+        for img, (ratio, padding), image_predictions_1, image_predictions_2 in zip(
+                images, letterboxes, predictions_1, predictions_2):
+            image_predictions_1 = unmap_letterbox_boxes(image_predictions_1, ratio, padding, img.shape)
+            image_predictions_2 = unmap_letterbox_boxes(image_predictions_2, ratio, padding, img.shape)
+
+            results.append(merge_dicts(
+                make_object_groups_for_cpu(image_predictions_1, base_model_classes),
+                make_object_groups_for_cpu(image_predictions_2, bottles_model_classes)))
+
+        return results
+
+    # Запись длительности инференса модели из Future исполнителя в StageTimer вызывающего процессора
+    @staticmethod
+    def __record_inference(stage_timer, stage, future):
+        inference_time = getattr(future, 'inference_time', None)
+        if stage_timer is not None and inference_time is not None:
+            stage_timer.record(stage, inference_time)
+
+    # Замер этапа в StageTimer вызывающего процессора (без него - пустой контекст)
+    @staticmethod
+    def __measure(stage_timer, stage):
+        if stage_timer is None:
+            return nullcontext()
+        return stage_timer.measure(stage)
+
+    # Метод получения предвыделенного входного буфера uint8 [count, 640, 640, 3] текущего потока.
+    # Буфер переиспользуется только после получения результата, поэтому потоку достаточно одного буфера
+    # на каждое назначение и размер батча
+    def __get_input_buffer(self, purpose, count):
+        if not hasattr(self.__buffers, 'items'):
+            self.__buffers.items = {}
+
+        key = (purpose, count)
+        if key not in self.__buffers.items:
+            self.__buffers.items[key] = np.empty((count, 640, 640, 3), dtype=np.uint8)
+
+        return self.__buffers.items[key]
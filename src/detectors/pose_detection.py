@@ -1,20 +1,58 @@
+import threading
 import cv2
+import numpy as np
 from mediapipe.python.solutions import pose as mp_pose
 
 # Класс с методами обработки позы на изображении
 class PoseDetector(object):
 
-    def __init__(self):
-        self.pose_tracker = mp_pose.Pose(model_complexity=2, static_image_mode=True)
+    # static_image_mode=False включает отслеживание позы между кадрами одного видеопотока:
+    # полный поиск человека выполняется только при потере отслеживания.
+    # redetect_visibility - минимальная средняя видимость ключевых точек, ниже которой
+    # отслеживание сбрасывается и на следующем кадре выполняется повторный поиск
+    def __init__(self, static_image_mode=True, model_complexity=2, min_tracking_confidence=0.5,
+                 redetect_visibility=0.5):
+        self.static_image_mode = static_image_mode
+        self.redetect_visibility = redetect_visibility
+        self.pose_tracker = mp_pose.Pose(model_complexity=model_complexity, static_image_mode=static_image_mode,
+                                         min_tracking_confidence=min_tracking_confidence)
         self.left_hand_points = [19, 17, 15]
         self.right_hand_points = [20, 18, 16]
+        self.key_points = [11, 12, 23, 24, 15, 16]
+        self.processed_count = 0
+        self.redetect_count = 0
+        self.__lock = threading.Lock()
 
     # Получить координаты ключевых точек по изображению (BGR)
     def get_pose_landmarks(self, img):
         input_frame = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        result = self.pose_tracker.process(image=input_frame)
+
+        with self.__lock:
+            result = self.pose_tracker.process(image=input_frame)
+            self.processed_count += 1
+
+            if not self.static_image_mode and self.__is_tracking_lost(result.pose_landmarks):
+                self.pose_tracker.reset()
+                self.redetect_count += 1
+
         return result.pose_landmarks
 
+    # Проверка потери отслеживания: поза не найдена или ключевые точки плохо видны
+    def __is_tracking_lost(self, landmarks):
+        if landmarks is None:
+            return True
+
+        visibility = sum(landmarks.landmark[point].visibility for point in self.key_points) / len(self.key_points)
+        return visibility < self.redetect_visibility
+
+    # Статистика отслеживания позы
+    def get_statistics(self):
+        return {
+            'static_image_mode': self.static_image_mode,
+            'processed_count': self.processed_count,
+            'redetect_count': self.redetect_count
+        }
+
     # Получить ключевые точки рук (по одной на руку для выделения зоны вокруг руки)
     def get_hands_anchor_points(self, landmarks):
         left_hand, right_hand = None, None
@@ -30,3 +68,69 @@ class PoseDetector(object):
                 break
 
         return left_hand, right_hand
+
+
+# Класс-реестр детекторов позы в режиме отслеживания: отдельный экземпляр на каждый видеопоток (камеру),
+# так как состояние отслеживания одного потока не применимо к кадрам другого
+class PoseTrackers(object):
+
+    def __init__(self, model_complexity=2, min_tracking_confidence=0.5, redetect_visibility=0.5):
+        self.model_complexity = model_complexity
+        self.min_tracking_confidence = min_tracking_confidence
+        self.redetect_visibility = redetect_visibility
+        self.__trackers = {}
+        # Прогретый детектор, который получит первый новый видеопоток
+        self.__spare = None
+        self.__lock = threading.Lock()
+
+    # Получить детектор позы видеопотока (создается при первом кадре потока или берется прогретый)
+    def get(self, stream_id):
+        with self.__lock:
+            if stream_id not in self.__trackers:
+                if self.__spare is not None:
+                    self.__trackers[stream_id], self.__spare = self.__spare, None
+                else:
+                    self.__trackers[stream_id] = self.__create_tracker()
+            return self.__trackers[stream_id]
+
+    # Прогрев: создание детектора отслеживания и пробный поиск позы на пустом кадре, чтобы построение
+    # графа MediaPipe и загрузка модели не приходились на первый кадр камеры. Повторный вызов ничего не делает
+    def warm_up(self):
+        with self.__lock:
+            if self.__spare is not None or self.__trackers:
+                return
+
+        tracker = self.__create_tracker()
+        tracker.get_pose_landmarks(np.zeros((480, 640, 3), dtype=np.uint8))
+        # На пустом кадре поза не найдена, отслеживание уже сброшено; пробный кадр не входит в статистику
+        tracker.processed_count = 0
+        tracker.redetect_count = 0
+
+        with self.__lock:
+            if self.__spare is None:
+                self.__spare, tracker = tracker, None
+
+        # Параллельный прогрев из другого процессора уже подготовил детектор
+        if tracker is not None:
+            tracker.pose_tracker.close()
+
+    def __create_tracker(self):
+        return PoseDetector(static_image_mode=False,
+                            model_complexity=self.model_complexity,
+                            min_tracking_confidence=self.min_tracking_confidence,
+                            redetect_visibility=self.redetect_visibility)
+
+    # Удалить детектор позы завершенного видеопотока с освобождением ресурсов MediaPipe
+    def remove(self, stream_id):
+        with self.__lock:
+            tracker = self.__trackers.pop(stream_id, None)
+
+        if tracker is not None:
+            tracker.pose_tracker.close()
+
+    # Статистика отслеживания по видеопотокам
+    def get_statistics(self):
+        with self.__lock:
+            trackers = dict(self.__trackers)
+
+        return {stream_id: tracker.get_statistics() for stream_id, tracker in trackers.items()}
@@ -1,15 +1,34 @@
 import cv2
 
 from src.core.image_processor import ImageProcessor
+from src.core.stage_timer import StageTimer
 
-def initialize_processor():
-    processor = ImageProcessor()
+def initialize_processor(object_detector=None, detector_options=None, pose_trackers=None, pose_options=None,
+                         wheel_roi_cache=None, wheel_roi_options=None, stage_timer=None, warm_up=False):
+    processor = ImageProcessor(object_detector, detector_options, pose_trackers, pose_options,
+                               wheel_roi_cache, wheel_roi_options, stage_timer, warm_up)
     return processor
 
+# Создание процессора с собственным StageTimer (для фабрик воркеров: у каждого процессора свой замер этапов)
+def initialize_timed_processor(**options):
+    return initialize_processor(stage_timer=StageTimer(), **options)
+
+# Анализ кадра, уже находящегося в памяти (BGR, np.ndarray), без записи на диск.
+# stream_id - идентификатор видеопотока для отслеживания позы между его кадрами
+def analyze_frame(processor, frame, stream_id=None):
+    warnings, image_with_boxes = processor(frame, stream_id)
+    return warnings, image_with_boxes
+
+# Анализ кадра с длительностями этапов этого кадра ({этап: [секунды, ...]}),
+# процессор должен быть создан со stage_timer (иначе длительности пустые)
+def analyze_frame_timed(processor, frame, stream_id=None):
+    warnings, image_with_boxes = processor(frame, stream_id)
+    durations = processor.stage_timer.get_durations(reset=True) if processor.stage_timer is not None else {}
+    return warnings, image_with_boxes, durations
+
 def analyze_image(processor, image_path):
     image = cv2.imread(image_path)
-    warnings, image_with_boxes = processor(image)
-    return warnings, image_with_boxes
+    return analyze_frame(processor, image)
 
 # for name in images:
 #     image = cv2.imread(name)
@@ -1,3 +1,5 @@
 from .detection_utils import *
 from .image_processing_utils import *
-from .detection_for_cpu_utils import *
\ No newline at end of file
+from .detection_for_cpu_utils import *
+from .postprocessing_for_cpu_utils import *
+from .preprocessing_for_cpu_utils import *
\ No newline at end of file
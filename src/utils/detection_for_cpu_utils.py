@@ -1,3 +1,5 @@
+import numpy as np
+
 wheel_and_belt_model_classes = ['wheel', 'belt']
 bottles_model_classes = ['bottle', 'suspicious', 'waste']
 base_model_classes = ['person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train',
@@ -15,17 +17,22 @@ base_model_classes = ['person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus
                       'scissors', 'teddy bear', 'hair drier', 'toothbrush']
 
 
-# Процедура группировки обнаруженных объектов
-def make_object_groups_for_cpu(data, classes_names, scale):
+# Процедура группировки обнаруженных объектов,
+# data - массив [K, 6] (x1, y1, x2, y2, уверенность, класс) после NMS в координатах исходного изображения
+def make_object_groups_for_cpu(data, classes_names):
     grouped_objects = {}
 
-    for det in data:
-        x1, y1, x2, y2, _, cls = det
-        x1, y1, x2, y2 = [int((elem * scale).round().item()) for elem in [x1, y1, x2, y2]]
-        class_name = classes_names[int(cls.round().item())]
+    if len(data) == 0:
+        return grouped_objects
+
+    boxes = np.rint(data[:, :4]).astype(np.int64).tolist()
+    classes = np.rint(data[:, 5]).astype(np.int64).tolist()
+
+    for box, cls in zip(boxes, classes):
+        class_name = classes_names[cls]
 
         if class_name not in grouped_objects:
             grouped_objects[class_name] = []
-        grouped_objects[class_name].append([x1, y1, x2, y2])
+        grouped_objects[class_name].append(box)
 
     return grouped_objects
\ No newline at end of file
@@ -1,3 +1,5 @@
+import cv2
+
 # Процедура смещения зон предметов в руках
 def shift_objects_boxes(detected_data, x_start, y_start):
     return {
@@ -42,8 +44,8 @@ def cut_image_to_square_by_driver_body(img, pose_landmarks):
 
     return img[:, start_x:end_x], start_x
 
-# Процедура получения области 200 х 200 вокруг ключевой точки руки
-def cut_area_around_hand(img, hand_landmark):
+# Процедура получения границ области 200 х 200 вокруг ключевой точки руки
+def get_area_around_hand(img, hand_landmark):
     img_height, img_width, _ = img.shape
 
     x_coord = int(hand_landmark.x * img_width)
@@ -54,4 +56,45 @@ def cut_area_around_hand(img, hand_landmark):
     y_start = max(y_coord - 100, 0)
     y_end = min(img_height, y_start + 200)
 
-    return img[y_start:y_end, x_start:x_end], x_start, y_start
\ No newline at end of file
+    return x_start, y_start, x_end, y_end
+
+# Процедура получения области 200 х 200 вокруг ключевой точки руки
+def cut_area_around_hand(img, hand_landmark):
+    x_start, y_start, x_end, y_end = get_area_around_hand(img, hand_landmark)
+
+    return img[y_start:y_end, x_start:x_end], x_start, y_start
+
+# Процедура объединения областей двух рук в одну, если руки близко (иначе None)
+def merge_hands_areas(first_area, second_area, max_side=300):
+    x_start = min(first_area[0], second_area[0])
+    y_start = min(first_area[1], second_area[1])
+    x_end = max(first_area[2], second_area[2])
+    y_end = max(first_area[3], second_area[3])
+
+    if x_end - x_start > max_side or y_end - y_start > max_side:
+        return None
+
+    return x_start, y_start, x_end, y_end
+
+# Процедура распределения обнаруженных объектов по рукам (каждая рамка - к ближайшей по центру руке)
+def split_objects_by_hands(detected_data, hand_points):
+    hands_data = [{} for _ in hand_points]
+
+    for class_name, boxes in detected_data.items():
+        for box in boxes:
+            x_center = (box[0] + box[2]) / 2
+            y_center = (box[1] + box[3]) / 2
+            distances = [(x - x_center) ** 2 + (y - y_center) ** 2 for x, y in hand_points]
+            hand_index = distances.index(min(distances))
+            hands_data[hand_index].setdefault(class_name, []).append(box)
+
+    return hands_data
+
+# Процедура получения уменьшенной полутоновой копии изображения для быстрого сравнения сцен
+def make_scene_thumbnail(img, size=32):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA)
+
+# Процедура оценки изменения сцены: средняя абсолютная разница миниатюр (0-255)
+def get_scene_difference(first_thumbnail, second_thumbnail):
+    return float(cv2.absdiff(first_thumbnail, second_thumbnail).mean())
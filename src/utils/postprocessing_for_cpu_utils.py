@@ -0,0 +1,82 @@
+import numpy as np
+
+# Смещение рамок разных классов для NMS в одном проходе (как в ultralytics)
+MAX_BOX_WIDTH_HEIGHT = 7680
+
+# Максимальное количество рамок, передаваемых в NMS после фильтрации по уверенности
+MAX_NMS_CANDIDATES = 30000
+
+
+# Процедура перевода рамок [x_center, y_center, w, h] в [x1, y1, x2, y2]
+def xywh_to_xyxy(boxes):
+    half_sizes = boxes[:, 2:4] / 2
+    return np.concatenate([boxes[:, :2] - half_sizes, boxes[:, :2] + half_sizes], axis=1)
+
+
+# Процедура подавления немаксимумов для рамок [x1, y1, x2, y2], возвращает индексы оставленных рамок
+def non_max_suppression_boxes(boxes, scores, iou_thres):
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        current = order[0]
+        keep.append(current)
+        others = order[1:]
+
+        inter_w = np.clip(np.minimum(x2[current], x2[others]) - np.maximum(x1[current], x1[others]), 0, None)
+        inter_h = np.clip(np.minimum(y2[current], y2[others]) - np.maximum(y1[current], y1[others]), 0, None)
+        intersection = inter_w * inter_h
+        iou = intersection / (areas[current] + areas[others] - intersection + 1e-9)
+
+        order = others[iou <= iou_thres]
+
+    return np.array(keep, dtype=np.int64)
+
+
+# Процедура декодирования выхода YOLO [B, 4 + nc, N] с фильтрацией по уверенности и NMS по классам,
+# возвращает по массиву [K, 6] (x1, y1, x2, y2, уверенность, класс) на каждое изображение батча
+def non_max_suppression_for_cpu(outputs, conf_thres=0.25, iou_thres=0.45, max_det=300):
+    results = []
+
+    for output in outputs:
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+        # Фильтрация по уверенности до NMS: в NMS попадают единицы рамок из тысяч
+        mask = scores > conf_thres
+        if not mask.any():
+            results.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+
+        boxes = xywh_to_xyxy(predictions[mask, :4])
+        scores = scores[mask]
+        class_ids = class_ids[mask]
+
+        if len(scores) > MAX_NMS_CANDIDATES:
+            top = scores.argsort()[::-1][:MAX_NMS_CANDIDATES]
+            boxes, scores, class_ids = boxes[top], scores[top], class_ids[top]
+
+        # Смещение рамок по классу: NMS выполняется независимо для каждого класса за один проход
+        offset_boxes = boxes + class_ids[:, None] * MAX_BOX_WIDTH_HEIGHT
+        keep = non_max_suppression_boxes(offset_boxes, scores, iou_thres)[:max_det]
+
+        results.append(np.concatenate(
+            [boxes[keep], scores[keep, None], class_ids[keep, None]], axis=1).astype(np.float32))
+
+    return results
+
+
+# Процедура пересчета рамок [K, 6] из координат letterbox-входа модели в координаты исходного изображения
+def unmap_letterbox_boxes(predictions, ratio, padding, image_shape):
+    left, top = padding
+    img_h, img_w = image_shape[:2]
+
+    predictions[:, [0, 2]] = np.clip((predictions[:, [0, 2]] - left) / ratio, 0, img_w)
+    predictions[:, [1, 3]] = np.clip((predictions[:, [1, 3]] - top) / ratio, 0, img_h)
+
+    return predictions
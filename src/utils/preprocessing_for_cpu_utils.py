@@ -0,0 +1,28 @@
+import cv2
+
+# Цвет заполнения полей при вписывании изображения во вход модели (как в ultralytics)
+LETTERBOX_COLOR = 114
+
+
+# Процедура вписывания изображения (BGR) с сохранением пропорций в предвыделенный буфер [H, W, 3] uint8,
+# возвращает коэффициент масштабирования и отступы (left, top) для обратного пересчета рамок
+def letterbox_into_buffer(img, buffer, color=LETTERBOX_COLOR):
+    buffer_h, buffer_w = buffer.shape[:2]
+    img_h, img_w = img.shape[:2]
+
+    ratio = min(buffer_h / img_h, buffer_w / img_w)
+    new_w = min(buffer_w, max(1, round(img_w * ratio)))
+    new_h = min(buffer_h, max(1, round(img_h * ratio)))
+    left = (buffer_w - new_w) // 2
+    top = (buffer_h - new_h) // 2
+
+    # Заполняются только поля: область изображения полностью перезаписывается ниже
+    buffer[:top] = color
+    buffer[top + new_h:] = color
+    buffer[top:top + new_h, :left] = color
+    buffer[top:top + new_h, left + new_w:] = color
+
+    cv2.resize(img, (new_w, new_h), dst=buffer[top:top + new_h, left:left + new_w],
+               interpolation=cv2.INTER_LINEAR)
+
+    return ratio, (left, top)
@@ -64,8 +64,19 @@ class CameraMonitoringApp {
     constructor() {
         this.isConnected = false;
         this.detectionResults = [];
+        this.databaseResults = [];
+        this.databaseStatsLoadedAt = 0;
         this.performanceData = {};
         
+        // Живые обновления через WebSocket /ws/live (при разрыве - опрос REST API)
+        this.liveSocket = null;
+        this.liveConnected = false;
+        this.liveClosing = false;
+        this.liveSnapshotCount = 0;
+        this.liveCameraId = null;
+        this.liveStatus = null;
+        this.liveReconnectDelay = 1000;
+        
         console.log('Инициализация приложения...');
         
         this.initializeElements();
@@ -73,15 +84,21 @@ class CameraMonitoringApp {
         this.updateStatus();
         this.loadDatabaseData();
         this.loadDatabaseStats();
+        this.connectLive();
         
-        // Периодическое обновление статуса (чаще для 25 FPS)
-        this.statusInterval = setInterval(() => this.updateStatus(), 3000);
+        // Периодическое обновление статуса (чаще для 25 FPS), только без WebSocket
+        this.statusInterval = setInterval(() => this.pollStatus(), 3000);
         
-        // Автоматическое обновление данных БД
+        // Автоматическое обновление данных БД: без WebSocket - результаты и статистика,
+        // с WebSocket результаты приходят сами, статистика БД опрашивается реже
         this.dataRefreshInterval = setInterval(() => {
-            if (this.getCurrentTab() === 'database-tab') {
+            if (this.getCurrentTab() !== 'database-tab') return;
+            
+            if (!this.liveConnected) {
                 this.loadDatabaseData();
                 this.loadDatabaseStats();
+            } else if (Date.now() - this.databaseStatsLoadedAt >= 60000) {
+                this.loadDatabaseStats();
             }
         }, 10000);
         
@@ -232,13 +249,90 @@ class CameraMonitoringApp {
         if (this.statusInterval) clearInterval(this.statusInterval);
         if (this.dataRefreshInterval) clearInterval(this.dataRefreshInterval);
         if (this.performanceInterval) clearInterval(this.performanceInterval);
+        
+        this.liveClosing = true;
+        if (this.liveSocket) this.liveSocket.close();
+    }
+    
+    // Живые обновления
+    connectLive() {
+        if (!('WebSocket' in window)) {
+            console.warn('WebSocket недоступен, используется опрос API');
+            return;
+        }
+        
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(`${protocol}//${window.location.host}/ws/live`);
+        this.liveSocket = socket;
+        
+        socket.onopen = () => {
+            console.log('Подключено к живым обновлениям /ws/live');
+            this.liveConnected = true;
+            this.liveReconnectDelay = 1000;
+        };
+        
+        socket.onmessage = (event) => {
+            try {
+                this.handleLiveMessage(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Ошибка обработки живого обновления:', error);
+            }
+        };
+        
+        socket.onclose = () => {
+            this.liveConnected = false;
+            this.liveSocket = null;
+            if (this.liveClosing) return;
+            
+            // До переподключения данные обновляются опросом API
+            console.warn(`Живые обновления недоступны, повтор через ${this.liveReconnectDelay / 1000}с`);
+            this.updateStatus();
+            setTimeout(() => this.connectLive(), this.liveReconnectDelay);
+            this.liveReconnectDelay = Math.min(this.liveReconnectDelay * 2, 30000);
+        };
+    }
+    
+    handleLiveMessage(message) {
+        if (message.type === 'snapshot') {
+            this.liveCameraId = message.data.default_camera_id;
+            this.liveStatus = message.data.cameras[this.liveCameraId] || null;
+            if (this.liveStatus) this.applyStatus(this.liveStatus);
+            
+            // После переподключения догружаем результаты, пропущенные за время разрыва
+            if (this.liveSnapshotCount > 0) this.loadDatabaseData();
+            this.liveSnapshotCount += 1;
+        } else if (message.type === 'status') {
+            if (!this.liveStatus || message.data.camera_id !== this.liveCameraId) return;
+            
+            Object.entries(message.data.delta).forEach(([section, changes]) => {
+                this.liveStatus[section] = Object.assign(this.liveStatus[section] || {}, changes);
+            });
+            this.applyStatus(this.liveStatus);
+        } else if (message.type === 'result') {
+            // При отложенной записи в БД id еще нет, результат различается по камере и времени
+            const key = this.getResultKey(message.data);
+            const known = this.databaseResults.filter(item => this.getResultKey(item) !== key);
+            this.databaseResults = [message.data, ...known].slice(0, 50);
+            this.updateDetectionResults(this.databaseResults.slice(0, 10));
+            if (this.getCurrentTab() === 'database-tab') {
+                this.displayDatabaseData(this.databaseResults);
+            }
+        }
+    }
+    
+    getResultKey(item) {
+        return `${item.camera_id}|${item.timestamp}`;
+    }
+    
+    pollStatus() {
+        if (!this.liveConnected) this.updateStatus();
     }
     
     reduceUpdateFrequency() {
         console.log('Снижение частоты обновлений (страница скрыта)');
         if (this.statusInterval) {
             clearInterval(this.statusInterval);
-            this.statusInterval = setInterval(() => this.updateStatus(), 15000);
+            this.statusInterval = setInterval(() => this.pollStatus(), 15000);
         }
         if (this.performanceInterval) {
             clearInterval(this.performanceInterval);
@@ -254,7 +348,7 @@ class CameraMonitoringApp {
         console.log('Восстановление частоты обновлений (страница видима)');
         if (this.statusInterval) {
             clearInterval(this.statusInterval);
-            this.statusInterval = setInterval(() => this.updateStatus(), 3000);
+            this.statusInterval = setInterval(() => this.pollStatus(), 3000);
         }
         if (this.performanceInterval) {
             clearInterval(this.performanceInterval);
@@ -264,7 +358,7 @@ class CameraMonitoringApp {
                 }
             }, 5000);
         }
-        this.updateStatus();
+        this.pollStatus();
     }
     
     getCurrentTab() {
@@ -507,9 +601,7 @@ class CameraMonitoringApp {
             console.log('Статус камеры получен:', data);
             
             if (data.success) {
-                this.updateCameraStatus(data.camera);
-                this.updateNeuralStats(data.neural_network);
-                this.updateConfigInfo(data.config);
+                this.applyStatus(data);
             }
             
         } catch (error) {
@@ -517,6 +609,12 @@ class CameraMonitoringApp {
         }
     }
     
+    applyStatus(data) {
+        this.updateCameraStatus(data.camera);
+        this.updateNeuralStats(data.neural_network);
+        this.updateConfigInfo(data.config);
+    }
+    
     updateCameraStatus(cameraData) {
         console.log('Обновление статуса камеры:', cameraData);
         
@@ -853,7 +951,8 @@ class CameraMonitoringApp {
         try {
             this.setRefreshButtonState(true);
             
-            const response = await fetch('/api/database/results?limit=50');
+            // Без frame_data: дашборду нужны только результаты детекции
+            const response = await fetch('/api/database/results?limit=50&fields=id,camera_id,timestamp,detection_results,processing_time,created_at');
             
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
@@ -863,6 +962,7 @@ class CameraMonitoringApp {
             console.log('Данные из БД получены:', result);
             
             if (result.success) {
+                this.databaseResults = result.data;
                 this.displayDatabaseData(result.data);
                 this.updateDetectionResults(result.data.slice(0, 10));
             } else {
@@ -879,6 +979,7 @@ class CameraMonitoringApp {
     async loadDatabaseStats() {
         console.log('Загрузка статистики базы данных...');
         try {
+            this.databaseStatsLoadedAt = Date.now();
             const response = await fetch('/api/database/info');
             
             if (!response.ok) {
@@ -989,7 +1090,12 @@ class CameraMonitoringApp {
                 
                 // ID
                 const idCell = row.insertCell();
-                idCell.textContent = item.id;
+                if (item.id !== null && item.id !== undefined) {
+                    idCell.textContent = item.id;
+                } else {
+                    idCell.innerHTML = '<span style="color: #6c757d;">—</span>';
+                    idCell.title = 'Ожидает записи в БД';
+                }
                 
                 // Время
                 const timeCell = row.insertCell();